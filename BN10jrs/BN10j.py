@@ -8,6 +8,15 @@ import logging
 from urllib.parse import urljoin
 import schedule
 import time
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.session import client_session
+from common.run_guard import guarded_run
+from common.singleflight import coalesce_fetch, coalesce_result
+from common.retry import fetch_with_retries
+from common.negative_cache import GONE, SERVER_ERROR, dead_urls, track_failures
+from common.bandwidth import byte_category
 
 logging.basicConfig(level=logging.DEBUG)  # Passer à DEBUG pour plus de détails
 logger = logging.getLogger(__name__)
@@ -29,31 +38,39 @@ output_file = os.path.join(os.getcwd(), 'businessnews.json')
 journal_name = "Business News"
 journal_url = "https://www.businessnews.com.tn"
 semaphore = asyncio.Semaphore(5)  # Limite de requêtes simultanées
+# Éléments lus par fetch_article_content : la page n'est plus lue une fois tous refermés.
+# La signature (p aligné à droite) n'est cherchée qu'en l'absence d'auteur_artilce_zen,
+# et une page sans l'un de ces éléments est lue entière : la coupure ne la masque pas.
+article_containers = [('div', 'auteur_artilce_zen'), ('div', 'heureArticle fas fa-calendar'), ('div', 'contenue_article_zen')]
 
-async def fetch(session, url):
-    retries = 3
-    for i in range(retries):
-        try:
-            async with session.get(url) as response:
-                if response.status == 200:
-                    logger.debug(f"Fetching URL: {url}")
-                    return await response.text()
-                elif response.status == 404:
-                    logger.warning(f"Page not found: {url}")
-                    return None
-                else:
-                    logger.warning(f"Unexpected response {response.status} for URL: {url}")
-        except aiohttp.ClientError as e:
-            logger.error(f"Error fetching URL {url}: {e}")
-            if i < retries - 1:
-                await asyncio.sleep(2 ** i)  # Exponential backoff
-            else:
-                raise
+@coalesce_fetch
+async def fetch(session, url, stop_after=None):
+    try:
+        response = await fetch_with_retries(session, url, stop_after=stop_after)
+    except aiohttp.ClientError as e:
+        logger.error(f"Error fetching URL {url}: {e}")
+        raise
+    if response.status == 200:
+        dead_urls.fetched(url)
+        logger.debug(f"Fetching URL: {url}")
+        return response.body
+    elif response.status in (404, 410):
+        dead_urls.record(url, GONE)
+        logger.warning(f"Page not found: {url}")
+        return None
+    else:
+        # 403, 429 après les tentatives... : rien d'enregistré, la page n'a pas été lue
+        if response.status >= 500:
+            dead_urls.record(url, SERVER_ERROR)
+        logger.warning(f"Unexpected response {response.status} for URL: {url}")
+        return None
 
+@coalesce_result
+@track_failures
 async def fetch_article_content(session, url):
     async with semaphore:
         logger.debug(f"Fetching article content from URL: {url}")
-        html_content = await fetch(session, url)
+        html_content = await fetch(session, url, stop_after=article_containers)
         if not html_content:
             logger.warning(f"No HTML content fetched for URL: {url}")
             return None, None, None, None, None
@@ -160,7 +177,7 @@ async def scrape_page(session, category, page_number, seen_urls):
             article_link = item.find('a', href=True)
             if article_link:
                 article_url = urljoin(base_url, article_link['href'])
-                if article_url in seen_urls:
+                if article_url in seen_urls or dead_urls.blocked(article_url):
                     continue
                 seen_urls.add(article_url)
 
@@ -187,12 +204,12 @@ async def scrape_page(session, category, page_number, seen_urls):
         logger.error(f"Exception while scraping page {page_number} in category '{category}': {e}")
         return None
 
-async def scrape_category(category):
+async def scrape_category(category, session=None):
     logger.info(f"Starting scraping process for category '{category}'...")
     all_articles = []
     seen_urls = set()
 
-    async with aiohttp.ClientSession() as session:
+    async with client_session(session) as session:
         page_number = 1
         while True:
             articles = await scrape_page(session, category, page_number, seen_urls)
@@ -212,16 +229,19 @@ def parse_date(date_string):
         logging.error(f"Unable to parse date: {date_string}")
         return None
 
-async def scrape_all_categories():
+@guarded_run(output_file + '.lock', max_seconds=None, max_requests=None)
+async def scrape_all_categories(session=None):
     logger.info("Starting scraping process for all categories...")
     all_category_articles = {}
 
     for category in categories:
-        category_articles = await scrape_category(category)
+        with byte_category(category):
+            category_articles = await scrape_category(category, session=session)
         all_category_articles[category] = category_articles
 
     await save_articles(all_category_articles, journal_name, journal_url)
     logger.info("Scraping process completed for all categories.")
+    return all_category_articles
 
 def job():
     asyncio.run(scrape_all_categories())
@@ -4,9 +4,23 @@ from bs4 import BeautifulSoup
 import json
 import os
 import logging
+import re
 from urllib.parse import urljoin
 import schedule
 import time
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.session import client_session
+from common.run_guard import current_budget, guarded_run
+from common.singleflight import coalesce_fetch, coalesce_result
+from common.retry import fetch_with_retries
+from common.negative_cache import GONE, SERVER_ERROR, dead_urls, track_failures
+from common.frontier import BACKFILL, DEFAULT_BACKFILL_INTERVAL, FRESH, Frontier
+from common.cursor import ListingCursor, ListingFetchError, article_id, fetch_listing, find_last_page
+from common.feeds import CHANGED, FeedDiscovery
+from common.extract import All, Extractor, First, Select
+from common import fastpath
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
@@ -27,7 +41,46 @@ categories = {
 
 output_file = os.path.join(os.getcwd(), 'Articles.json')
 config_file = os.path.join(os.getcwd(), 'config.json')
+ids_file = os.path.join(os.getcwd(), 'ids.json')
+feeds_file = os.path.join(os.getcwd(), 'feeds.json')
 semaphore = asyncio.Semaphore(5)
+# Éléments lus par fetch_article_content : la page n'est plus lue une fois tous refermés
+article_containers = [('div', 'titreArticleZen'), ('div', 'heureArticle fas fa-calendar'), ('div', 'contenue_article_zen')]
+# Règles d'extraction d'un article, évaluées en un seul parcours de la page
+article_rules = Extractor(
+    title=First(Select('div', class_='titreArticleZen'), Select('span', class_='field-content', itemprop='name')),
+    date=First(Select('div', class_='heureArticle fas fa-calendar'),
+               Select('time', class_='entry-date updated'),
+               Select('div', class_='date_artilce_zen')),
+    content=First(Select('div', class_='contenue_article_zen')),
+    blocks=All(Select(['p', 'div']), within='content'),
+    links=All(Select('a', href=True), within='content'),
+)
+
+# Frontière à deux voies : les têtes de liste (voie « fresh ») passent toujours avant
+# les pages d'archive (voie « backfill »), elles-mêmes limitées en débit.
+FRESH_MAX_PAGES = 10  # profondeur max parcourue en tête de liste, l'archive prend le relais
+HEAD_REFRESH_INTERVAL = 600  # pendant un long run, repasser sur la page 1 toutes les 10 minutes
+PAGE_WORKERS = 3
+
+# Découverte par identifiant : les URLs d'articles se terminent par ,<rubrique>,<id>,3
+# et le site retrouve l'article à partir de l'identifiant seul.
+ARTICLE_URL_IDS = re.compile(r',(\d+),(\d+),\d+/?$')
+ID_URL = base_url + '/article,{rubrique},{article_id},3'
+DEFAULT_RUBRIQUE = 520
+ID_BATCH = 5  # identifiants testés en même temps (sous le même sémaphore que les articles)
+ID_BATCH_INTERVAL = 1.0  # secondes minimum entre deux lots
+MAX_CONSECUTIVE_MISSES = 150  # identifiants vides d'affilée après lesquels la tête est atteinte
+MAX_IDS_PER_RUN = 3000  # identifiants testés au plus par run en remontant l'archive
+RECHECK_WINDOW = 100  # les trous proches de la tête sont retestés (articles publiés plus tard)
+OTHER_CATEGORY = 'Autres rubriques'
+# Identifiant non tranché (erreur réseau, 5xx, 429, disjoncteur ouvert) : retesté plus tard
+UNAVAILABLE = 'unavailable'
+
+# Flux RSS / sitemaps du site (liste 'feeds' de config.json) : quand ils contiennent tous
+# les identifiants au-delà du plus récent connu, les têtes de liste ne sont pas relues et
+# seuls les articles nouveaux ou modifiés sont récupérés. Aucun flux n'est configuré par
+# défaut : sans liste 'feeds', les têtes de liste sont lues comme avant.
 
 if not os.path.exists(output_file):
     initial_data = {
@@ -45,76 +98,105 @@ if os.path.exists(config_file):
     with open(config_file, 'r', encoding='utf-8') as f:
         config = json.load(f)
 else:
-    config = {'last_scraped_pages': {category: 1 for category in categories}}
-
-async def fetch(session, url):
-    retries = 3
-    for i in range(retries):
-        try:
-            async with session.get(url) as response:
-                if response.status == 200:
-                    logger.debug(f"Fetching URL: {url}")
-                    return await response.text()
-                elif response.status == 404:
-                    logger.warning(f"Page not found: {url}")
-                    return None
-                else:
-                    logger.warning(f"Unexpected response {response.status} for URL: {url}")
-        except aiohttp.ClientError as e:
-            logger.error(f"Error fetching URL {url}: {e}")
-            if i < retries - 1:
-                await asyncio.sleep(2 ** i)  # Exponential backoff
-            else:
-                raise
+    config = {'cursors': {}}
 
+@coalesce_fetch
+async def fetch(session, url, stop_after=None):
+    try:
+        response = await fetch_with_retries(session, url, stop_after=stop_after)
+    except aiohttp.ClientError as e:
+        logger.error(f"Error fetching URL {url}: {e}")
+        raise
+    if response.status == 200:
+        dead_urls.fetched(url)
+        logger.debug(f"Fetching URL: {url}")
+        return response.body
+    elif response.status in (404, 410):
+        dead_urls.record(url, GONE)
+        logger.warning(f"Page not found: {url}")
+        return None
+    else:
+        # 403, 429 après les tentatives... : rien d'enregistré, la page n'a pas été lue
+        if response.status >= 500:
+            dead_urls.record(url, SERVER_ERROR)
+        logger.warning(f"Unexpected response {response.status} for URL: {url}")
+        return None
+
+@coalesce_result
+@track_failures
 async def fetch_article_content(session, url):
     async with semaphore:
         logger.debug(f"Fetching article content from URL: {url}")
-        html_content = await fetch(session, url)
+        html_content = await fetch(session, url, stop_after=article_containers)
         if not html_content:
             logger.warning(f"No HTML content fetched for URL: {url}")
             return None, None, None, None, None
 
-        soup = BeautifulSoup(html_content, 'html.parser')
-
-        title = 'Titre non trouvé'
-        content = 'Contenu non disponible'
-        author = 'Auteur non disponible'
-        date_of_publication = ''
-        tags = []
-        sublinks = []  # Initialize sublinks here
+        return fast_path(html_content, url)
 
-        try:
-            # Search for title in different places
-            title_tag = soup.find('div', class_='titreArticleZen') or soup.find('span', class_='field-content', itemprop='name')
-            if title_tag:
-                title = title_tag.text.strip()
+def parse_article_content(soup, url):
+    title = 'Titre non trouvé'
+    content = 'Contenu non disponible'
+    author = 'Auteur non disponible'
+    date_of_publication = ''
+    tags = []
+    sublinks = []  # Initialize sublinks here
 
-            # Search for publication date
-            date_tag = soup.find('div', class_='heureArticle fas fa-calendar') or \
-                       soup.find('time', {'class': 'entry-date updated'}) or \
-                       soup.find('div', class_="date_artilce_zen")
-            if date_tag:
-                date_of_publication = date_tag.text.strip()
+    try:
+        found = article_rules.run(soup)
+        if found['title']:
+            title = found['title'].text.strip()
 
-            # Search for article content
-            content_div = soup.find('div', class_='contenue_article_zen')
-            if content_div:
-                paragraphs = [p.get_text(strip=True) for p in content_div.find_all(['p', 'div'])]  # Find both <p> and <div> tags
-                content = ' '.join(paragraphs)
+        if found['date']:
+            date_of_publication = found['date'].text.strip()
 
-                # Now search for the last <p> containing <strong> to find the author
-                last_p_tag = content_div.find_all(['p', 'div'])[-1] if content_div.find_all(['p', 'div']) else None
-                if last_p_tag and last_p_tag.find('strong'):
-                    author = last_p_tag.find('strong').text.strip()
+        if found['content']:
+            # Both <p> and <div> tags of the article body
+            blocks = found['blocks']
+            content = ' '.join(block.get_text(strip=True) for block in blocks)
 
-                # Extract sublinks if available
-                sublinks = [urljoin(url, link['href']) for link in content_div.find_all('a', href=True)]
+            # The last block holds the author in a <strong>
+            last_strong = blocks[-1].find('strong') if blocks else None
+            if last_strong:
+                author = last_strong.text.strip()
 
-        except Exception as e:
-            logger.error(f"Error parsing article content from URL: {url}: {e}")
+            sublinks = [urljoin(url, link['href']) for link in found['links']]
 
-        return title, content, author, date_of_publication, sublinks 
+    except Exception as e:
+        logger.error(f"Error parsing article content from URL: {url}: {e}")
+
+    return title, content, author, date_of_publication, sublinks 
+
+def parse_article_dom(html_content, url):
+    """Extraction complète : arbre BeautifulSoup de la page"""
+    return parse_article_content(BeautifulSoup(html_content, 'html.parser'), url)
+
+# Date d'un article du site : jj/mm/aaaa, suivi de l'heure
+date_pattern = re.compile(r'\d{2}/\d{2}/\d{4}')
+
+def parse_article_markers(html_content, url):
+    """Chemin rapide : champs lus dans le HTML brut ; None si la page sort du gabarit habituel"""
+    title_div = fastpath.find(html_content, 'div', class_='titreArticleZen')
+    date_div = fastpath.find(html_content, 'div', class_='heureArticle fas fa-calendar')
+    content_div = fastpath.find(html_content, 'div', class_='contenue_article_zen')
+    if not (title_div and date_div and content_div):
+        return None
+    blocks = content_div.find_all(['p', 'div'])
+    # tag.text.strip() : chaînes jointes telles quelles, puis espaces retirés aux bords
+    title = ''.join(title_div.strings()).strip()
+    date_of_publication = ''.join(date_div.strings()).strip()
+    content = ' '.join(block.text() for block in blocks)
+    last_strong = blocks[-1].find('strong') if blocks else None
+    author = ''.join(last_strong.strings()).strip() if last_strong else 'Auteur non disponible'
+    sublinks = [urljoin(url, link['href']) for link in content_div.find_all('a', href=True)]
+    # Validation : titre et corps non vides, date au format du site (jj/mm/aaaa ...)
+    if not (title and content and date_pattern.match(date_of_publication)):
+        return None
+    return title, content, author, date_of_publication, sublinks
+
+# Chemin rapide par repères, repli sur l'arbre complet si la validation échoue ; la
+# sonde des identifiants garde l'arbre, qui lui sert aussi à lire l'URL canonique
+fast_path = fastpath.FastPath('BN', parse_article_markers, parse_article_dom)
 
 async def save_articles(data):
     try:
@@ -132,6 +214,24 @@ async def save_config(config):
     except Exception as e:
         logger.error(f"Error saving config to {config_file}: {e}")
 
+def load_articles():
+    """Articles déjà enregistrés, pour ne pas écraser les runs précédents."""
+    try:
+        with open(output_file, 'r', encoding='utf-8') as f:
+            return json.load(f).get('articles', {})
+    except (IOError, ValueError) as e:
+        logger.error(f"Error loading articles from {output_file}: {e}")
+        return {}
+
+def articles_data(all_category_articles):
+    return {
+        'journal_info': {
+            'journal_name': "Business News",  # Replace with actual journal name
+            'journal_url': "https://www.businessnews.com.tn"  # Replace with actual journal URL
+        },
+        'articles': all_category_articles
+    }
+
 async def scrape_article(session, article_url, seen_urls, all_category_articles, category):
     title, content, author, date_of_publication, tags = await fetch_article_content(session, article_url)
     if not title:
@@ -149,28 +249,247 @@ async def scrape_article(session, article_url, seen_urls, all_category_articles,
     all_category_articles.setdefault(category, []).append(article)
 
     # Save articles and update seen URLs after scraping each article
-    data = {
-        'journal_info': {
-            'journal_name': "Business News",  # Replace with actual journal name
-            'journal_url': "https://www.businessnews.com.tn"  # Replace with actual journal URL
-        },
-        'articles': all_category_articles
-    }
-    await save_articles(data)
+    await save_articles(articles_data(all_category_articles))
     seen_urls.add(article_url)
+    return article
+
+def load_cursors(category_names, all_category_articles):
+    """Curseurs tête/queue des catégories (repris de last_scraped_pages pour les anciennes configs)."""
+    saved = config.setdefault('cursors', {})
+    legacy = config.get('last_scraped_pages', {})
+    return {
+        category: ListingCursor.from_config(
+            saved.get(category, legacy.get(category)),
+            [article['url'] for article in all_category_articles.get(category, [])])
+        for category in category_names
+    }
 
-async def scrape_category(category, seen_urls, all_category_articles):
-    async with aiohttp.ClientSession() as session:
-        page_number = config['last_scraped_pages'].get(category, 1)
-        while True:
-            success = await scrape_page(session, category, page_number, seen_urls, all_category_articles)
-            if not success:
-                break
-            config['last_scraped_pages'][category] = page_number
-            await save_config(config)
-            page_number += 1
+async def save_cursors(cursors):
+    config['cursors'].update({category: cursor.to_dict() for category, cursor in cursors.items()})
+    config.pop('last_scraped_pages', None)
+    await save_config(config)
+
+async def crawl(session, category_names, seen_urls, all_category_articles, discovery=None):
+    """
+    Parcourt les catégories avec une frontière à deux voies et un curseur tête/queue
+    par catégorie :
+    - fresh : pages 1, 2, ... jusqu'à celle qui contient l'article le plus récent déjà
+      connu (au plus FRESH_MAX_PAGES pages), puis la page 1 de nouveau toutes les
+      HEAD_REFRESH_INTERVAL secondes tant que le run dure ;
+    - backfill : une fois la tête lue, l'archive reprend directement à la page où a
+      glissé l'article le plus ancien connu ; la dernière page est trouvée par
+      sondage, et les tranches de pages avancent en parallèle au rythme global
+      d'une page toutes les `backfill_interval` secondes.
+    Avec `discovery` (FeedDiscovery), les flux sont lus d'abord ; s'ils couvrent la tête
+    de toutes les catégories, l'archive démarre directement.
+    Renvoie (terminé, articles trouvés en tête de liste par catégorie) ; terminé vaut
+    False si le budget du run a été épuisé.
+    """
+    fresh_articles = {}
+    cursors = load_cursors(category_names, all_category_articles)
+    reading_head = set()
+    frontier = Frontier(config.get('backfill_interval', DEFAULT_BACKFILL_INTERVAL))
+
+    def start_head(category):
+        if category in reading_head:
+            return
+        reading_head.add(category)
+        cursors[category].start_head()
+        frontier.push((category, 1, None), FRESH, priority=1)
+
+    archive_started = set()
+
+    def start_archive(category):
+        # Une seule marche dans l'archive par catégorie et par run
+        if category in archive_started:
+            return
+        archive_started.add(category)
+        cursor = cursors[category]
+        page_number = cursor.archive_page()
+        if page_number is None:
+            return
+        if cursor.ranges:
+            # Reprise des tranches d'archive d'un run précédent
+            for page_range in cursor.ranges:
+                frontier.push((category, page_range[0], page_range), BACKFILL)
+        else:
+            frontier.push((category, page_number, None), BACKFILL)
+
+    async def split_archive(category, first_page):
+        """Cherche la dernière page de l'archive et la découpe en tranches lues en parallèle."""
+        async def has_articles(probe_page):
+            listing = []
+            articles = await scrape_page(session, category, probe_page, seen_urls, all_category_articles, listing)
+            return bool(listing or articles)
 
-async def scrape_page(session, category, page_number, seen_urls, all_category_articles):
+        cursor = cursors[category]
+        try:
+            last_page = await find_last_page(has_articles, first_page)
+        except ListingFetchError as e:
+            # Une page non lue fausserait la borne : découpage retenté au prochain run
+            logger.warning(f"Archive of category '{category}' not split, page not read ({e})")
+            return
+        if last_page is None:
+            cursor.finish_tail()
+            logger.info(f"Archive of category '{category}' exhausted at page {first_page}")
+            return
+        cursor.plan_ranges(first_page, last_page)
+        logger.info(f"Archive of category '{category}': pages {first_page}-{last_page} in {len(cursor.ranges)} ranges")
+        for page_range in cursor.ranges:
+            frontier.push((category, page_range[0], page_range), BACKFILL)
+
+    async def read_feeds():
+        """Articles annoncés par les flux ; renvoie True si les têtes n'ont pas à être relues."""
+        covered, found_articles = await scrape_feeds(session, discovery, seen_urls, all_category_articles)
+        for category, articles in found_articles.items():
+            fresh_articles.setdefault(category, []).extend(articles)
+            # Sinon la tête est relue depuis la page 1 et compte elle-même ces articles
+            if covered and category in cursors:
+                cursors[category].add_head(articles)
+        discovery.save()
+        await save_cursors(cursors)
+        return covered
+
+    heads_covered = discovery is not None and await read_feeds()
+    if heads_covered:
+        logger.info("Feeds cover every article newer than the known head, skipping head pages")
+    for category in category_names:
+        if cursors[category].has_head and not heads_covered:
+            start_head(category)
+        else:
+            # Rien de connu : toute la liste est de l'archive, à partir de la page 1
+            start_archive(category)
+
+    async def refresh_heads():
+        while True:
+            await asyncio.sleep(HEAD_REFRESH_INTERVAL)
+            if discovery is not None and await read_feeds():
+                continue
+            for category in category_names:
+                if cursors[category].has_head:
+                    start_head(category)
+
+    async def worker():
+        while True:
+            item = await frontier.get()
+            if item is None:
+                return
+            lane, (category, page_number, page_range) = item
+            cursor = cursors[category]
+            try:
+                if current_budget().exhausted():
+                    frontier.close()
+                    continue
+                listing = []
+                try:
+                    new_articles = await scrape_page(session, category, page_number, seen_urls, all_category_articles, listing)
+                except ListingFetchError as e:
+                    # Ni page vide ni fin de la liste : curseur inchangé, page relue au prochain run
+                    logger.warning(f"Page {page_number} of category '{category}' not read ({e}), left for the next run")
+                    if lane == FRESH:
+                        reading_head.discard(category)
+                        start_archive(category)
+                    continue
+                if lane == FRESH:
+                    fresh_articles.setdefault(category, []).extend(new_articles or [])
+                    more = (new_articles is not None or listing) and cursor.head_page(listing, new_articles or [])
+                    if more and page_number < FRESH_MAX_PAGES:
+                        frontier.push((category, page_number + 1, None), FRESH, priority=page_number + 1)
+                    else:
+                        cursor.finish_head()
+                        reading_head.discard(category)
+                        start_archive(category)
+                elif page_range is not None:
+                    next_page = cursor.range_page(page_range, page_number, listing, new_articles or [])
+                    if next_page is not None:
+                        frontier.push((category, next_page, page_range), BACKFILL)
+                    elif cursor.finish_ranges():
+                        logger.info(f"Archive of category '{category}' completed")
+                elif new_articles is None and not listing:
+                    cursor.finish_tail()
+                    logger.info(f"Archive of category '{category}' exhausted at page {page_number}")
+                else:
+                    next_page = cursor.tail_page(page_number, listing, new_articles or [])
+                    if cursor.locating:
+                        frontier.push((category, next_page, None), BACKFILL)
+                    else:
+                        await split_archive(category, next_page)
+                await save_cursors(cursors)
+            finally:
+                frontier.task_done()
+
+    refresher = asyncio.create_task(refresh_heads())
+    try:
+        await asyncio.gather(*(worker() for _ in range(PAGE_WORKERS)))
+    finally:
+        refresher.cancel()
+    logger.info(f"Crawled {frontier.served[FRESH]} head pages and {frontier.served[BACKFILL]} archive pages")
+    return not frontier.closed, fresh_articles
+
+async def scrape_feeds(session, discovery, seen_urls, all_category_articles):
+    """
+    Récupère les articles nouveaux ou modifiés (lastmod) annoncés par les flux, dans les
+    rubriques des catégories suivies. Renvoie (couvert, nouveaux articles par catégorie) :
+    couvert vaut True si les flux ont été lus sans erreur et contiennent tous les
+    identifiants postérieurs au plus récent déjà connu (les identifiants sont communs à
+    toutes les rubriques), ou s'ils n'ont pas changé depuis le run précédent.
+    """
+    known_high = max((i for i in map(article_id, seen_urls) if i is not None), default=None)
+    entries = await discovery.discover(session)
+    rubriques = rubrique_categories()
+    stored = {article['url']: article for articles in all_category_articles.values() for article in articles}
+    found_articles = {}
+
+    async def fetch_entry(entry, category):
+        if entry.status == CHANGED and entry.url in stored:
+            title, content, author, date_of_publication, tags = await fetch_article_content(session, entry.url)
+            if not title:
+                discovery.forget(entry.url)
+                return
+            stored[entry.url].update(title=title, content=content, author=author,
+                                     date_of_publication=date_of_publication, tags=tags)
+            logger.info(f"Updated article from feeds: {entry.url}")
+            return
+        seen_urls.add(entry.url)
+        article = await scrape_article(session, entry.url, seen_urls, all_category_articles, category)
+        if article:
+            found_articles.setdefault(category, []).append(article)
+        else:
+            seen_urls.discard(entry.url)
+            discovery.forget(entry.url)
+
+    tasks = []
+    for entry in entries:
+        match = ARTICLE_URL_IDS.search(entry.url)
+        category = match and rubriques.get(int(match.group(1)))
+        if category is None:
+            continue
+        if entry.status == CHANGED or (entry.url not in seen_urls and not dead_urls.blocked(entry.url)):
+            tasks.append(fetch_entry(entry, category))
+    await asyncio.gather(*tasks)
+    if tasks:
+        await save_articles(articles_data(all_category_articles))
+
+    if discovery.failed or known_high is None:
+        return False, found_articles
+    if not discovery.modified:
+        return True, found_articles
+    feed_ids = [i for i in map(article_id, discovery.read) if i is not None]
+    covered = bool(feed_ids) and min(feed_ids) <= known_high
+    logger.info(f"Feeds: {len(tasks)} articles fetched, IDs from {min(feed_ids, default=None)} "
+                f"({'covering' if covered else 'not covering'} the known head #{known_high})")
+    return covered, found_articles
+
+async def scrape_category(category, seen_urls, all_category_articles, session=None):
+    async with client_session(session) as session:
+        completed, fresh_articles = await crawl(session, [category], seen_urls, all_category_articles)
+    return completed
+
+async def scrape_page(session, category, page_number, seen_urls, all_category_articles, listing=None):
+    """
+    Renvoie les nouveaux articles de la page, ou None si la page est vide ou absente ;
+    lève ListingFetchError si elle n'a pas pu être lue.
+    """
     try:
         base_first_page = categories[category]['first_page']
         base_subsequent_pages = categories[category]['subsequent_pages']
@@ -181,47 +500,254 @@ async def scrape_page(session, category, page_number, seen_urls, all_category_ar
             url = f"{base_url}{base_subsequent_pages}{page_number}/"
 
         logger.debug(f"Scraping page {page_number} for category '{category}'")
-        html_content = await fetch(session, url)
+        html_content = await fetch_listing(fetch, session, url)
         if not html_content:
             logger.warning(f"No HTML content found for page {page_number} in category '{category}'")
-            return False
+            return None
 
         soup = BeautifulSoup(html_content, 'html.parser')
         article_elements = soup.find_all('div', class_='ligneListeArticle')
 
         if not article_elements:
             logger.warning(f"No articles found on page {page_number} in category '{category}'")
-            return False
+            return None
 
         tasks = []
         for item in article_elements:
             article_link = item.find('a', href=True) or item.find('a', href=True, class_='titreArticleListe')
             if article_link:
                 article_url = urljoin(base_url, article_link['href'])
-                if article_url in seen_urls:
+                if listing is not None:
+                    listing.append(article_url)
+                if article_url in seen_urls or dead_urls.blocked(article_url):
                     continue
                 seen_urls.add(article_url)
                 tasks.append(scrape_article(session, article_url, seen_urls, all_category_articles, category))
 
-        await asyncio.gather(*tasks)
-        logger.info(f"Scraped articles from page {page_number} in category '{category}'")
+        new_articles = [article for article in await asyncio.gather(*tasks) if article]
+        logger.info(f"Scraped {len(new_articles)} new articles from page {page_number} in category '{category}'")
 
-        return True
+        return new_articles
 
+    except ListingFetchError:
+        raise
     except Exception as e:
         logger.error(f"Exception while scraping page {page_number} in category '{category}': {e}")
-        return False
+        return None
 
-async def scrape_all_categories():
+@guarded_run(output_file + '.lock')
+async def scrape_all_categories(session=None):
     logger.info("Starting scraping process for all categories...")
-    all_category_articles = {}
+    all_category_articles = load_articles()
+    seen_urls = {article['url'] for articles in all_category_articles.values() for article in articles}
+
+    feeds = config.get('feeds')
+    discovery = FeedDiscovery(feeds, feeds_file) if feeds else None
 
-    for category in categories:
-        seen_urls = set()
-        await scrape_category(category, seen_urls, all_category_articles)
+    async with client_session(session) as session:
+        completed, fresh_articles = await crawl(session, list(categories), seen_urls, all_category_articles, discovery)
+    if not completed:
+        logger.warning(f"Run budget exhausted ({current_budget()}), the archive resumes from the saved cursors next run")
 
-    await save_articles(all_category_articles)
+    await save_articles(articles_data(all_category_articles))
     logger.info("Scraping process completed for all categories.")
+    logger.info(f"Fast path {fast_path.summary()}")
+    return fresh_articles
+
+def rubrique_categories():
+    """Numéro de rubrique -> catégorie, d'après les URLs de liste ('/liste/Autos/521/')."""
+    mapping = {}
+    for category, urls in categories.items():
+        match = re.search(r'/(\d+)/$', urls['subsequent_pages'])
+        if match:
+            mapping.setdefault(int(match.group(1)), category)
+    return mapping
+
+def load_id_state():
+    try:
+        with open(ids_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (IOError, ValueError) as e:
+        logger.error(f"Error loading {ids_file}: {e}")
+        return {}
+
+async def save_id_state(state):
+    try:
+        with open(ids_file, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, indent=4)
+    except IOError as e:
+        logger.error(f"Error saving {ids_file}: {e}")
+
+def keep_counted(state, counted, low, high):
+    """
+    Garde dans l'état les identifiants vides déjà comptés qui seront retestés : trous
+    récents, identifiants au-delà de `high` et lot d'archive en dessous de `low` à reprendre.
+    """
+    recent = set(state.get('recent_tombstones', []))
+    state['counted_tombstones'] = sorted(n for n in counted if n in recent or n > high or n < low)
+
+async def fetch_article_by_id(session, number):
+    """
+    Renvoie (url, rubrique, article) pour l'identifiant `number`, None si aucun
+    article ne lui correspond (404, page sans titre ou redirection vers un autre article),
+    ou UNAVAILABLE si le site n'a pas répondu (l'identifiant n'est pas un « tombstone »).
+    """
+    url = ID_URL.format(rubrique=DEFAULT_RUBRIQUE, article_id=number)
+    try:
+        async with semaphore:
+            response = await fetch_with_retries(session, url, stop_after=article_containers)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.warning(f"Error probing article #{number}: {e!r}")
+        return UNAVAILABLE
+    if response.status in (404, 410):
+        return None
+    if response.status != 200:
+        logger.warning(f"Unexpected response {response.status} probing article #{number}")
+        return UNAVAILABLE
+
+    soup = BeautifulSoup(response.body, 'html.parser')
+    canonical = soup.find('link', rel='canonical') or soup.find('meta', property='og:url')
+    canonical_url = canonical and (canonical.get('href') or canonical.get('content'))
+    match = ARTICLE_URL_IDS.search(canonical_url or '')
+    if match and int(match.group(2)) != number:
+        return None
+    article_url = urljoin(base_url, canonical_url) if match else url
+    rubrique = int(match.group(1)) if match else None
+
+    title, content, author, date_of_publication, tags = parse_article_content(soup, article_url)
+    if title == 'Titre non trouvé':
+        return None
+    return article_url, rubrique, {
+        'url': article_url,
+        'title': title,
+        'date_of_publication': date_of_publication,
+        'content': content,
+        'author': author,
+        'tags': tags
+    }
+
+@guarded_run(output_file + '.lock')
+async def discover_ids(session=None):
+    """
+    Découverte par énumération des identifiants, sans passer par les listes :
+    - vers le haut, à partir du plus grand identifiant connu, jusqu'à
+      MAX_CONSECUTIVE_MISSES identifiants vides d'affilée ; les trous des
+      RECHECK_WINDOW derniers identifiants sont retestés aux runs suivants ;
+    - vers le bas, MAX_IDS_PER_RUN identifiants par run, pour rattraper les
+      articles absents des listes ou manqués.
+    Les identifiants vides (« tombstones ») sont comptés dans ids.json, qui garde
+    aussi les bornes déjà parcourues. Un identifiant retesté (trou récent, identifiant
+    au-delà de la tête, lot d'archive à reprendre) n'est compté qu'une fois : ids.json
+    garde ceux déjà comptés qui peuvent être retestés. Renvoie les articles trouvés par catégorie.
+    """
+    logger.info("Starting article ID discovery...")
+    all_category_articles = load_articles()
+    known_ids = {article_id(article['url']) for articles in all_category_articles.values() for article in articles}
+    known_ids.discard(None)
+    state = load_id_state()
+    if not known_ids and 'high' not in state:
+        logger.warning("No known article ID to start from, run scrape_all_categories first")
+        return {}
+
+    high = state.get('high', max(known_ids, default=0))
+    low = state.get('low', high + 1)
+    recent_tombstones = [number for number in state.get('recent_tombstones', []) if number > high - RECHECK_WINDOW]
+    # Identifiants déjà comptés comme vides (les ids.json anciens n'ont que les trous récents)
+    counted = set(state.get('counted_tombstones', recent_tombstones))
+    rubriques = rubrique_categories()
+    found_articles = {}
+
+    async def probe(numbers):
+        """
+        Teste un lot d'identifiants ; renvoie ceux qui correspondent à un article et
+        ceux restés sans réponse.
+        """
+        results = await asyncio.gather(*(fetch_article_by_id(session, number) for number in numbers))
+        hits = []
+        failed = []
+        for number, result in zip(numbers, results):
+            if result is UNAVAILABLE:
+                failed.append(number)
+                continue
+            if result is None:
+                if number not in counted:
+                    counted.add(number)
+                    state['tombstones'] = state.get('tombstones', 0) + 1
+                continue
+            article_url, rubrique, article = result
+            category = rubriques.get(rubrique, OTHER_CATEGORY)
+            known_ids.add(number)
+            hits.append(number)
+            all_category_articles.setdefault(category, []).append(article)
+            found_articles.setdefault(category, []).append(article)
+            logger.info(f"Found article #{number} in '{category}': {article_url}")
+        if hits:
+            await save_articles(articles_data(all_category_articles))
+        await asyncio.sleep(ID_BATCH_INTERVAL)
+        return hits, failed
+
+    def batches(numbers):
+        numbers = [number for number in numbers if number not in known_ids]
+        for start in range(0, len(numbers), ID_BATCH):
+            yield numbers[start:start + ID_BATCH]
+
+    async with client_session(session) as session:
+        # Tête : trous récents puis identifiants au-delà du plus grand connu
+        still_missing = []
+        for numbers in batches(recent_tombstones):
+            if current_budget().exhausted():
+                break
+            hits, _ = await probe(numbers)
+            still_missing.extend(number for number in numbers if number not in hits)
+        number = high + 1
+        misses = 0
+        while misses < MAX_CONSECUTIVE_MISSES and not current_budget().exhausted():
+            numbers = list(range(number, number + ID_BATCH))
+            # Les articles déjà trouvés par les listes comptent comme présents
+            hits = [n for n in numbers if n in known_ids]
+            unknown = [n for n in numbers if n not in known_ids]
+            failed = []
+            if unknown:
+                found, failed = await probe(unknown)
+                hits += found
+            number += ID_BATCH
+            if hits:
+                misses = number - 1 - max(hits)
+                still_missing.extend(n for n in range(high + 1, max(hits)) if n not in known_ids)
+                high = max(hits)
+            else:
+                misses += ID_BATCH
+            if failed:
+                # Le site ne répond pas : la tête sera reprise au prochain run après `high`
+                # (les identifiants sans réponse en dessous sont dans still_missing)
+                break
+        state['high'] = high
+        state['recent_tombstones'] = sorted(set(n for n in still_missing if n > high - RECHECK_WINDOW and n not in known_ids))
+        keep_counted(state, counted, low, high)
+        await save_id_state(state)
+
+        # Archive : identifiants plus anciens, par lots, dans la limite du run
+        stop = max(low - MAX_IDS_PER_RUN, 1)
+        while low > stop and not current_budget().exhausted():
+            numbers = list(range(low - 1, max(low - 1 - ID_BATCH, stop - 1), -1))
+            failed = []
+            for batch in batches(numbers):
+                failed += (await probe(batch))[1]
+            if failed:
+                # Lot repris au prochain run (les articles trouvés ne sont pas retestés)
+                break
+            low = numbers[-1]
+            state['low'] = low
+            keep_counted(state, counted, low, high)
+            await save_id_state(state)
+    keep_counted(state, counted, low, high)
+    await save_id_state(state)
+
+    logger.info(f"ID discovery finished: {sum(len(a) for a in found_articles.values())} new articles, "
+                f"IDs {low}-{high} covered, {state.get('tombstones', 0)} tombstones so far")
+    return found_articles
 
 def job():
     logger.info("Scheduled job started.")
@@ -230,6 +756,11 @@ def job():
 if __name__ == "__main__":
     logger.info("Script started")
 
+    if '--ids' in sys.argv[1:]:
+        # Découverte par identifiant, une seule fois
+        asyncio.run(discover_ids())
+        sys.exit(0)
+
     # Run the initial scraping process synchronously
     asyncio.run(scrape_all_categories())
 
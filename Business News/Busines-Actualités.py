@@ -2,16 +2,39 @@ import aiohttp
 import asyncio
 from bs4 import BeautifulSoup
 import json
+import re
 import os
 import schedule
 import time
+import sys
 from urllib.parse import urljoin
 from datetime import datetime
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.article_index import ArticleFile
+from common.session import client_session
+from common.run_guard import guarded_run
+from common.singleflight import coalesce_fetch, coalesce_result
+from common.retry import fetch_with_retries
+from common.negative_cache import GONE, SERVER_ERROR, dead_urls, track_failures
+from common.parse_cache import parse_cache
+from common.raw_pages import raw_pages
+from common.revisit import revisits
+from common.cursor import ListingCursor, crawl_listing, fetch_listing
+from common import fastpath
+
 # Chemins de sortie
 output_file = os.path.join(os.getcwd(), 'Actualite.json')
 config_file = os.path.join(os.getcwd(), 'configb.json')
 
+# Fichier de sortie avec index des URLs (<fichier>.idx)
+articles_file = ArticleFile(output_file, ["Dernières_News", "articles"], {
+    "nom_de_la_presse": "Business News",
+    "Dernières_News": {
+        "articles": []
+    }
+})
+
 # URL de base pour les articles
 base_url_first_page = 'https://www.businessnews.com.tn/dernieres-news'
 base_url_other_pages = 'https://www.businessnews.com.tn/liste/Dernieres_News/520/'
@@ -19,34 +42,110 @@ article_base_url = 'https://www.businessnews.com.tn/'
 
 # Limiter le nombre de requêtes simultanées
 semaphore = asyncio.Semaphore(5)
+# Éléments lus par fetch_article_content : la page n'est plus lue une fois tous refermés
+article_containers = [('div', 'titreArticleZen'), ('div', 'heureArticle fas fa-calendar'), ('div', 'auteur_artilce_zen'), ('div', 'contenue_article_zen')]
 
-async def fetch(session, url):
+@coalesce_fetch
+async def fetch(session, url, stop_after=None):
     """Fonction asynchrone pour récupérer le contenu HTML d'une URL"""
-    retries = 3
-    for i in range(retries):
-        try:
-            async with session.get(url) as response:
-                if response.status == 200:
-                    print(f"Fetching URL: {url}")
-                    return await response.text()
-                elif response.status == 404:
-                    print(f"Page not found (404 error) for URL: {url}")
-                    return None
-                else:
-                    print(f"Unexpected response {response.status} for URL: {url}")
-                    return None
-        except aiohttp.ClientError as e:
-            print(f"Error fetching URL {url}: {e}")
-            if i < retries - 1:
-                await asyncio.sleep(2 ** i)  # Exponential backoff
-            else:
-                raise
-    return None
+    try:
+        response = await fetch_with_retries(session, url, stop_after=stop_after)
+    except aiohttp.ClientError as e:
+        print(f"Error fetching URL {url}: {e}")
+        raise
+    if response.status == 200:
+        dead_urls.fetched(url)
+        print(f"Fetching URL: {url}")
+        return response.body
+    elif response.status in (404, 410):
+        dead_urls.record(url, GONE)
+        print(f"Page not found (404 error) for URL: {url}")
+        return None
+    else:
+        # 403, 429 après les tentatives... : rien d'enregistré, la page n'a pas été lue
+        if response.status >= 500:
+            dead_urls.record(url, SERVER_ERROR)
+        print(f"Unexpected response {response.status} for URL: {url}")
+        return None
+
+def parse_article_dom(html_content, url):
+    """Extraction complète : arbre BeautifulSoup de la page"""
+    soup = BeautifulSoup(html_content, 'html.parser')
 
+    article_content = {
+        'titre': '',
+        'auteur': '',
+        'date': '',
+        'contenu': '',
+        'url': url,
+        'sublinks': []
+    }
+
+    # Extract title
+    title_div = soup.find('div', class_='titreArticleZen')
+    article_content['titre'] = title_div.get_text(strip=True) if title_div else 'Titre non disponible'
+
+    # Extract content
+    content_div = soup.find('div', class_='contenue_article_zen')
+    if content_div:
+        paragraphs = content_div.find_all('p')
+        article_content['contenu'] = '\n'.join([p.get_text(strip=True) for p in paragraphs])
+
+    # Extract author if available
+    author_div = soup.find('div', class_='auteur_artilce_zen')
+    article_content['auteur'] = author_div.get_text(strip=True) if author_div else 'Auteur non disponible'
+
+    # Extract publish date if available
+    date_div = soup.find('div', class_='heureArticle fas fa-calendar')
+    article_content['date'] = date_div.get_text(strip=True) if date_div else 'Date non disponible'
+
+    # Extract sublinks if available
+    sublinks_div = content_div.find_all('a', href=True) if content_div else []
+    article_content['sublinks'] = [urljoin(article_base_url, link['href']) for link in sublinks_div]
+
+    return article_content
+
+# Date d'un article du site : jj/mm/aaaa, suivi de l'heure
+date_pattern = re.compile(r'\d{2}/\d{2}/\d{4}')
+
+def parse_article_markers(html_content, url):
+    """Chemin rapide : champs lus dans le HTML brut ; None si la page sort du gabarit habituel"""
+    title_div = fastpath.find(html_content, 'div', class_='titreArticleZen')
+    content_div = fastpath.find(html_content, 'div', class_='contenue_article_zen')
+    author_div = fastpath.find(html_content, 'div', class_='auteur_artilce_zen')
+    date_div = fastpath.find(html_content, 'div', class_='heureArticle fas fa-calendar')
+    if not (title_div and content_div and author_div and date_div):
+        return None
+    article_content = {
+        'titre': title_div.text(),
+        'auteur': author_div.text(),
+        'date': date_div.text(),
+        'contenu': '\n'.join([p.text() for p in content_div.find_all('p')]),
+        'url': url,
+        'sublinks': [urljoin(article_base_url, link['href']) for link in content_div.find_all('a', href=True)]
+    }
+    # Validation : titre et corps non vides, date au format du site (jj/mm/aaaa ...)
+    if not (article_content['titre'] and article_content['contenu'] and date_pattern.match(article_content['date'])):
+        return None
+    return article_content
+
+# Extracteur des articles : incrémenter la version quand l'extraction change (invalide
+# les résultats en cache et date les articles réextraits depuis les pages brutes)
+EXTRACTOR = 'Busines-Actualités'
+EXTRACTOR_VERSION = 1
+# Chemin rapide par repères, repli sur l'arbre complet si la validation échoue
+fast_path = fastpath.FastPath(EXTRACTOR, parse_article_markers, parse_article_dom)
+# Résultats gardés par hash de la page
+parse_article = parse_cache.cached(EXTRACTOR, EXTRACTOR_VERSION, fast_path)
+
+@coalesce_result
+@track_failures
 async def fetch_article_content(session, url):
     async with semaphore:
         print(f"Fetching article content from URL: {url}")
-        html_content = await fetch(session, url)
+        # Page entière si elle est gardée pour les réextractions (common.raw_pages)
+        stop_after = raw_pages.cutoff(article_containers)
+        html_content = await fetch(session, url, stop_after=stop_after)
         if html_content is None:
             return {
                 'titre': 'Titre non disponible',
@@ -57,49 +156,19 @@ async def fetch_article_content(session, url):
                 'sublinks': []
             }
 
-        soup = BeautifulSoup(html_content, 'html.parser')
-
-        article_content = {
-            'titre': '',
-            'auteur': '',
-            'date': '',
-            'contenu': '',
-            'url': url,
-            'sublinks': []
-        }
-
-        # Extract title
-        title_div = soup.find('div', class_='titreArticleZen')
-        article_content['titre'] = title_div.get_text(strip=True) if title_div else 'Titre non disponible'
-
-        # Extract content
-        content_div = soup.find('div', class_='contenue_article_zen')
-        if content_div:
-            paragraphs = content_div.find_all('p')
-            article_content['contenu'] = '\n'.join([p.get_text(strip=True) for p in paragraphs])
-
-        # Extract author if available
-        author_div = soup.find('div', class_='auteur_artilce_zen')
-        article_content['auteur'] = author_div.get_text(strip=True) if author_div else 'Auteur non disponible'
-
-        # Extract publish date if available
-        date_div = soup.find('div', class_='heureArticle fas fa-calendar')
-        article_content['date'] = date_div.get_text(strip=True) if date_div else 'Date non disponible'
-
-        # Extract sublinks if available
-        sublinks_div = content_div.find_all('a', href=True) if content_div else []
-        article_content['sublinks'] = [urljoin(article_base_url, link['href']) for link in sublinks_div]
-
+        article_content = await parse_article(html_content, url)
+        raw_pages.add(EXTRACTOR, EXTRACTOR_VERSION, url, html_content, article_content, stop_after)
+        revisits.track(EXTRACTOR, EXTRACTOR_VERSION, url, article_content)
         return article_content
 
-async def scrape_page(session, page_number, seen_urls):
+async def scrape_page(session, page_number, seen_urls, listing=None):
     if page_number == 1:
         url = base_url_first_page
     else:
         url = base_url_other_pages + str(page_number)
     
     print(f"Scraping page {page_number} with URL: {url}")
-    html_content = await fetch(session, url)
+    html_content = await fetch_listing(fetch, session, url)
     if html_content is None:
         print(f"No HTML content fetched for page {page_number}")
         return None
@@ -119,7 +188,9 @@ async def scrape_page(session, page_number, seen_urls):
         article_link = item.find('a', href=True)
         if article_link:
             article_url = urljoin(article_base_url, article_link['href'])
-            if article_url in seen_urls:
+            if listing is not None:
+                listing.append(article_url)
+            if article_url in seen_urls or dead_urls.blocked(article_url):
                 continue
             seen_urls.add(article_url)
             article['url'] = article_url
@@ -136,15 +207,22 @@ async def scrape_page(session, page_number, seen_urls):
     print(f"Scraped {len(articles)} articles from page {page_number}")
     return articles
 
-async def save_articles(data):
+async def save_articles(articles):
     """Fonction asynchrone pour sauvegarder les articles dans un fichier JSON"""
     try:
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
-        print(f"Saved {len(data['Dernières_News']['articles'])} articles to {output_file}")
+        articles_file.append(articles)
+        print(f"Saved {len(articles_file)} articles to {output_file}")
     except IOError as e:
         print(f"Error saving articles: {e}")
 
+async def update_articles(articles):
+    """Fonction asynchrone pour remplacer dans le fichier JSON les articles modifiés"""
+    try:
+        articles_file.replace(articles)
+        print(f"Updated {len(articles)} articles in {output_file}")
+    except IOError as e:
+        print(f"Error updating articles: {e}")
+
 async def save_config(config):
     """Fonction asynchrone pour sauvegarder les configurations dans un fichier JSON"""
     try:
@@ -154,61 +232,41 @@ async def save_config(config):
     except IOError as e:
         print(f"Error saving config: {e}")
 
-async def scrape_all_articles():
+@guarded_run(output_file + '.lock')
+async def scrape_all_articles(session=None):
     print("Starting scraping process...")
-    all_articles = []
-    seen_urls = set()
-
-    if os.path.exists(output_file):
-        try:
-            with open(output_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                existing_articles = data.get("Dernières_News", {}).get("articles", [])
-                for article in existing_articles:
-                    seen_urls.add(article["url"])
-        except IOError as e:
-            print(f"Error loading existing file: {e}")
-            data = {
-                "nom_de_la_presse": "Business News",
-                "Dernières_News": {
-                    "articles": []
-                }
-            }
-    else:
-        print(f"File not found. Creating new structure.")
-        data = {
-            "nom_de_la_presse": "Business News",
-            "Dernières_News": {
-                "articles": []
-            }
-        }
+    # Charger l'index du fichier existant (le JSON complet n'est relu que si l'index manque)
+    articles_file.load()
+    seen_urls = articles_file.seen_urls()
 
+    config = {}
     if os.path.exists(config_file):
         try:
             with open(config_file, 'r', encoding='utf-8') as f:
                 config = json.load(f)
-                last_page_scraped = config.get('last_page_scraped', 1)
         except IOError as e:
             print(f"Error loading config file: {e}")
-            last_page_scraped = 1
-    else:
-        last_page_scraped = 1
-
-    async with aiohttp.ClientSession() as session:
-        page_number = last_page_scraped
-        while True:
-            articles = await scrape_page(session, page_number, seen_urls)
-            if not articles:
-                print(f"No more articles found after page {page_number - 1}")
-                break
-            all_articles.extend(articles)
-            page_number += 1
-
-            data["Dernières_News"]["articles"].extend(articles)
-            await save_articles(data)
-            await save_config({'last_page_scraped': page_number})
+    # Curseur tête/queue de la catégorie (les anciennes configs n'ont que last_page_scraped)
+    cursor = ListingCursor.from_config(config.get('cursor', config.get('last_page_scraped')), articles_file.urls())
+
+    async with client_session(session) as session:
+        async def scrape(page_number, listing):
+            return await scrape_page(session, page_number, seen_urls, listing)
+
+        async def save(articles):
+            if articles:
+                await save_articles(articles)
+            await save_config({'cursor': cursor.to_dict()})
+
+        all_articles = await crawl_listing(cursor, scrape, save)
+        # Articles récents revérifiés selon leur âge : remplacés dans le fichier s'ils ont changé
+        updated = await revisits.revisit(session, EXTRACTOR, EXTRACTOR_VERSION, articles_file, parse_article, article_containers)
+        if updated:
+            await update_articles(updated)
 
     print("Scraping process completed.")
+    print(f"Fast path {fast_path.summary()}")
+    return all_articles
 
 def run_scraping_job():
     asyncio.run(scrape_all_articles())
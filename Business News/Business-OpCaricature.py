@@ -5,12 +5,30 @@ import json
 import os
 import schedule
 import time
+import sys
 from urllib.parse import urljoin
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.article_index import ArticleFile
+from common.session import client_session
+from common.run_guard import guarded_run
+from common.singleflight import coalesce_fetch
+from common.retry import fetch_with_retries
+from common.negative_cache import GONE, SERVER_ERROR, dead_urls
+from common.cursor import ListingCursor, crawl_listing, fetch_listing
+
 # Chemins de sortie
 output_file = os.path.join(os.getcwd(), 'OpCaricature.json')
 config_file = os.path.join(os.getcwd(), 'configb4.json')
 
+# Fichier de sortie avec index des URLs (<fichier>.idx)
+articles_file = ArticleFile(output_file, ["Opinion_Caricature", "articles"], {
+    "nom_de_la_presse": "Business News",
+    "Opinion_Caricature": {
+        "articles": []
+    }
+})
+
 # URL de base pour les articles
 base_url_first_page = 'https://www.businessnews.com.tn/Caricatures'
 base_url_other_pages = 'https://www.businessnews.com.tn/liste/Caricatures/527/'
@@ -19,28 +37,28 @@ article_base_url = 'https://www.businessnews.com.tn/'
 # Limiter le nombre de requêtes simultanées
 semaphore = asyncio.Semaphore(5)
 
+@coalesce_fetch
 async def fetch(session, url):
     """Fonction asynchrone pour récupérer le contenu HTML d'une URL"""
-    retries = 3
-    for i in range(retries):
-        try:
-            async with session.get(url) as response:
-                if response.status == 200:
-                    print(f"Fetching URL: {url}")
-                    return await response.text()
-                elif response.status == 404:
-                    print(f"Page not found (404 error) for URL: {url}")
-                    return None
-                else:
-                    print(f"Unexpected response {response.status} for URL: {url}")
-                    return None
-        except aiohttp.ClientError as e:
-            print(f"Error fetching URL {url}: {e}")
-            if i < retries - 1:
-                await asyncio.sleep(2 ** i)  # Exponential backoff
-            else:
-                raise
-    return None
+    try:
+        response = await fetch_with_retries(session, url)
+    except aiohttp.ClientError as e:
+        print(f"Error fetching URL {url}: {e}")
+        raise
+    if response.status == 200:
+        dead_urls.fetched(url)
+        print(f"Fetching URL: {url}")
+        return response.body
+    elif response.status in (404, 410):
+        dead_urls.record(url, GONE)
+        print(f"Page not found (404 error) for URL: {url}")
+        return None
+    else:
+        # 403, 429 après les tentatives... : rien d'enregistré, la page n'a pas été lue
+        if response.status >= 500:
+            dead_urls.record(url, SERVER_ERROR)
+        print(f"Unexpected response {response.status} for URL: {url}")
+        return None
 
 async def scrape_page(session, page_number):
     if page_number == 1:
@@ -49,7 +67,7 @@ async def scrape_page(session, page_number):
         url = base_url_other_pages + str(page_number)
     
     print(f"Scraping page {page_number} with URL: {url}")
-    html_content = await fetch(session, url)
+    html_content = await fetch_listing(fetch, session, url)
     if html_content is None:
         return None
 
@@ -85,12 +103,11 @@ async def scrape_page(session, page_number):
     print(f"Scraped {len(articles)} articles from page {page_number}")
     return articles
 
-async def save_articles(data):
+async def save_articles(articles):
     """Fonction asynchrone pour sauvegarder les articles dans un fichier JSON"""
     try:
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
-        print(f"Saved {len(data['Opinion_Caricature']['articles'])} articles to {output_file}")
+        articles_file.append(articles)
+        print(f"Saved {len(articles_file)} articles to {output_file}")
     except IOError as e:
         print(f"Error saving articles: {e}")
 
@@ -103,58 +120,35 @@ async def save_config(config):
     except IOError as e:
         print(f"Error saving config: {e}")
 
-async def scrape_all_articles():
+@guarded_run(output_file + '.lock')
+async def scrape_all_articles(session=None):
     print("Starting scraping process...")
-    all_articles = []
-
-    if os.path.exists(output_file):
-        try:
-            with open(output_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                existing_articles = data.get("Opinion_Caricature", {}).get("articles", [])
-                all_articles.extend(existing_articles)
-        except IOError as e:
-            print(f"Error loading existing file: {e}")
-            data = {
-                "nom_de_la_presse": "Business News",
-                "Opinion_Caricature": {
-                    "articles": []
-                }
-            }
-    else:
-        print(f"File not found. Creating new structure.")
-        data = {
-            "nom_de_la_presse": "Business News",
-            "Opinion_Caricature": {
-                "articles": []
-            }
-        }
+    # Charger l'index du fichier existant (le JSON complet n'est relu que si l'index manque)
+    articles_file.load()
 
+    config = {}
     if os.path.exists(config_file):
         try:
             with open(config_file, 'r', encoding='utf-8') as f:
                 config = json.load(f)
-                last_page_scraped = config.get('last_page_scraped', 1)
         except IOError as e:
             print(f"Error loading config file: {e}")
-            last_page_scraped = 1
-    else:
-        last_page_scraped = 1
+    # Curseur tête/queue de la catégorie (les anciennes configs n'ont que last_page_scraped)
+    cursor = ListingCursor.from_config(config.get('cursor', config.get('last_page_scraped')), articles_file.urls())
+
+    async with client_session(session) as session:
+        async def scrape(page_number, listing):
+            return await scrape_page(session, page_number)
 
-    async with aiohttp.ClientSession() as session:
-        page_number = last_page_scraped
-        while True:
-            articles = await scrape_page(session, page_number)
-            if not articles:
-                break
-            all_articles.extend(articles)
-            page_number += 1
+        async def save(articles):
+            if articles:
+                await save_articles(articles)
+            await save_config({'cursor': cursor.to_dict()})
 
-            data["Opinion_Caricature"]["articles"].extend(articles)
-            await save_articles(data)
-            await save_config({'last_page_scraped': page_number})
+        all_articles = await crawl_listing(cursor, scrape, save)
 
     print("Scraping process completed.")
+    return all_articles
 
 def run_scraping_job():
     asyncio.run(scrape_all_articles())
@@ -2,15 +2,39 @@ import aiohttp
 import asyncio
 from bs4 import BeautifulSoup
 import json
+import re
 import os
 import schedule
 import time
+import sys
 from urllib.parse import urljoin
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.article_index import ArticleFile
+from common.session import client_session
+from common.run_guard import guarded_run
+from common.singleflight import coalesce_fetch, coalesce_result
+from common.retry import fetch_with_retries
+from common.negative_cache import GONE, SERVER_ERROR, dead_urls, track_failures
+from common.parse_cache import parse_cache
+from common.raw_pages import raw_pages
+from common.revisit import revisits
+from common.extract import All, Extractor, First, Select
+from common.cursor import ListingCursor, crawl_listing, fetch_listing
+from common import fastpath
+
 # Chemins de sortie
 output_file = os.path.join(os.getcwd(), 'OpTribunes.json')
 config_file = os.path.join(os.getcwd(), 'configb3.json')
 
+# Fichier de sortie avec index des URLs (<fichier>.idx)
+articles_file = ArticleFile(output_file, ["Opinion_Tribunes", "articles"], {
+    "nom_de_la_presse": "Business News",
+    "Opinion_Tribunes": {
+        "articles": []
+    }
+})
+
 # URL de base pour les articles
 base_url_first_page = 'https://www.businessnews.com.tn/Tribunes'
 base_url_other_pages = 'https://www.businessnews.com.tn/liste/Tribunes/526/'
@@ -18,34 +42,158 @@ article_base_url = 'https://www.businessnews.com.tn/'
 
 # Limiter le nombre de requêtes simultanées
 semaphore = asyncio.Semaphore(5)
-
-async def fetch(session, url):
+# Page lue entière (pas de coupure après les conteneurs) : la signature alignée à
+# droite est cherchée dans toute la page, y compris après l'article
+article_containers = None
+# Règles d'extraction d'un article, évaluées en un seul parcours de la page
+article_rules = Extractor(
+    title=First(Select('div', class_='titreArticleZen')),
+    date=First(Select('div', class_='heureArticle fas fa-calendar')),
+    content=First(Select('div', class_='contenue_article_zen'), Select('div', dir='auto')),
+    links=All(Select('a', href=True), within='content'),
+    signature_div=First(Select('div', style='text-align: right;', dir='auto')),
+    signature_div_strong=First(Select('strong'), within='signature_div'),
+    signature=First(Select('p', style='text-align: right;')),
+    signature_em=First(Select('em'), within='signature'),
+    signature_strong=First(Select('strong'), within='signature'),
+)
+
+@coalesce_fetch
+async def fetch(session, url, stop_after=None):
     """Fonction asynchrone pour récupérer le contenu HTML d'une URL"""
-    retries = 3
-    for i in range(retries):
-        try:
-            async with session.get(url) as response:
-                if response.status == 200:
-                    print(f"Fetching URL: {url}")
-                    return await response.text()
-                elif response.status == 404:
-                    print(f"Page not found (404 error) for URL: {url}")
-                    return None
-                else:
-                    print(f"Unexpected response {response.status} for URL: {url}")
-                    return None
-        except aiohttp.ClientError as e:
-            print(f"Error fetching URL {url}: {e}")
-            if i < retries - 1:
-                await asyncio.sleep(2 ** i)  # Exponential backoff
-            else:
-                raise
-    return None
+    try:
+        response = await fetch_with_retries(session, url, stop_after=stop_after)
+    except aiohttp.ClientError as e:
+        print(f"Error fetching URL {url}: {e}")
+        raise
+    if response.status == 200:
+        dead_urls.fetched(url)
+        print(f"Fetching URL: {url}")
+        return response.body
+    elif response.status in (404, 410):
+        dead_urls.record(url, GONE)
+        print(f"Page not found (404 error) for URL: {url}")
+        return None
+    else:
+        # 403, 429 après les tentatives... : rien d'enregistré, la page n'a pas été lue
+        if response.status >= 500:
+            dead_urls.record(url, SERVER_ERROR)
+        print(f"Unexpected response {response.status} for URL: {url}")
+        return None
+
+def parse_article_dom(html_content, url):
+    """Extraction complète : arbre BeautifulSoup de la page"""
+    soup = BeautifulSoup(html_content, 'html.parser')
+
+    article_content = {
+        'titre': '',
+        'auteur': '',
+        'date': '',
+        'contenu': '',
+        'url': url,
+        'sublinks': []
+    }
+
+    found = article_rules.run(soup)
+
+    # Extract title
+    title_div = found['title']
+    article_content['titre'] = title_div.get_text(strip=True) if title_div else 'Titre non disponible'
+
+    # Extract publish date if available
+    date_div = found['date']
+    article_content['date'] = date_div.get_text(strip=True) if date_div else 'Date non disponible'
+
+    # Extract content from 'contenue_article_zen' or 'div[dir="auto"]'
+    content_div = found['content']
+    content_strings = list(content_div.strings) if content_div else ['Contenu non disponible']
+
+    # Extract author if available
+    author_text = None
+    # Check different locations for author information
+    if found['signature_div'] and found['signature_div_strong']:
+        author_text = found['signature_div_strong'].get_text(strip=True)
+    elif found['signature']:
+        if found['signature_em'] and found['signature_strong']:
+            author_text = found['signature_em'].get_text(strip=True) + " " + found['signature_strong'].get_text(strip=True)
+        elif found['signature_strong']:
+            author_text = found['signature_strong'].get_text(strip=True)
+
+    article_content['auteur'] = author_text if author_text else 'Auteur non disponible'
+
+    # Remove author from content if present
+    if author_text:
+        content_strings = [string.replace(author_text, '') for string in content_strings]
+
+    # Extract sublinks if available
+    article_content['sublinks'] = [urljoin(url, link['href']) for link in found['links']]
+
+    # Text of the content, one line per string (strong/em are plain text)
+    article_content['contenu'] = '\n'.join(filter(None, (string.strip() for string in content_strings)))
+
+    return article_content
 
+
+
+# Date d'un article du site : jj/mm/aaaa, suivi de l'heure
+date_pattern = re.compile(r'\d{2}/\d{2}/\d{4}')
+
+def parse_article_markers(html_content, url):
+    """Chemin rapide : champs lus dans le HTML brut ; None si la page sort du gabarit habituel"""
+    title_div = fastpath.find(html_content, 'div', class_='titreArticleZen')
+    date_div = fastpath.find(html_content, 'div', class_='heureArticle fas fa-calendar')
+    content_div = fastpath.find(html_content, 'div', class_='contenue_article_zen')
+    if not (title_div and date_div and content_div):
+        return None
+
+    # Signature : mêmes emplacements et même ordre que article_rules
+    author_text = None
+    signature_div = fastpath.find(html_content, 'div', style='text-align: right;', dir='auto')
+    signature_div_strong = signature_div.find('strong') if signature_div else None
+    signature = fastpath.find(html_content, 'p', style='text-align: right;')
+    if signature_div and signature_div_strong:
+        author_text = signature_div_strong.text()
+    elif signature:
+        signature_em = signature.find('em')
+        signature_strong = signature.find('strong')
+        if signature_em and signature_strong:
+            author_text = signature_em.text() + " " + signature_strong.text()
+        elif signature_strong:
+            author_text = signature_strong.text()
+
+    content_strings = content_div.strings()
+    if author_text:
+        content_strings = [string.replace(author_text, '') for string in content_strings]
+    article_content = {
+        'titre': title_div.text(),
+        'auteur': author_text if author_text else 'Auteur non disponible',
+        'date': date_div.text(),
+        'contenu': '\n'.join(filter(None, (string.strip() for string in content_strings))),
+        'url': url,
+        'sublinks': [urljoin(url, link['href']) for link in content_div.find_all('a', href=True)]
+    }
+    # Validation : titre et corps non vides, date au format du site (jj/mm/aaaa ...)
+    if not (article_content['titre'] and article_content['contenu'] and date_pattern.match(article_content['date'])):
+        return None
+    return article_content
+
+# Extracteur des articles : incrémenter la version quand l'extraction change (invalide
+# les résultats en cache et date les articles réextraits depuis les pages brutes)
+EXTRACTOR = 'Business-OpTribunes'
+EXTRACTOR_VERSION = 1
+# Chemin rapide par repères, repli sur l'arbre complet si la validation échoue
+fast_path = fastpath.FastPath(EXTRACTOR, parse_article_markers, parse_article_dom)
+# Résultats gardés par hash de la page
+parse_article = parse_cache.cached(EXTRACTOR, EXTRACTOR_VERSION, fast_path)
+
+@coalesce_result
+@track_failures
 async def fetch_article_content(session, url):
     async with semaphore:
         print(f"Fetching article content from URL: {url}")
-        html_content = await fetch(session, url)
+        # Page entière si elle est gardée pour les réextractions (common.raw_pages)
+        stop_after = raw_pages.cutoff(article_containers)
+        html_content = await fetch(session, url, stop_after=stop_after)
         if html_content is None:
             return {
                 'titre': 'Titre non disponible',
@@ -56,77 +204,18 @@ async def fetch_article_content(session, url):
                 'sublinks': []
             }
 
-        soup = BeautifulSoup(html_content, 'html.parser')
-
-        article_content = {
-            'titre': '',
-            'auteur': '',
-            'date': '',
-            'contenu': '',
-            'url': url,
-            'sublinks': []
-        }
-
-        # Extract title
-        title_div = soup.find('div', class_='titreArticleZen')
-        article_content['titre'] = title_div.get_text(strip=True) if title_div else 'Titre non disponible'
-
-        # Extract publish date if available
-        date_div = soup.find('div', class_='heureArticle fas fa-calendar')
-        article_content['date'] = date_div.get_text(strip=True) if date_div else 'Date non disponible'
-
-        # Extract content from 'contenue_article_zen' or 'div[dir="auto"]'
-        content_div = soup.find('div', class_='contenue_article_zen')
-        if content_div:
-            content_html = content_div.decode_contents()
-        else:
-            content_div = soup.find('div', dir='auto')
-            if content_div:
-                content_html = content_div.decode_contents()
-            else:
-                content_html = 'Contenu non disponible'
-
-        # Extract author if available
-        author_text = None
-        # Check different locations for author information
-        author_div1 = soup.find('div', style='text-align: right;', dir='auto')
-        author_div2 = soup.find('p', style='text-align: right;')
-
-        if author_div1 and author_div1.find('strong'):
-            author_text = author_div1.find('strong').get_text(strip=True)
-        elif author_div2:
-            if author_div2.find('em') and author_div2.find('strong'):
-                author_text = author_div2.find('em').get_text(strip=True) + " " + author_div2.find('strong').get_text(strip=True)
-            elif author_div2.find('strong'):
-                author_text = author_div2.find('strong').get_text(strip=True)
-
-        article_content['auteur'] = author_text if author_text else 'Auteur non disponible'
-
-        # Remove author from content if present
-        if author_text:
-            content_html = content_html.replace(author_text, '').strip()
-
-        # Extract sublinks if available
-        sublinks_div = content_div.find_all('a', href=True) if content_div else []
-        article_content['sublinks'] = [urljoin(url, link['href']) for link in sublinks_div]
-
-        # Process content to remove unwanted tags and whitespace
-        soup_content = BeautifulSoup(content_html, 'html.parser')
-        for tag in soup_content.find_all(['strong', 'em']):
-            tag.unwrap()
-        article_content['contenu'] = soup_content.get_text(separator='\n', strip=True)
-
+        article_content = await parse_article(html_content, url)
+        raw_pages.add(EXTRACTOR, EXTRACTOR_VERSION, url, html_content, article_content, stop_after)
+        revisits.track(EXTRACTOR, EXTRACTOR_VERSION, url, article_content)
         return article_content
-
-    
-async def scrape_page(session, page_number, seen_urls):
+async def scrape_page(session, page_number, seen_urls, listing=None):
     if page_number == 1:
         url = base_url_first_page
     else:
         url = base_url_other_pages + str(page_number)
     
     print(f"Scraping page {page_number} with URL: {url}")
-    html_content = await fetch(session, url)
+    html_content = await fetch_listing(fetch, session, url)
     if html_content is None:
         return None
 
@@ -145,7 +234,9 @@ async def scrape_page(session, page_number, seen_urls):
         article_link = item.find('a', href=True)
         if article_link:
             article_url = urljoin(article_base_url, article_link['href'])
-            if article_url in seen_urls:
+            if listing is not None:
+                listing.append(article_url)
+            if article_url in seen_urls or dead_urls.blocked(article_url):
                 continue
             seen_urls.add(article_url)
             article['url'] = article_url
@@ -162,15 +253,22 @@ async def scrape_page(session, page_number, seen_urls):
     print(f"Scraped {len(articles)} articles from page {page_number}")
     return articles
 
-async def save_articles(data):
+async def save_articles(articles):
     """Fonction asynchrone pour sauvegarder les articles dans un fichier JSON"""
     try:
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
-        print(f"Saved {len(data['Opinion_Tribunes']['articles'])} articles to {output_file}")
+        articles_file.append(articles)
+        print(f"Saved {len(articles_file)} articles to {output_file}")
     except IOError as e:
         print(f"Error saving articles: {e}")
 
+async def update_articles(articles):
+    """Fonction asynchrone pour remplacer dans le fichier JSON les articles modifiés"""
+    try:
+        articles_file.replace(articles)
+        print(f"Updated {len(articles)} articles in {output_file}")
+    except IOError as e:
+        print(f"Error updating articles: {e}")
+
 async def save_config(config):
     """Fonction asynchrone pour sauvegarder les configurations dans un fichier JSON"""
     try:
@@ -180,60 +278,41 @@ async def save_config(config):
     except IOError as e:
         print(f"Error saving config: {e}")
 
-async def scrape_all_articles():
+@guarded_run(output_file + '.lock')
+async def scrape_all_articles(session=None):
     print("Starting scraping process...")
-    all_articles = []
-    seen_urls = set()
-
-    if os.path.exists(output_file):
-        try:
-            with open(output_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                existing_articles = data.get("Opinion_Tribunes", {}).get("articles", [])
-                for article in existing_articles:
-                    seen_urls.add(article["url"])
-        except IOError as e:
-            print(f"Error loading existing file: {e}")
-            data = {
-                "nom_de_la_presse": "Business News",
-                "Opinion_Tribunes": {
-                    "articles": []
-                }
-            }
-    else:
-        print(f"File not found. Creating new structure.")
-        data = {
-            "nom_de_la_presse": "Business News",
-            "Opinion_Tribunes": {
-                "articles": []
-            }
-        }
+    # Charger l'index du fichier existant (le JSON complet n'est relu que si l'index manque)
+    articles_file.load()
+    seen_urls = articles_file.seen_urls()
 
+    config = {}
     if os.path.exists(config_file):
         try:
             with open(config_file, 'r', encoding='utf-8') as f:
                 config = json.load(f)
-                last_page_scraped = config.get('last_page_scraped', 1)
         except IOError as e:
             print(f"Error loading config file: {e}")
-            last_page_scraped = 1
-    else:
-        last_page_scraped = 1
+    # Curseur tête/queue de la catégorie (les anciennes configs n'ont que last_page_scraped)
+    cursor = ListingCursor.from_config(config.get('cursor', config.get('last_page_scraped')), articles_file.urls())
+
+    async with client_session(session) as session:
+        async def scrape(page_number, listing):
+            return await scrape_page(session, page_number, seen_urls, listing)
 
-    async with aiohttp.ClientSession() as session:
-        page_number = last_page_scraped
-        while True:
-            articles = await scrape_page(session, page_number, seen_urls)
-            if not articles:
-                break
-            all_articles.extend(articles)
-            page_number += 1
+        async def save(articles):
+            if articles:
+                await save_articles(articles)
+            await save_config({'cursor': cursor.to_dict()})
 
-            data["Opinion_Tribunes"]["articles"].extend(articles)
-            await save_articles(data)
-            await save_config({'last_page_scraped': page_number})
+        all_articles = await crawl_listing(cursor, scrape, save)
+        # Articles récents revérifiés selon leur âge : remplacés dans le fichier s'ils ont changé
+        updated = await revisits.revisit(session, EXTRACTOR, EXTRACTOR_VERSION, articles_file, parse_article, article_containers)
+        if updated:
+            await update_articles(updated)
 
     print("Scraping process completed.")
+    print(f"Fast path {fast_path.summary()}")
+    return all_articles
 
 def run_scraping_job():
     asyncio.run(scrape_all_articles())
@@ -5,42 +5,135 @@ import json
 import os
 import schedule
 import time
+import sys
 from urllib.parse import urlparse
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.article_index import ArticleFile
+from common.session import client_session
+from common.run_guard import guarded_run
+from common.singleflight import coalesce_fetch, coalesce_result
+from common.retry import fetch_with_retries
+from common.negative_cache import GONE, SERVER_ERROR, dead_urls, track_failures
+from common.parse_cache import parse_cache
+from common.raw_pages import raw_pages
+from common.revisit import revisits
+from common.cursor import ListingCursor, crawl_listing, fetch_listing
+
 output_file = os.path.join(os.getcwd(), 'hommage.json')
 config_file = os.path.join(os.getcwd(), 'config3.json')
 
+# Fichier de sortie avec index des URLs (<fichier>.idx)
+articles_file = ArticleFile(output_file, ["categories", "Hommage à", "articles"], {
+    "nom_de_la_presse": "Leaders",
+    "categories": {
+        "Hommage à": {
+            "articles": []
+        }
+    }
+})
+
 base_url = 'https://www.leaders.com.tn/categorie/hommage-a?page='
 article_base_url = 'https://www.leaders.com.tn'
 
 semaphore = asyncio.Semaphore(5)
+# Page lue entière (pas de coupure après les conteneurs) : l'auteur, span de couleur
+# suivi d'un <strong>, est cherché dans toute la page, y compris après l'article
+article_containers = None
 
-async def fetch(session, url):
-    retries = 3
-    for i in range(retries):
-        try:
-            async with session.get(url) as response:
-                if response.status == 200:
-                    print(f"Fetching URL: {url}")
-                    return await response.text()
-                elif response.status == 404:
-                    print(f"Page not found (404 error) for URL: {url}")
-                    return None
-                else:
-                    print(f"Unexpected response {response.status} for URL: {url}")
-                    return None
-        except aiohttp.ClientError as e:
-            print(f"Error fetching URL {url}: {e}")
-            if i < retries - 1:
-                await asyncio.sleep(2 ** i)  # Exponential backoff
-            else:
-                raise
-    return None
+@coalesce_fetch
+async def fetch(session, url, stop_after=None):
+    try:
+        response = await fetch_with_retries(session, url, stop_after=stop_after)
+    except aiohttp.ClientError as e:
+        print(f"Error fetching URL {url}: {e}")
+        raise
+    if response.status == 200:
+        dead_urls.fetched(url)
+        print(f"Fetching URL: {url}")
+        return response.body
+    elif response.status in (404, 410):
+        dead_urls.record(url, GONE)
+        print(f"Page not found (404 error) for URL: {url}")
+        return None
+    else:
+        # 403, 429 après les tentatives... : rien d'enregistré, la page n'a pas été lue
+        if response.status >= 500:
+            dead_urls.record(url, SERVER_ERROR)
+        print(f"Unexpected response {response.status} for URL: {url}")
+        return None
 
+def parse_article_dom(html_content, url):
+    """Extraction de l'article à partir du HTML de la page"""
+    soup = BeautifulSoup(html_content, 'html.parser')
+
+    article_content = {
+        'contenu': '',
+        'titre': '',
+        'auteur': '',
+        'sublinks': [],
+        'date_publish': '',
+        'url': url
+    }
+
+    try:
+        titre_div = soup.find('h1')
+        article_content['titre'] = titre_div.get_text(strip=True) if titre_div else 'Titre non trouvé'
+
+        date_div = soup.find('div', class_='infos')
+        if date_div:
+            date_publish = date_div.get_text(separator=' ', strip=True)
+            cleaned_date = date_publish.replace('Hommage à ... - ', '').strip()
+            article_content['date_publish'] = cleaned_date
+        else:
+            article_content['date_publish'] = 'Date non trouvée'
+
+        author_span = soup.find('span', style='color: rgb(128, 0, 0);')
+        if author_span:
+            author_name = author_span.find_next('strong').get_text(strip=True) if author_span.find_next('strong') else 'Auteur non trouvé'
+            article_content['auteur'] = author_name
+        else:
+            article_content['auteur'] = 'Auteur non trouvé'
+
+        content_div = soup.find('div', class_='desc article_body')
+        if content_div:
+            # Remove unnecessary parts before extracting text
+            for tag in content_div.find_all(['span', 'strong', 'em', 'img']):
+                tag.extract()
+
+            # Extract text from paragraphs within content_div
+            paragraphs = content_div.find_all('p', recursive=False)
+            article_content['contenu'] = '\n'.join(p.get_text(strip=True) for p in paragraphs)
+        else:
+            article_content['contenu'] = 'Contenu non trouvé'
+
+            sublinks = []
+            for link in content_div.find_all('a', href=True):
+                href = link['href']
+                if not is_image_link(href):
+                    sublinks.append(href)
+
+            article_content['sublinks'] = sublinks
+    except Exception as e:
+        print(f"Error processing article content from {url}: {e}")
+        article_content['contenu'] = 'Erreur lors du traitement du contenu'
+
+    return article_content
+
+# Extracteur des articles : incrémenter la version quand l'extraction change (invalide
+# les résultats en cache et date les articles réextraits depuis les pages brutes)
+EXTRACTOR = 'Leaders-Hommage'
+EXTRACTOR_VERSION = 1
+parse_article = parse_cache.cached(EXTRACTOR, EXTRACTOR_VERSION, parse_article_dom)
+
+@coalesce_result
+@track_failures
 async def fetch_article_content(session, url):
     async with semaphore:
         print(f"Fetching article content from URL: {url}")
-        html_content = await fetch(session, url)
+        # Page entière si elle est gardée pour les réextractions (common.raw_pages)
+        stop_after = raw_pages.cutoff(article_containers)
+        html_content = await fetch(session, url, stop_after=stop_after)
         if html_content is None:
             return {
                 'contenu': 'Contenu non disponible',
@@ -51,59 +144,9 @@ async def fetch_article_content(session, url):
                 'url': url
             }
 
-        soup = BeautifulSoup(html_content, 'html.parser')
-
-        article_content = {
-            'contenu': '',
-            'titre': '',
-            'auteur': '',
-            'sublinks': [],
-            'date_publish': '',
-            'url': url
-        }
-
-        try:
-            titre_div = soup.find('h1')
-            article_content['titre'] = titre_div.get_text(strip=True) if titre_div else 'Titre non trouvé'
-
-            date_div = soup.find('div', class_='infos')
-            if date_div:
-                date_publish = date_div.get_text(separator=' ', strip=True)
-                cleaned_date = date_publish.replace('Hommage à ... - ', '').strip()
-                article_content['date_publish'] = cleaned_date
-            else:
-                article_content['date_publish'] = 'Date non trouvée'
-
-            author_span = soup.find('span', style='color: rgb(128, 0, 0);')
-            if author_span:
-                author_name = author_span.find_next('strong').get_text(strip=True) if author_span.find_next('strong') else 'Auteur non trouvé'
-                article_content['auteur'] = author_name
-            else:
-                article_content['auteur'] = 'Auteur non trouvé'
-
-            content_div = soup.find('div', class_='desc article_body')
-            if content_div:
-                # Remove unnecessary parts before extracting text
-                for tag in content_div.find_all(['span', 'strong', 'em', 'img']):
-                    tag.extract()
-
-                # Extract text from paragraphs within content_div
-                paragraphs = content_div.find_all('p', recursive=False)
-                article_content['contenu'] = '\n'.join(p.get_text(strip=True) for p in paragraphs)
-            else:
-                article_content['contenu'] = 'Contenu non trouvé'
-
-                sublinks = []
-                for link in content_div.find_all('a', href=True):
-                    href = link['href']
-                    if not is_image_link(href):
-                        sublinks.append(href)
-
-                article_content['sublinks'] = sublinks
-        except Exception as e:
-            print(f"Error processing article content from {url}: {e}")
-            article_content['contenu'] = 'Erreur lors du traitement du contenu'
-
+        article_content = await parse_article(html_content, url)
+        raw_pages.add(EXTRACTOR, EXTRACTOR_VERSION, url, html_content, article_content, stop_after)
+        revisits.track(EXTRACTOR, EXTRACTOR_VERSION, url, article_content)
         return article_content
 
 def is_image_link(url):
@@ -111,10 +154,10 @@ def is_image_link(url):
     image_extensions = {'.jpg', '.jpeg', '.png', '.gif', '.svg'}
     return any(parsed_url.path.lower().endswith(ext) for ext in image_extensions)
 
-async def scrape_page(session, page_number, seen_urls):
+async def scrape_page(session, page_number, seen_urls, listing=None):
     url = base_url + str(page_number)
     print(f"Scraping page {page_number}")
-    html_content = await fetch(session, url)
+    html_content = await fetch_listing(fetch, session, url)
     if html_content is None:
         return None
 
@@ -133,7 +176,9 @@ async def scrape_page(session, page_number, seen_urls):
         article_link = item.find('a', href=True)
         if article_link:
             article_url = article_base_url + article_link['href']
-            if article_url in seen_urls:
+            if listing is not None:
+                listing.append(article_url)
+            if article_url in seen_urls or dead_urls.blocked(article_url):
                 continue
             seen_urls.add(article_url)
             article['url'] = article_url
@@ -151,14 +196,21 @@ async def scrape_page(session, page_number, seen_urls):
     print(f"Scraped {len(articles)} articles from page {page_number}")
     return articles
 
-async def save_articles(data):
+async def save_articles(articles):
     try:
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
-        print(f"Saved {len(data['categories']['Hommage à']['articles'])} articles to {output_file}")
+        articles_file.append(articles)
+        print(f"Saved {len(articles_file)} articles to {output_file}")
     except IOError as e:
         print(f"Error saving articles: {e}")
 
+async def update_articles(articles):
+    """Fonction asynchrone pour remplacer dans le fichier JSON les articles modifiés"""
+    try:
+        articles_file.replace(articles)
+        print(f"Updated {len(articles)} articles in {output_file}")
+    except IOError as e:
+        print(f"Error updating articles: {e}")
+
 async def save_config(config):
     try:
         with open(config_file, 'w', encoding='utf-8') as f:
@@ -167,64 +219,40 @@ async def save_config(config):
     except IOError as e:
         print(f"Error saving config: {e}")
 
-async def scrape_all_articles():
+@guarded_run(output_file + '.lock')
+async def scrape_all_articles(session=None):
     print("Starting scraping process...")
-    all_articles = []
-    seen_urls = set()
-
-    if os.path.exists(output_file):
-        try:
-            with open(output_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                existing_articles = data.get("categories", {}).get("Hommage à", {}).get("articles", [])
-                for article in existing_articles:
-                    seen_urls.add(article["url"])
-        except IOError as e:
-            print(f"Error loading existing file: {e}")
-            data = {
-                "nom_de_la_presse": "Leaders",
-                "categories": {
-                    "Hommage à": {
-                        "articles": []
-                    }
-                }
-            }
-    else:
-        print(f"File not found. Creating new structure.")
-        data = {
-            "nom_de_la_presse": "Leaders",
-            "categories": {
-                "Hommage à": {
-                    "articles": []
-                }
-            }
-        }
+    # Charger l'index du fichier existant (le JSON complet n'est relu que si l'index manque)
+    articles_file.load()
+    seen_urls = articles_file.seen_urls()
 
+    config = {}
     if os.path.exists(config_file):
         try:
             with open(config_file, 'r', encoding='utf-8') as f:
                 config = json.load(f)
-                last_page_scraped = config.get('last_page_scraped', 1)
         except IOError as e:
             print(f"Error loading config file: {e}")
-            last_page_scraped = 1
-    else:
-        last_page_scraped = 1
+    # Curseur tête/queue de la catégorie (les anciennes configs n'ont que last_page_scraped)
+    cursor = ListingCursor.from_config(config.get('cursor', config.get('last_page_scraped')), articles_file.urls())
+
+    async with client_session(session) as session:
+        async def scrape(page_number, listing):
+            return await scrape_page(session, page_number, seen_urls, listing)
 
-    async with aiohttp.ClientSession() as session:
-        page_number = last_page_scraped
-        while True:
-            articles = await scrape_page(session, page_number, seen_urls)
-            if not articles:
-                break
-            all_articles.extend(articles)
-            page_number += 1
+        async def save(articles):
+            if articles:
+                await save_articles(articles)
+            await save_config({'cursor': cursor.to_dict()})
 
-            data["categories"]["Hommage à"]["articles"].extend(articles)
-            await save_articles(data)
-            await save_config({'last_page_scraped': page_number})
+        all_articles = await crawl_listing(cursor, scrape, save)
+        # Articles récents revérifiés selon leur âge : remplacés dans le fichier s'ils ont changé
+        updated = await revisits.revisit(session, EXTRACTOR, EXTRACTOR_VERSION, articles_file, parse_article, article_containers)
+        if updated:
+            await update_articles(updated)
 
     print("Scraping process completed.")
+    return all_articles
 
 def run_scraping_job():
     asyncio.run(scrape_all_articles())
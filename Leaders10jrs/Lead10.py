@@ -6,6 +6,15 @@ import os
 from datetime import datetime, timedelta
 import logging
 import re
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.session import client_session
+from common.run_guard import guarded_run
+from common.singleflight import coalesce_fetch, coalesce_result
+from common.retry import fetch_with_retries
+from common.negative_cache import GONE, SERVER_ERROR, dead_urls, track_failures
+from common.extract import All, Extractor, First, Select
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -16,32 +25,50 @@ output_file = os.path.join(os.getcwd(), 'leaders.json')
 journal_name = "Leaders"
 journal_url = "https://www.leaders.com.tn"
 semaphore = asyncio.Semaphore(5)  # Limite de requêtes simultanées
+# Page lue entière (pas de coupure après les conteneurs) : l'auteur, span de couleur
+# ou signature et premier <strong>, est cherché dans toute la page
+article_containers = None
+# Règles d'extraction d'un article, évaluées en un seul parcours de la page
+article_rules = Extractor(
+    date=First(Select('div', class_='infos')),
+    author=First(Select('span', style="color: rgb(128, 0, 0);"),
+                 Select('span', style='color: rgb(128, 0, 0); font-size: smaller;')),
+    signature=First(Select('p', style="text-align: right;")),
+    strong=First(Select('strong')),
+    content=First(Select('div', class_='desc article_body')),
+    blocks=All(Select(['p', 'div', 'h2', 'li']), within='content'),
+    links=All(Select('a', href=True), within='content'),
+)
+
+@coalesce_fetch
+async def fetch(session, url, stop_after=None):
+    try:
+        response = await fetch_with_retries(session, url, stop_after=stop_after)
+    except aiohttp.ClientError as e:
+        logger.error(f"Error fetching URL {url}: {e}")
+        raise
+    if response.status == 200:
+        dead_urls.fetched(url)
+        logger.info(f"Fetching URL: {url}")
+        return response.body
+    elif response.status in (404, 410):
+        dead_urls.record(url, GONE)
+        logger.warning(f"Page not found: {url}")
+        return None
+    else:
+        # 403, 429 après les tentatives... : rien d'enregistré, la page n'a pas été lue
+        if response.status >= 500:
+            dead_urls.record(url, SERVER_ERROR)
+        logger.warning(f"Unexpected response {response.status} for URL: {url}")
+        return None
 
-async def fetch(session, url):
-    retries = 3
-    for i in range(retries):
-        try:
-            async with session.get(url) as response:
-                if response.status == 200:
-                    logger.info(f"Fetching URL: {url}")
-                    return await response.text()
-                elif response.status == 404:
-                    logger.warning(f"Page not found: {url}")
-                    return None
-                else:
-                    logger.warning(f"Unexpected response {response.status} for URL: {url}")
-        except aiohttp.ClientError as e:
-            logger.error(f"Error fetching URL {url}: {e}")
-            if i < retries - 1:
-                await asyncio.sleep(2 ** i)  # Exponential backoff
-            else:
-                raise
-            
+@coalesce_result
+@track_failures
 async def fetch_article_content(session, url):
     async with semaphore:
         full_url = f"{base_url}{url}"
         logger.info(f"Fetching article content from URL: {full_url}")
-        html_content = await fetch(session, full_url)
+        html_content = await fetch(session, full_url, stop_after=article_containers)
         if not html_content:
             logger.warning(f"No HTML content fetched for URL: {full_url}")
             return None, None, None, None, None
@@ -55,7 +82,8 @@ async def fetch_article_content(session, url):
         author = None
 
         try:
-            date_tag = soup.find('div', class_='infos')
+            found = article_rules.run(soup)
+            date_tag = found['date']
             if date_tag:
                 date_string = date_tag.text.strip()
                 # Extract the date from the string
@@ -70,33 +98,29 @@ async def fetch_article_content(session, url):
                     return None, None, None, None, None
 
             # Find the author tag and verify it starts with 'Par'
-            author_tag = soup.find('span', style="color: rgb(128, 0, 0);") or \
-                         soup.find('span', style='color: rgb(128, 0, 0); font-size: smaller;') 
-                        
+            author_tag = found['author']
 
             if author_tag:
                 author_text = author_tag.text.strip()
                 if author_text.startswith('Par'):
                     author = author_text
             else:
-                author_black = soup.find('p', style="text-align: right;")
-                if author_black :
-                    author_s = soup.find('strong')
+                if found['signature']:
+                    author_s = found['strong']
                     if author_s:
                         author_texts = author_s.text.strip()
                         author = author_texts
                         
-            content_tag = soup.find('div', class_='desc article_body')
-            if content_tag:
-                paragraphs = content_tag.find_all(['p', 'div', 'h2', 'li'])
-                content = '\n'.join([para.get_text(strip=True) for para in paragraphs if para.get_text(strip=True)])
+            if found['content']:
+                texts = [para.get_text(strip=True) for para in found['blocks']]
+                content = '\n'.join([text for text in texts if text])
                 if not content:
                     content = "Contenu non trouvé"
                 # Remove author from content if present
                 if author and content:
                     content = content.replace(author, '')
 
-                for link in content_tag.find_all('a', href=True):
+                for link in found['links']:
                     href = link['href']
                     if not href.lower().endswith(('.jpg', '.jpeg', '.png', '.gif')):
                         tags.append({'title': link.text.strip(), 'url': f"{base_url}{href}"})
@@ -190,7 +214,7 @@ async def scrape_page(session, category, page_number, seen_urls):
             article_link = item.find('a', href=True)
             if article_link:
                 article_url = article_link['href']
-                if article_url in seen_urls:
+                if article_url in seen_urls or dead_urls.blocked(base_url + article_url):
                     continue
                 seen_urls.add(article_url)
 
@@ -216,12 +240,12 @@ async def scrape_page(session, category, page_number, seen_urls):
         logger.error(f"Exception while scraping page {page_number} in category '{category}': {e}")
         return None
 
-async def scrape_category(category):
+async def scrape_category(category, session=None):
     logger.info(f"Starting scraping process for category '{category}'...")
     all_articles = []
     seen_urls = set()
 
-    async with aiohttp.ClientSession() as session:
+    async with client_session(session) as session:
         page_number = 1
         while True:
             articles = await scrape_page(session, category, page_number, seen_urls)
@@ -239,16 +263,18 @@ def parse_date(date_string):
     except ValueError:
         return datetime.min
 
-async def scrape_all_categories():
+@guarded_run(output_file + '.lock', max_seconds=None, max_requests=None)
+async def scrape_all_categories(session=None):
     logger.info("Starting scraping process for all categories...")
     all_category_articles = {}
 
     for category in categories:
-        category_articles = await scrape_category(category)
+        category_articles = await scrape_category(category, session=session)
         all_category_articles[category] = category_articles
 
     await save_articles(all_category_articles, journal_name, journal_url)
     logger.info("Scraping process completed for all categories.")
+    return all_category_articles
 
 if __name__ == "__main__":
     asyncio.run(scrape_all_categories())
\ No newline at end of file
@@ -7,6 +7,15 @@ from datetime import datetime, timedelta
 import logging
 import schedule
 import time
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.session import client_session
+from common.run_guard import guarded_run
+from common.singleflight import coalesce_fetch, coalesce_result
+from common.retry import fetch_with_retries
+from common.negative_cache import GONE, SERVER_ERROR, dead_urls, track_failures
+from common.wordpress import WordPressAPI, WordPressAPIError, fetch_recent, reset_sync
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -17,31 +26,43 @@ output_file = os.path.join(os.getcwd(), 'challenges.json')
 journal_name = "Challenges"
 journal_url = "https://www.challenges.tn"
 semaphore = asyncio.Semaphore(5)  # Limite de requêtes simultanées
+# Éléments lus par fetch_article_content : la page n'est plus lue une fois tous refermés
+article_containers = [('div', 'tdb_single_content td-post-content')]
 
-async def fetch(session, url):
-    retries = 3
-    for i in range(retries):
-        try:
-            async with session.get(url) as response:
-                if response.status == 200:
-                    logger.info(f"Fetching URL: {url}")
-                    return await response.text()
-                elif response.status == 404:
-                    logger.warning(f"Page not found: {url}")
-                    return None
-                else:
-                    logger.warning(f"Unexpected response {response.status} for URL: {url}")
-        except aiohttp.ClientError as e:
-            logger.error(f"Error fetching URL {url}: {e}")
-            if i < retries - 1:
-                await asyncio.sleep(2 ** i)  # Exponential backoff
-            else:
-                raise
+# API REST WordPress : un appel par lot de 100 articles au lieu d'une page HTML par article
+USE_REST_API = True  # False : toujours scraper les pages HTML
+# Un fichier par script : lancés depuis le même dossier, ils ne reprennent pas l'état l'un de l'autre
+api_state_file = os.path.join(os.getcwd(), 'wp_sync_challenges.json')
+wordpress_api = WordPressAPI(journal_url)
+
+@coalesce_fetch
+async def fetch(session, url, stop_after=None):
+    try:
+        response = await fetch_with_retries(session, url, stop_after=stop_after)
+    except aiohttp.ClientError as e:
+        logger.error(f"Error fetching URL {url}: {e}")
+        raise
+    if response.status == 200:
+        dead_urls.fetched(url)
+        logger.info(f"Fetching URL: {url}")
+        return response.body
+    elif response.status in (404, 410):
+        dead_urls.record(url, GONE)
+        logger.warning(f"Page not found: {url}")
+        return None
+    else:
+        # 403, 429 après les tentatives... : rien d'enregistré, la page n'a pas été lue
+        if response.status >= 500:
+            dead_urls.record(url, SERVER_ERROR)
+        logger.warning(f"Unexpected response {response.status} for URL: {url}")
+        return None
 
+@coalesce_result
+@track_failures
 async def fetch_article_content(session, url):
     async with semaphore:
         logger.info(f"Fetching article content from URL: {url}")
-        html_content = await fetch(session, url)
+        html_content = await fetch(session, url, stop_after=article_containers)
         if not html_content:
             logger.warning(f"No HTML content fetched for URL: {url}")
             return None
@@ -107,7 +128,7 @@ async def scrape_page(session, category, page_number, seen_urls):
             article_link = item.find('a', href=True)
             if article_link:
                 article_url = article_link['href']
-                if article_url in seen_urls:
+                if article_url in seen_urls or dead_urls.blocked(article_url):
                     continue
                 seen_urls.add(article_url)
 
@@ -145,12 +166,12 @@ async def scrape_page(session, category, page_number, seen_urls):
         logger.error(f"Exception while scraping page {page_number} in category '{category}': {e}")
         return None
 
-async def scrape_category(category):
+async def scrape_category(category, session=None):
     logger.info(f"Starting scraping process for category '{category}'...")
     all_articles = []
     seen_urls = set()
 
-    async with aiohttp.ClientSession() as session:
+    async with client_session(session) as session:
         page_number = 1
         while True:
             articles = await scrape_page(session, category, page_number, seen_urls)
@@ -189,17 +210,29 @@ def parse_date(date_string):
         return None
 
 
-async def scrape_all_categories():
+@guarded_run(output_file + '.lock', max_seconds=None, max_requests=None)
+async def scrape_all_categories(session=None):
     logger.info("Starting scraping process for all categories...")
-    all_category_articles = {}
+    all_category_articles = None
 
-    for category in categories:
-        category_articles = await scrape_category(category)
-        all_category_articles[category] = category_articles
+    if USE_REST_API:
+        try:
+            async with client_session(session) as api_session:
+                all_category_articles = await fetch_recent(wordpress_api, api_session, {category: category for category in categories}, 10, output_file, api_state_file)
+        except WordPressAPIError as e:
+            logger.warning(f"WordPress REST API unavailable ({e}), falling back to HTML scraping")
+
+    if all_category_articles is None:
+        reset_sync(api_state_file)
+        all_category_articles = {}
+        for category in categories:
+            category_articles = await scrape_category(category, session=session)
+            all_category_articles[category] = category_articles
 
     logger.info(f"Total articles scraped: {sum(len(articles) for articles in all_category_articles.values())}")
     await save_articles(all_category_articles, journal_name, journal_url)
     logger.info("Scraping process completed for all categories.")
+    return all_category_articles
     
 def job():
     asyncio.run(scrape_all_categories())
@@ -0,0 +1,366 @@
+import argparse
+import gzip
+import json
+import logging
+import lzma
+import os
+import struct
+import sys
+
+try:
+    import zstandard
+except ImportError:  # zstd est optionnel
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Format d'une archive (.bna) :
+#   en-tête   : MAGIC (8 octets) + code du codec (1 octet)
+#   blocs     : BLOCK_MAGIC + nombre d'enregistrements (u32), puis pour chaque
+#               enregistrement une trame : longueur (u32) + données compressées
+#   index     : JSON compressé avec le même codec (blocs + clé -> position de la trame)
+#   pied      : position de l'index (u64) + longueur de l'index (u32) + FOOTER_MAGIC
+# L'index et le pied sont écrits à la fermeture ; sans pied (écriture interrompue),
+# l'index est reconstruit en relisant les blocs complets.
+# Chaque enregistrement est compressé séparément : un article se relit sans
+# décompresser son bloc, et un parcours complet lit le fichier de façon séquentielle.
+
+MAGIC = b'BNARCHV1'
+BLOCK_MAGIC = b'BLK1'
+FOOTER_MAGIC = b'BNAIDX1\x00'
+HEADER = struct.Struct('<8sB')
+BLOCK_HEADER = struct.Struct('<4sI')
+FRAME_HEADER = struct.Struct('<I')
+FOOTER = struct.Struct('<QI8s')
+
+DEFAULT_BLOCK_RECORDS = 256
+
+
+class Codec:
+    def __init__(self, name, code, compress, decompress):
+        self.name = name
+        self.code = code
+        self.compress = compress
+        self.decompress = decompress
+
+
+CODECS = {
+    'gzip': Codec('gzip', 1, lambda data: gzip.compress(data, compresslevel=6), gzip.decompress),
+    'lzma': Codec('lzma', 2, lzma.compress, lzma.decompress),
+}
+if zstandard is not None:
+    CODECS['zstd'] = Codec(
+        'zstd', 3,
+        zstandard.ZstdCompressor(level=10).compress,
+        zstandard.ZstdDecompressor().decompress,
+    )
+CODES = {codec.code: codec for codec in CODECS.values()}
+
+
+def default_codec():
+    """zstd s'il est installé, sinon gzip (plus rapide à relire que lzma)."""
+    return 'zstd' if 'zstd' in CODECS else 'gzip'
+
+
+def article_key(record):
+    return record.get('url') or record.get('url_video') or record.get('id')
+
+
+class ArchiveError(Exception):
+    pass
+
+
+class ArchiveWriter:
+    """
+    Écrit ou complète une archive. Les enregistrements sont regroupés en blocs de
+    `block_records` trames ; l'index est réécrit à la fermeture.
+
+    with ArchiveWriter('leaders.bna') as archive:
+        archive.add(article)
+    """
+
+    def __init__(self, path, codec=None, block_records=DEFAULT_BLOCK_RECORDS, key=article_key):
+        self.path = path
+        self.key = key
+        self.block_records = block_records
+        self._pending = []
+
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            self._file = open(path, 'r+b')
+            self.codec, self.index, index_offset = _read_header_and_index(self._file, key)
+            if codec is not None and codec != self.codec.name:
+                raise ArchiveError(f"{path} uses codec {self.codec.name}, not {codec}")
+            # Les nouveaux blocs remplacent l'ancien index, réécrit à la fermeture
+            self._file.seek(index_offset)
+            self._file.truncate()
+        else:
+            name = codec or default_codec()
+            if name not in CODECS:
+                raise ArchiveError(f"Codec not available: {name}")
+            self.codec = CODECS[name]
+            self.index = {'codec': name, 'blocks': [], 'keys': {}}
+            self._file = open(path, 'w+b')
+            self._file.write(HEADER.pack(MAGIC, self.codec.code))
+
+    def add(self, record):
+        self._pending.append(record)
+        if len(self._pending) >= self.block_records:
+            self._flush_block()
+
+    def extend(self, records):
+        for record in records:
+            self.add(record)
+
+    def __contains__(self, key):
+        return key in self.index['keys'] or any(self.key(r) == key for r in self._pending)
+
+    def _flush_block(self):
+        if not self._pending:
+            return
+        f = self._file
+        block_offset = f.tell()
+        f.write(BLOCK_HEADER.pack(BLOCK_MAGIC, len(self._pending)))
+        raw_size = 0
+        for record in self._pending:
+            raw = json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            frame = self.codec.compress(raw)
+            frame_offset = f.tell() + FRAME_HEADER.size
+            f.write(FRAME_HEADER.pack(len(frame)))
+            f.write(frame)
+            raw_size += len(raw)
+            key = self.key(record)
+            if key is not None:
+                self.index['keys'][key] = [frame_offset, len(frame)]
+        self.index['blocks'].append({
+            'offset': block_offset,
+            'size': f.tell() - block_offset,
+            'records': len(self._pending),
+            'raw_size': raw_size,
+        })
+        self._pending = []
+
+    def close(self):
+        if self._file is None:
+            return
+        self._flush_block()
+        f = self._file
+        index_offset = f.tell()
+        index = self.codec.compress(json.dumps(self.index, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+        f.write(index)
+        f.write(FOOTER.pack(index_offset, len(index), FOOTER_MAGIC))
+        f.close()
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ArchiveReader:
+    """Lecture aléatoire (get) et parcours en flux (scan) d'une archive."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self.codec, self.index, self._index_offset = _read_header_and_index(self._file)
+
+    def __len__(self):
+        return sum(block['records'] for block in self.index['blocks'])
+
+    def __contains__(self, key):
+        return key in self.index['keys']
+
+    def keys(self):
+        return self.index['keys'].keys()
+
+    def get(self, key):
+        entry = self.index['keys'].get(key)
+        if entry is None:
+            return None
+        offset, length = entry
+        self._file.seek(offset)
+        return json.loads(self.codec.decompress(self._file.read(length)))
+
+    def scan(self):
+        """Parcourt tous les enregistrements dans l'ordre d'écriture, bloc par bloc."""
+        with open(self.path, 'rb', buffering=1024 * 1024) as f:
+            for block in self.index['blocks']:
+                yield from self._read_block(f, block['offset'])
+
+    def block(self, offset):
+        """Enregistrements du bloc commençant à `offset` (index['blocks'][i]['offset'])."""
+        return list(self._read_block(self._file, offset))
+
+    def _read_block(self, f, offset):
+        f.seek(offset)
+        magic, count = BLOCK_HEADER.unpack(f.read(BLOCK_HEADER.size))
+        if magic != BLOCK_MAGIC:
+            raise ArchiveError(f"Corrupted block at offset {offset} in {self.path}")
+        for _ in range(count):
+            (length,) = FRAME_HEADER.unpack(f.read(FRAME_HEADER.size))
+            yield json.loads(self.codec.decompress(f.read(length)))
+
+    def stats(self):
+        blocks = self.index['blocks']
+        return {
+            'codec': self.codec.name,
+            'blocks': len(blocks),
+            'records': len(self),
+            'raw_bytes': sum(block['raw_size'] for block in blocks),
+            'stored_bytes': os.path.getsize(self.path),
+        }
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _read_header_and_index(f, key=article_key):
+    f.seek(0)
+    header = f.read(HEADER.size)
+    if len(header) < HEADER.size:
+        raise ArchiveError("Not an article archive")
+    magic, code = HEADER.unpack(header)
+    if magic != MAGIC:
+        raise ArchiveError("Not an article archive")
+    if code not in CODES:
+        raise ArchiveError(f"Archive codec {code} not available (zstd needs the zstandard package)")
+    codec = CODES[code]
+    size = f.seek(0, os.SEEK_END)
+    if size >= HEADER.size + FOOTER.size:
+        f.seek(-FOOTER.size, os.SEEK_END)
+        index_offset, index_length, footer_magic = FOOTER.unpack(f.read(FOOTER.size))
+        if footer_magic == FOOTER_MAGIC:
+            f.seek(index_offset)
+            index = json.loads(codec.decompress(f.read(index_length)))
+            return codec, index, index_offset
+    # Écriture interrompue (l'index n'est écrit qu'à la fermeture) : index reconstruit
+    index, index_offset = _recover_index(f, codec, key)
+    logger.warning(f"Archive {getattr(f, 'name', '')} has no index (interrupted write), "
+                   f"recovered {len(index['blocks'])} complete blocks")
+    return codec, index, index_offset
+
+
+def _recover_index(f, codec, key):
+    """Index des blocs complets relus depuis le début ; renvoie (index, fin du dernier bloc)."""
+    index = {'codec': codec.name, 'blocks': [], 'keys': {}}
+    size = f.seek(0, os.SEEK_END)
+    offset = HEADER.size
+    while offset + BLOCK_HEADER.size <= size:
+        f.seek(offset)
+        magic, count = BLOCK_HEADER.unpack(f.read(BLOCK_HEADER.size))
+        if magic != BLOCK_MAGIC:
+            break
+        position = offset + BLOCK_HEADER.size
+        keys = {}
+        raw_size = 0
+        try:
+            for _ in range(count):
+                (length,) = FRAME_HEADER.unpack(f.read(FRAME_HEADER.size))
+                frame = f.read(length)
+                if len(frame) < length:
+                    raise EOFError
+                raw = codec.decompress(frame)
+                record_key = key(json.loads(raw))
+                if record_key is not None:
+                    keys[record_key] = [position + FRAME_HEADER.size, length]
+                raw_size += len(raw)
+                position += FRAME_HEADER.size + length
+        except Exception:
+            # Bloc coupé ou illisible : fin des données valides
+            break
+        index['blocks'].append({'offset': offset, 'size': position - offset, 'records': count, 'raw_size': raw_size})
+        index['keys'].update(keys)
+        offset = position
+    return index, offset
+
+
+def iter_json_articles(data, category=None):
+    """
+    Retrouve les articles dans les différentes structures de sortie des scripts
+    ({'articles': {...: [...]}}, {'categories': {...: {'articles': [...]}}}, ...).
+    Renvoie des couples (catégorie, article).
+    """
+    if isinstance(data, list):
+        for item in data:
+            if isinstance(item, dict) and article_key(item):
+                yield category, item
+        return
+    if isinstance(data, dict):
+        for name, value in data.items():
+            if isinstance(value, (dict, list)):
+                sub_category = category if name in ('articles', 'categories') else name
+                yield from iter_json_articles(value, sub_category)
+
+
+def pack_json(json_file, archive_path, codec=None, block_records=DEFAULT_BLOCK_RECORDS):
+    """Ajoute les articles d'un fichier de sortie JSON à une archive (sans doublons)."""
+    with open(json_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    journal = data.get('nom_de_la_presse') or data.get('journal_info', {}).get('journal_name')
+    added = 0
+    with ArchiveWriter(archive_path, codec=codec, block_records=block_records) as archive:
+        for category, article in iter_json_articles(data):
+            if article_key(article) in archive:
+                continue
+            record = dict(article)
+            record.setdefault('journal', journal)
+            record.setdefault('category', category)
+            archive.add(record)
+            added += 1
+    logger.info(f"Packed {added} articles from {json_file} into {archive_path}")
+    return added
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compressed article archives (.bna)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    pack = commands.add_parser('pack', help="append the articles of JSON output files to an archive")
+    pack.add_argument('archive')
+    pack.add_argument('json_files', nargs='+')
+    pack.add_argument('--codec', choices=sorted(CODECS))
+    pack.add_argument('--block-records', type=int, default=DEFAULT_BLOCK_RECORDS)
+
+    get = commands.add_parser('get', help="print one article by URL")
+    get.add_argument('archive')
+    get.add_argument('url')
+
+    cat = commands.add_parser('cat', help="stream all articles as JSON lines")
+    cat.add_argument('archive')
+
+    info = commands.add_parser('info', help="print archive statistics")
+    info.add_argument('archive')
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == 'pack':
+        for json_file in args.json_files:
+            pack_json(json_file, args.archive, codec=args.codec, block_records=args.block_records)
+    elif args.command == 'get':
+        with ArchiveReader(args.archive) as archive:
+            record = archive.get(args.url)
+            if record is None:
+                print(f"Article not found: {args.url}", file=sys.stderr)
+                return 1
+            print(json.dumps(record, ensure_ascii=False, indent=4))
+    elif args.command == 'cat':
+        with ArchiveReader(args.archive) as archive:
+            for record in archive.scan():
+                sys.stdout.write(json.dumps(record, ensure_ascii=False) + '\n')
+    elif args.command == 'info':
+        with ArchiveReader(args.archive) as archive:
+            print(json.dumps(archive.stats(), indent=4))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,268 @@
+import copy
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+INDEX_SUFFIX = '.idx'
+INDEX_VERSION = 1
+INDENT = 4
+
+
+def article_url(article):
+    """Clé par défaut d'un article : son URL."""
+    return article.get('url')
+
+
+def _encode_item(article, level):
+    """Encode un article exactement comme json.dump(..., indent=4) à la profondeur donnée."""
+    pad = ' ' * (INDENT * level)
+    text = json.dumps(article, ensure_ascii=False, indent=INDENT)
+    return (pad + text.replace('\n', '\n' + pad)).encode('utf-8'), len(pad.encode('utf-8'))
+
+
+def _file_stat(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+class ArticleFile:
+    """
+    Fichier de sortie JSON accompagné d'un index « sidecar » (<fichier>.idx).
+
+    L'index associe la clé de chaque article (son URL par défaut) à sa position en
+    octets dans le fichier JSON, et garde les compteurs. Au démarrage seul l'index est
+    lu ; la présence d'une URL et la lecture d'un article isolé ne demandent plus de
+    charger tout le fichier. Les nouveaux articles sont ajoutés en place à la fin de
+    la liste, le reste du fichier n'est pas réécrit ; replace() remplace un article
+    déjà présent (article revérifié et modifié, common.revisit) sans le dupliquer.
+
+    Le fichier produit est identique octet pour octet à un json.dump(indent=4), à
+    condition que la liste d'articles soit le dernier élément de sa structure
+    (c'est le cas pour les scripts Leaders/* et Business News/*).
+    """
+
+    def __init__(self, path, articles_path, initial_data, key=article_url):
+        self.path = path
+        self.index_path = path + INDEX_SUFFIX
+        self.articles_path = list(articles_path)
+        self.initial_data = initial_data
+        self.key = key
+        self._entries = {}
+        self._count = 0
+        self._insert_offset = 0
+        self._after = ''
+        self._loaded = False
+        self._stat = None
+
+    # Chargement
+
+    def load(self):
+        """Charge l'index, ou le reconstruit (une seule fois) à partir du fichier JSON."""
+        if self._loaded and self._stat == _file_stat(self.path):
+            # Déjà en mémoire (processus qui reste lancé, ex. common/daemon.py)
+            return self
+        index = self._read_index()
+        if index is not None:
+            self._entries = index['entries']
+            self._count = index['count']
+            self._insert_offset = index['insert_offset']
+            self._after = index['after']
+            self._stat = (index['size'], index['mtime_ns'])
+            self._loaded = True
+            logger.debug(f"Loaded index {self.index_path} ({len(self._entries)} articles)")
+            return self
+
+        if os.path.exists(self.path):
+            logger.info(f"Index missing or stale for {self.path}, rebuilding it")
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        else:
+            logger.info(f"File {self.path} not found, creating a new structure")
+            data = copy.deepcopy(self.initial_data)
+        self._rewrite(data)
+        self._loaded = True
+        return self
+
+    def _read_index(self):
+        if not (os.path.exists(self.index_path) and os.path.exists(self.path)):
+            return None
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (IOError, ValueError) as e:
+            logger.warning(f"Unreadable index {self.index_path}: {e}")
+            return None
+        stat = os.stat(self.path)
+        if (index.get('version') != INDEX_VERSION
+                or index.get('size') != stat.st_size
+                or index.get('mtime_ns') != stat.st_mtime_ns
+                or index.get('articles_path') != self.articles_path):
+            return None
+        return index
+
+    def _write_index(self):
+        stat = os.stat(self.path)
+        self._stat = (stat.st_size, stat.st_mtime_ns)
+        index = {
+            'version': INDEX_VERSION,
+            'articles_path': self.articles_path,
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'count': self._count,
+            'insert_offset': self._insert_offset,
+            'after': self._after,
+            'entries': self._entries,
+        }
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, self.index_path)
+
+    def _rewrite(self, data):
+        """Réécrit tout le fichier en calculant la position de chaque article."""
+        container = data
+        for part in self.articles_path[:-1]:
+            container = container.setdefault(part, {})
+        articles = container.get(self.articles_path[-1], [])
+        placeholder = '\x00articles\x00'
+        container[self.articles_path[-1]] = placeholder
+
+        text = json.dumps(data, ensure_ascii=False, indent=INDENT)
+        container[self.articles_path[-1]] = articles
+        marker = json.dumps(placeholder)
+        head, after = text.split(marker, 1)
+        head = head.encode('utf-8')
+
+        self._entries = {}
+        self._count = 0
+        self._after = after
+        self._insert_offset = len(head) + 1  # après '['
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(head + b'[')
+            self._write_items(f, articles, first=True)
+            f.write(self._closing(bool(articles)))
+        os.replace(tmp_path, self.path)
+        self._write_index()
+
+    # Écriture
+
+    def _closing(self, has_items):
+        if has_items:
+            pad = ' ' * (INDENT * len(self.articles_path))
+            return ('\n' + pad + ']' + self._after).encode('utf-8')
+        return (']' + self._after).encode('utf-8')
+
+    def _write_items(self, f, articles, first):
+        level = len(self.articles_path) + 1
+        offset = self._insert_offset
+        for article in articles:
+            separator = b'\n' if first else b',\n'
+            first = False
+            encoded, pad = _encode_item(article, level)
+            f.write(separator + encoded)
+            key = self.key(article)
+            if key is not None:
+                self._entries[key] = [offset + len(separator) + pad, len(encoded) - pad]
+            offset += len(separator) + len(encoded)
+            self._count += 1
+        self._insert_offset = offset
+
+    def append(self, articles):
+        """Ajoute des articles à la fin de la liste et met à jour l'index."""
+        if not self._loaded:
+            self.load()
+        if not articles:
+            return
+        with open(self.path, 'r+b') as f:
+            f.seek(self._insert_offset)
+            self._write_items(f, articles, first=self._count == 0)
+            f.write(self._closing(True))
+            f.truncate()
+        self._write_index()
+
+    def replace(self, articles):
+        """
+        Remplace à leur place les articles déjà présents (même clé) et ajoute les
+        autres à la fin. Le fichier est réécrit en une fois (fichier temporaire puis
+        os.replace) et les positions des articles suivants sont décalées dans l'index.
+        """
+        if not self._loaded:
+            self.load()
+        level = len(self.articles_path) + 1
+        replaced = {}
+        new = []
+        for article in articles:
+            key = self.key(article)
+            if key is not None and key in self._entries:
+                encoded, pad = _encode_item(article, level)
+                replaced[key] = encoded[pad:]
+            else:
+                new.append(article)
+
+        if replaced:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+            changes = sorted((self._entries[key][0], key) for key in replaced)
+            # Décalage cumulé après chaque article remplacé : (fin de l'ancien article, décalage)
+            shifts = []
+            parts = []
+            position = 0
+            delta = 0
+            for offset, key in changes:
+                length = self._entries[key][1]
+                encoded = replaced[key]
+                parts.append(data[position:offset])
+                parts.append(encoded)
+                position = offset + length
+                self._entries[key] = [offset + delta, len(encoded)]
+                delta += len(encoded) - length
+                shifts.append((position, delta))
+            parts.append(data[position:])
+
+            for key, entry in self._entries.items():
+                if key in replaced:
+                    continue
+                shift = 0
+                for end, total in shifts:
+                    if entry[0] < end:
+                        break
+                    shift = total
+                entry[0] += shift
+            self._insert_offset += delta
+
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(b''.join(parts))
+            os.replace(tmp_path, self.path)
+            self._write_index()
+        self.append(new)
+
+    # Lecture
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return self._count
+
+    def urls(self):
+        return self._entries.keys()
+
+    def seen_urls(self):
+        return set(self._entries)
+
+    def get(self, key):
+        """Lit un seul article par sa clé, sans charger le reste du fichier."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        offset, length = entry
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            return json.loads(f.read(length).decode('utf-8'))
@@ -0,0 +1,219 @@
+import argparse
+import asyncio
+import atexit
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import time
+from collections import Counter
+from datetime import date
+from urllib.parse import urlparse
+
+from common.run_guard import current_budget, file_lock
+
+logger = logging.getLogger(__name__)
+
+# Débit de téléchargement plafonné (global et par hôte) et comptage des octets lus par
+# hôte, catégorie et type de contenu. Les corps des réponses sont lus par morceaux ;
+# chaque morceau prend ses octets dans les deux seaux, qui peuvent s'endetter : le
+# lecteur attend alors, en une fois, que la plus grande des deux dettes soit remboursée.
+
+MAX_BYTES_PER_SECOND = 2 * 1024 * 1024  # tous hôtes confondus, None : pas de limite
+MAX_HOST_BYTES_PER_SECOND = 1024 * 1024
+BURST_SECONDS = 1.0  # octets d'avance d'un seau : BURST_SECONDS x débit
+CHUNK_SIZE = 64 * 1024
+SAVE_INTERVAL = 30
+
+USAGE_FILE = 'bandwidth_usage.json'
+
+_category = contextvars.ContextVar('byte_category', default=None)
+
+
+class ByteBucket:
+    """Seau à octets : take(n) renvoie le temps à attendre pour rester sous `rate` octets/s."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    @property
+    def capacity(self):
+        return (self.rate or 0) * BURST_SECONDS
+
+    def take(self, n):
+        """Prend `n` octets sans attendre ; renvoie les secondes de dette (0 si aucune)."""
+        if not self.rate:
+            return 0.0
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= n
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+    async def consume(self, n):
+        wait = self.take(n)
+        if wait:
+            await asyncio.sleep(wait)
+        return wait
+
+
+class Throttle:
+    """
+    Secondes d'attente du plafond de débit pendant une requête. `seconds` augmente avant
+    chaque attente : le délai total de la requête (common.retry) en est prolongé d'autant.
+    """
+
+    def __init__(self):
+        self.seconds = 0.0
+
+
+class Bandwidth:
+    """
+    Seaux global et par hôte du processus, et octets lus par (jour, hôte, catégorie,
+    type de contenu), cumulés dans un fichier JSON. Plusieurs scripts partagent le
+    fichier : save() le relit sous verrou et y ajoute les octets lus depuis
+    l'écriture précédente.
+    """
+
+    def __init__(self, path, max_rate=MAX_BYTES_PER_SECOND, max_host_rate=MAX_HOST_BYTES_PER_SECOND):
+        self.path = path
+        self.usage = Counter()
+        self._pending = Counter()  # octets pas encore ajoutés au fichier
+        self._global = ByteBucket(max_rate)
+        self._hosts = {}
+        self.max_host_rate = max_host_rate
+        self._saved_at = 0.0
+        self.load()
+
+    def configure(self, max_rate=MAX_BYTES_PER_SECOND, max_host_rate=MAX_HOST_BYTES_PER_SECOND):
+        self._global.rate = max_rate
+        self.max_host_rate = max_host_rate
+        for bucket in self._hosts.values():
+            bucket.rate = max_host_rate
+
+    def _host_bucket(self, host):
+        if host not in self._hosts:
+            self._hosts[host] = ByteBucket(self.max_host_rate)
+        return self._hosts[host]
+
+    async def read(self, response, cutoff=None, throttle=None):
+        """
+        Lit le corps de `response` au débit autorisé ; renvoie (octets, secondes d'attente).
+        Avec `cutoff` (common.streaming.ContainerCutoff), la lecture s'arrête dès que
+        les éléments attendus ont été refermés et la connexion est fermée. `throttle`
+        (Throttle) suit les attentes pendant la lecture.
+        """
+        host = urlparse(str(response.url)).netloc
+        bucket = self._host_bucket(host)
+        throttle = throttle or Throttle()
+        chunks = []
+        # Sans arrêt anticipé, des morceaux pleins ; sinon ce qui est arrivé, pour s'arrêter au plus tôt
+        stream = response.content.iter_chunked(CHUNK_SIZE) if cutoff is None else response.content.iter_any()
+        async for chunk in stream:
+            chunks.append(chunk)
+            # Les deux seaux sont débités ensemble : une seule attente, la plus longue
+            wait = max(bucket.take(len(chunk)), self._global.take(len(chunk)))
+            if wait:
+                throttle.seconds += wait
+                await asyncio.sleep(wait)
+            if cutoff is not None and cutoff.feed_bytes(chunk):
+                response.close()
+                break
+        data = b''.join(chunks)
+        self.record(host, response.content_type, len(data))
+        return data, throttle.seconds
+
+    def record(self, host, content_type, size):
+        budget = current_budget()
+        budget.bytes += size
+        category = _category.get() or budget.name or '-'
+        key = '|'.join((date.today().isoformat(), host, category, content_type or '-'))
+        self.usage[key] += size
+        self._pending[key] += size
+        if time.monotonic() - self._saved_at >= SAVE_INTERVAL:
+            self.save()
+
+    def _read(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return Counter(json.load(f))
+        except FileNotFoundError:
+            return Counter()
+        except (IOError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable bandwidth usage {self.path}: {e}")
+            return Counter()
+
+    def load(self):
+        self.usage = self._read() + self._pending
+
+    def save(self):
+        if not self._pending:
+            return
+        tmp_path = self.path + '.tmp'
+        try:
+            with file_lock(self.path + '.lock'):
+                usage = self._read()
+                usage.update(self._pending)
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(dict(sorted(usage.items())), f, ensure_ascii=False, indent=1)
+                os.replace(tmp_path, self.path)
+            # Totaux de tous les scripts, y compris ceux des autres processus
+            self.usage = usage
+            self._pending = Counter()
+            self._saved_at = time.monotonic()
+        except IOError as e:
+            logger.error(f"Error saving bandwidth usage {self.path}: {e}")
+
+    def totals(self, field, day=None):
+        """Octets par hôte, catégorie ou type ('host', 'category', 'type'), pour un jour ou tous."""
+        index = ['day', 'host', 'category', 'type'].index(field)
+        totals = Counter()
+        for key, size in self.usage.items():
+            parts = key.split('|')
+            if day is None or parts[0] == day:
+                totals[parts[index]] += size
+        return totals
+
+
+@contextlib.contextmanager
+def byte_category(name):
+    """Range les octets lus dans ce bloc (et les tâches qui y sont créées) sous `name`."""
+    token = _category.set(name)
+    try:
+        yield
+    finally:
+        _category.reset(token)
+
+
+def format_bytes(size):
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+# Partagé par tous les scripts d'un même processus (le démon les charge tous)
+bandwidth = Bandwidth(os.path.join(os.getcwd(), USAGE_FILE))
+atexit.register(bandwidth.save)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show the bytes downloaded per host, category and content type")
+    parser.add_argument('--day', help="Only this day (YYYY-MM-DD)")
+    parser.add_argument('--file', default=USAGE_FILE, help="Usage file (default: %(default)s)")
+    args = parser.parse_args(argv)
+    usage = Bandwidth(args.file)
+    for field in ('host', 'category', 'type'):
+        print(f"By {field}:")
+        for name, size in usage.totals(field, args.day).most_common():
+            print(f"  {format_bytes(size):>10}  {name}")
+
+
+if __name__ == '__main__':
+    main()
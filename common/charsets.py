@@ -0,0 +1,47 @@
+import codecs
+import re
+from urllib.parse import urlparse
+
+try:
+    from aiohttp.compression_utils import HAS_BROTLI
+except ImportError:  # aiohttp < 3.9
+    try:
+        import brotli
+        HAS_BROTLI = True
+    except ImportError:
+        HAS_BROTLI = False
+
+# Encodage des pages connu d'avance pour chaque site : le corps est décodé une seule
+# fois, sans détection. Pour un autre hôte : charset de l'en-tête Content-Type, puis
+# <meta charset> du début de la page, puis UTF-8.
+
+SITE_ENCODINGS = {
+    'www.businessnews.com.tn': 'utf-8',
+    'www.leaders.com.tn': 'utf-8',
+    'www.challenges.tn': 'utf-8',
+    'www.webmanagercenter.com': 'utf-8',
+}
+
+# Compressions acceptées : br seulement si aiohttp sait la décoder (paquet brotli installé)
+ACCEPT_ENCODING = 'gzip, deflate, br' if HAS_BROTLI else 'gzip, deflate'
+
+META_SNIFF_BYTES = 1024
+META_CHARSET = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([A-Za-z0-9_.:-]+)', re.IGNORECASE)
+
+
+def _lookup(name):
+    try:
+        return codecs.lookup(name).name
+    except (LookupError, TypeError):
+        return None
+
+
+def encoding_for(url, charset=None, data=b''):
+    """Encodage du corps `data` reçu pour `url` ; `charset` : celui de l'en-tête, s'il y en a un."""
+    declared = SITE_ENCODINGS.get(urlparse(url).netloc)
+    if declared:
+        return declared
+    if charset and _lookup(charset):
+        return _lookup(charset)
+    match = META_CHARSET.search(data[:META_SNIFF_BYTES])
+    return (match and _lookup(match.group(1).decode('ascii'))) or 'utf-8'
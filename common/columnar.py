@@ -0,0 +1,362 @@
+import argparse
+import calendar
+import json
+import logging
+import os
+import re
+import sys
+import time
+from datetime import datetime
+from urllib.parse import quote, unquote
+
+try:
+    import pyarrow
+    import pyarrow.parquet as parquet
+except ImportError:  # Parquet est optionnel, repli sur le stockage NumPy
+    pyarrow = None
+    parquet = None
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from common.archive import iter_json_articles
+from common.run_guard import file_lock
+
+logger = logging.getLogger(__name__)
+
+# Export colonnaire du corpus normalisé, partitionné comme un jeu de données « hive » :
+#   <racine>/journal=<journal>/category=<catégorie>/month=<AAAA-MM>/part-<n>.parquet
+# ou, sans pyarrow, des dossiers part-<n>.npcols contenant un fichier .npy par colonne
+# (les textes sont stockés comme en Arrow : octets UTF-8 + tableau d'offsets).
+# Chaque export ajoute de nouveaux fichiers part-* ; les URLs déjà exportées sont
+# listées dans <racine>/_urls.txt (« url<TAB>date<TAB>partition ») pour que les exports
+# successifs restent incrémentaux. Un article revérifié et modifié (champ
+# date_mise_a_jour, common.revisit) est exporté de nouveau, éventuellement dans une
+# autre partition (mois changé) : scan() ne garde que sa ligne la plus récente, dans la
+# partition de sa dernière ligne de _urls.txt, et retire les autres de toutes les partitions.
+
+STRING_COLUMNS = ['url', 'journal', 'category', 'title', 'author', 'date_of_publication', 'content', 'tags']
+INT_COLUMNS = ['published_at']
+COLUMNS = STRING_COLUMNS + INT_COLUMNS
+PARTITION_KEYS = ['journal', 'category', 'month']
+UNKNOWN_MONTH = 'unknown'
+URLS_FILE = '_urls.txt'
+# Date de mise à jour ajoutée par common.revisit aux articles modifiés
+UPDATED_FIELD = 'date_mise_a_jour'
+
+FRENCH_MONTHS = {
+    'janvier': 1, 'février': 2, 'fevrier': 2, 'mars': 3, 'avril': 4, 'mai': 5, 'juin': 6,
+    'juillet': 7, 'août': 8, 'aout': 8, 'septembre': 9, 'octobre': 10, 'novembre': 11,
+    'décembre': 12, 'decembre': 12,
+}
+DATE_PATTERNS = [
+    (re.compile(r'(\d{4})-(\d{2})-(\d{2})(?:[T ](\d{2}):(\d{2}))?'), ('y', 'm', 'd', 'H', 'M')),
+    (re.compile(r'(\d{1,2})/(\d{1,2})/(\d{4})(?:\s*\|\s*(\d{1,2}):(\d{2}))?'), ('d', 'm', 'y', 'H', 'M')),
+    (re.compile(r'(\d{1,2})\.(\d{1,2})\.(\d{4})'), ('d', 'm', 'y')),
+]
+FRENCH_DATE = re.compile(r'(\d{1,2})\s+(%s)\s+(\d{4})' % '|'.join(FRENCH_MONTHS), re.IGNORECASE)
+
+
+def backend():
+    if pyarrow is not None:
+        return 'parquet'
+    if numpy is not None:
+        return 'numpy'
+    raise ImportError("The columnar export needs pyarrow or numpy (pip install pyarrow)")
+
+
+def parse_publication_date(text):
+    """Reconnaît les formats de date des quatre sites, renvoie un datetime ou None."""
+    if not text:
+        return None
+    text = str(text)
+    for pattern, fields in DATE_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            values = dict(zip(fields, match.groups()))
+            try:
+                return datetime(int(values['y']), int(values['m']), int(values['d']),
+                                int(values.get('H') or 0), int(values.get('M') or 0))
+            except ValueError:
+                return None
+    match = FRENCH_DATE.search(text)
+    if match:
+        try:
+            return datetime(int(match.group(3)), FRENCH_MONTHS[match.group(2).lower()], int(match.group(1)))
+        except ValueError:
+            return None
+    return None
+
+
+def normalize_article(article, journal, category):
+    """Ramène les différents schémas des scripts (titre/title, contenu/content, ...) à un seul."""
+    date_text = article.get('date_of_publication') or article.get('date_publish') or article.get('date') or ''
+    published = parse_publication_date(date_text)
+    tags = article.get('tags') or article.get('sublinks') or []
+    return {
+        'url': article.get('url') or article.get('url_video') or '',
+        'journal': journal or '',
+        'category': category or '',
+        'title': article.get('title') or article.get('titre') or '',
+        'author': article.get('author') or article.get('auteur') or '',
+        'date_of_publication': str(date_text),
+        'content': article.get('content') or article.get('contenu') or '',
+        'tags': json.dumps(tags, ensure_ascii=False),
+        'published_at': calendar.timegm(published.timetuple()) if published else -1,
+        'month': published.strftime('%Y-%m') if published else UNKNOWN_MONTH,
+    }
+
+
+def _partition_dir(root, record):
+    return os.path.join(root, *(f"{key}={quote(str(record[key]), safe='')}" for key in PARTITION_KEYS))
+
+
+def _load_exported(root):
+    """
+    Lit _urls.txt. Renvoie :
+    - {url: date de mise à jour exportée ('' si aucune)} ;
+    - {url: partition relative de sa dernière ligne} pour les URLs exportées plusieurs fois ;
+    - les partitions qui peuvent contenir une ligne remplacée, ou None si ce sont
+      peut-être toutes (lignes d'exports anciens, écrites sans leur partition).
+    """
+    exported = {}
+    located = {}
+    history = {}
+    path = os.path.join(root, URLS_FILE)
+    if not os.path.exists(path):
+        return exported, {}, set()
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            fields = line.rstrip('\n').split('\t')
+            url = fields[0]
+            partition = fields[2] if len(fields) > 2 else None
+            if url in exported:
+                history.setdefault(url, [located[url]]).append(partition)
+            exported[url] = fields[1] if len(fields) > 1 else ''
+            located[url] = partition
+    replaced = {url: partitions[-1] for url, partitions in history.items()}
+    stale = set()
+    for partitions in history.values():
+        if None in partitions:
+            return exported, replaced, None
+        stale.update(partitions)
+    return exported, replaced, stale
+
+
+def _part_name():
+    return f"part-{time.time_ns()}"
+
+
+def _write_parquet(directory, rows):
+    table = pyarrow.table({
+        **{name: pyarrow.array([row[name] for row in rows], type=pyarrow.string()) for name in STRING_COLUMNS},
+        **{name: pyarrow.array([row[name] for row in rows], type=pyarrow.int64()) for name in INT_COLUMNS},
+    })
+    parquet.write_table(table, os.path.join(directory, _part_name() + '.parquet'), compression='zstd')
+
+
+def _write_numpy(directory, rows):
+    part = os.path.join(directory, _part_name() + '.npcols')
+    tmp = part + '.tmp'
+    os.makedirs(tmp)
+    for name in STRING_COLUMNS:
+        encoded = [row[name].encode('utf-8') for row in rows]
+        offsets = numpy.zeros(len(encoded) + 1, dtype=numpy.int64)
+        numpy.cumsum([len(value) for value in encoded], out=offsets[1:])
+        numpy.save(os.path.join(tmp, f"{name}.offsets.npy"), offsets)
+        numpy.save(os.path.join(tmp, f"{name}.data.npy"), numpy.frombuffer(b''.join(encoded), dtype=numpy.uint8))
+    for name in INT_COLUMNS:
+        numpy.save(os.path.join(tmp, f"{name}.npy"), numpy.array([row[name] for row in rows], dtype=numpy.int64))
+    os.rename(tmp, part)
+
+
+def export_articles(root, journal, articles_by_category):
+    """
+    Ajoute au jeu de données les articles pas encore exportés, et de nouveau ceux
+    mis à jour depuis leur export (date_mise_a_jour plus récente).
+    `articles_by_category` : itérable de couples (catégorie, article).
+    Renvoie le nombre d'articles ajoutés.
+    """
+    write = _write_parquet if backend() == 'parquet' else _write_numpy
+    os.makedirs(root, exist_ok=True)
+    # Un seul export à la fois par jeu de données (démon et ligne de commande)
+    with file_lock(os.path.join(root, URLS_FILE + '.lock')):
+        return _export_articles(root, journal, articles_by_category, write)
+
+
+def _export_articles(root, journal, articles_by_category, write):
+    exported, _, _ = _load_exported(root)
+
+    by_partition = {}
+    lines = []
+    updates = 0
+    for category, article in articles_by_category:
+        record = normalize_article(article, journal, category)
+        url = record['url']
+        updated = str(article.get(UPDATED_FIELD) or '')
+        previous = exported.get(url)
+        if not url or (previous is not None and updated <= previous):
+            continue
+        exported[url] = updated
+        directory = _partition_dir(root, record)
+        by_partition.setdefault(directory, []).append(record)
+        # Déjà exporté : la nouvelle ligne remplace l'ancienne à la lecture, où qu'elle soit
+        lines.append(f"{url}\t{updated}\t{os.path.relpath(directory, root)}")
+        if previous is not None:
+            updates += 1
+
+    for directory, rows in by_partition.items():
+        os.makedirs(directory, exist_ok=True)
+        write(directory, rows)
+
+    # Les URLs ne sont enregistrées qu'une fois les fichiers écrits
+    with open(os.path.join(root, URLS_FILE), 'a', encoding='utf-8') as f:
+        for line in lines:
+            f.write(line + '\n')
+    logger.info(f"Exported {len(lines)} articles ({updates} updated) from {journal} "
+                f"into {len(by_partition)} partitions of {root}")
+    return len(lines)
+
+
+def export_json(root, json_file):
+    """Exporte un fichier de sortie d'un des scripts (toutes structures confondues)."""
+    with open(json_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    journal = data.get('nom_de_la_presse') or data.get('journal_info', {}).get('journal_name')
+    return export_articles(root, journal, iter_json_articles(data))
+
+
+def partitions(root, journal=None, category=None, month=None):
+    """Liste les partitions correspondant aux filtres, sans ouvrir aucun fichier de données."""
+    wanted = {'journal': journal, 'category': category, 'month': month}
+    found = []
+    if not os.path.isdir(root):
+        return found
+
+    def walk(directory, depth, values):
+        if depth == len(PARTITION_KEYS):
+            found.append((directory, values))
+            return
+        key = PARTITION_KEYS[depth]
+        for entry in sorted(os.listdir(directory)):
+            if not entry.startswith(key + '='):
+                continue
+            value = unquote(entry[len(key) + 1:])
+            if wanted[key] is not None and value != wanted[key]:
+                continue
+            walk(os.path.join(directory, entry), depth + 1, {**values, key: value})
+
+    walk(root, 0, {})
+    return found
+
+
+def _read_numpy_part(part, columns):
+    result = {}
+    for name in columns:
+        if name in INT_COLUMNS:
+            result[name] = numpy.load(os.path.join(part, f"{name}.npy"), mmap_mode='r').tolist()
+            continue
+        offsets = numpy.load(os.path.join(part, f"{name}.offsets.npy"), mmap_mode='r')
+        data = numpy.load(os.path.join(part, f"{name}.data.npy"), mmap_mode='r')
+        raw = data.tobytes()
+        result[name] = [raw[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(offsets) - 1)]
+    return result
+
+
+def _read_part(part, columns):
+    if part.endswith('.parquet'):
+        if parquet is None:
+            raise ImportError(f"Reading {part} needs pyarrow")
+        return parquet.read_table(part, columns=list(dict.fromkeys(columns))).to_pydict()
+    if numpy is None:
+        raise ImportError(f"Reading {part} needs numpy")
+    return _read_numpy_part(part, list(dict.fromkeys(columns)))
+
+
+def _latest_rows(chunks, replaced, partition, columns):
+    """
+    Retire des fichiers de `partition` les lignes remplacées par un export plus récent :
+    une URL de `replaced` ne garde que sa dernière ligne, et seulement dans sa partition.
+    """
+    # Les fichiers part-<temps> sont triés par date d'écriture : la dernière ligne l'emporte
+    latest = {}
+    for i, chunk in enumerate(chunks):
+        for row, url in enumerate(chunk['url']):
+            if replaced.get(url) == partition:
+                latest[url] = (i, row)
+    for i, chunk in enumerate(chunks):
+        keep = [row for row, url in enumerate(chunk['url']) if url not in replaced or latest.get(url) == (i, row)]
+        yield {name: [chunk[name][row] for row in keep] for name in columns}
+
+
+def scan(root, columns=None, journal=None, category=None, month=None):
+    """
+    Parcourt le jeu de données fichier par fichier en ne lisant que les colonnes et
+    les partitions demandées. Produit un dict colonne -> liste de valeurs par fichier.
+    """
+    columns = list(columns or COLUMNS)
+    data_columns = [name for name in columns if name in COLUMNS]
+    _, replaced, stale = _load_exported(root)
+    for directory, values in partitions(root, journal, category, month):
+        parts = [os.path.join(directory, entry) for entry in sorted(os.listdir(directory))
+                 if entry.endswith(('.parquet', '.npcols'))]
+        partition = os.path.relpath(directory, root)
+        if replaced and (stale is None or partition in stale):
+            chunks = _latest_rows([_read_part(part, data_columns + ['url']) for part in parts],
+                                  replaced, partition, data_columns)
+        else:
+            chunks = (_read_part(part, data_columns) for part in parts)
+        for chunk in chunks:
+            rows = len(next(iter(chunk.values()))) if chunk else 0
+            for name in columns:
+                if name not in chunk and name in values:
+                    chunk[name] = [values[name]] * rows
+            yield chunk
+
+
+def read_columns(root, columns=None, **filters):
+    """Concatène le résultat de scan() en un seul dict colonne -> liste."""
+    columns = list(columns or COLUMNS)
+    result = {name: [] for name in columns}
+    for chunk in scan(root, columns, **filters):
+        for name in columns:
+            result[name].extend(chunk.get(name, []))
+    return result
+
+
+def to_pandas(root, columns=None, **filters):
+    import pandas
+    return pandas.DataFrame(read_columns(root, columns, **filters))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Columnar export of the scraped articles")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export = commands.add_parser('export', help="append the articles of JSON output files to the dataset")
+    export.add_argument('root')
+    export.add_argument('json_files', nargs='+')
+
+    count = commands.add_parser('count', help="count articles per partition")
+    count.add_argument('root')
+    for key in PARTITION_KEYS:
+        count.add_argument(f"--{key}")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == 'export':
+        for json_file in args.json_files:
+            export_json(args.root, json_file)
+    elif args.command == 'count':
+        filters = {key: getattr(args, key) for key in PARTITION_KEYS}
+        for directory, values in partitions(args.root, **filters):
+            rows = sum(len(chunk['url']) for chunk in scan(args.root, ['url'], **values))
+            print(f"{values['journal']}\t{values['category']}\t{values['month']}\t{rows}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
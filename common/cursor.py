@@ -0,0 +1,451 @@
+import asyncio
+import logging
+import re
+import time
+
+import aiohttp
+
+from common.negative_cache import dead_urls
+from common.run_guard import current_budget
+
+logger = logging.getLogger(__name__)
+
+# Identifiants numériques des articles dans les URLs :
+#   Business News : https://www.businessnews.com.tn/titre,521,137211,3  -> 137211
+#   Leaders       : https://www.leaders.com.tn/article/32900-titre       -> 32900
+#                   https://www.leaders.com.tn/video/21473/21473-titre   -> 21473
+ARTICLE_ID_PATTERNS = [
+    re.compile(r',\d+,(\d+),\d+/?$'),
+    re.compile(r'/(?:article|video)/(\d+)'),
+]
+DATE_FIELDS = ['date_of_publication', 'date_publish', 'date']
+
+DEFAULT_PER_PAGE = 20
+RANGE_PAGES = 25  # taille des tranches de pages d'archive parcourues en parallèle
+ARCHIVE_WORKERS = 4  # tranches lues en même temps (en plus de la limite d'articles de chaque script)
+MAX_BACK_STEPS = 3  # pages remontées au plus pour retrouver l'article le plus ancien
+TAIL_RECHECK_INTERVAL = 7 * 24 * 3600  # archive terminée : revérifier la fin une fois par semaine
+
+
+class ListingFetchError(Exception):
+    """
+    Page de liste non lue (erreur réseau, 5xx ou 403/429 après les tentatives,
+    disjoncteur ouvert) : ce n'est ni une page vide ni la fin de la liste.
+    """
+
+
+async def fetch_listing(fetch, session, url, **kwargs):
+    """
+    Page de liste lue avec le `fetch` du script : son HTML, ou None si elle n'existe
+    pas (404/410, au-delà de la fin de la liste). Lève ListingFetchError si elle n'a
+    pas pu être lue ; le curseur n'avance pas et la page est relue au run suivant.
+    """
+    started = time.time()
+    try:
+        html_content = await fetch(session, url, **kwargs)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        raise ListingFetchError(f"{url}: {e!r}") from e
+    if html_content is None and not dead_urls.gone_since(url, started):
+        raise ListingFetchError(f"{url}: no response body")
+    return html_content
+
+
+def article_id(url):
+    """Identifiant numérique de l'article (croissant avec la publication), ou None."""
+    for pattern in ARTICLE_ID_PATTERNS:
+        match = pattern.search(url or '')
+        if match:
+            return int(match.group(1))
+    return None
+
+
+def article_url(article):
+    return article.get('url') or article.get('url_video') or ''
+
+
+def article_date(article):
+    for field in DATE_FIELDS:
+        if article.get(field):
+            return article[field]
+    return None
+
+
+class ListingCursor:
+    """
+    Position d'une catégorie dans sa liste paginée, décrite par ses deux bouts plutôt
+    que par un numéro de page (qui glisse à chaque nouvel article publié) :
+    - tête : identifiant et date de l'article le plus récent déjà enregistré ; un run
+      incrémental parcourt les pages depuis la page 1 et s'arrête à la première page
+      qui le contient (ou un plus ancien) ;
+    - queue : identifiant, date et dernière page connue de l'article le plus ancien ;
+      le parcours de l'archive saute directement à cette page décalée du nombre
+      d'articles publiés depuis, puis se recale sur l'identifiant.
+    Les sites sans identifiant numérique dans les URLs retombent sur le numéro de page.
+    """
+
+    def __init__(self, newest_id=None, newest_date=None, oldest_id=None, oldest_date=None,
+                 oldest_page=None, shifted=0, per_page=None, complete=False, tail_checked=None, ranges=None):
+        self.newest_id = newest_id
+        self.newest_date = newest_date
+        self.oldest_id = oldest_id
+        self.oldest_date = oldest_date
+        self.oldest_page = oldest_page
+        self.shifted = shifted  # articles publiés depuis que oldest_page a été relevée
+        self.per_page = per_page
+        self.complete = complete
+        self.tail_checked = tail_checked
+        # Tranches d'archive restant à lire : [prochaine page, dernière page] (None : jusqu'à la fin)
+        self.ranges = ranges or []
+        self._stored = 0
+        self._head_start = None
+        self._head_new = 0
+        self._head_max = None
+        self._head_date = None
+        self._locating = False
+        self._back_steps = 0
+
+    @classmethod
+    def from_config(cls, value, stored_urls=()):
+        """
+        Relit le curseur enregistré dans un fichier de config. `value` est soit le dict
+        de to_dict(), soit l'ancien numéro de page (last_page_scraped) ; il manque alors
+        les identifiants, qui sont repris des articles déjà enregistrés.
+        """
+        if isinstance(value, dict):
+            cursor = cls(**value)
+        else:
+            cursor = cls(oldest_page=value if isinstance(value, int) and value > 1 else None)
+        ids = [i for i in (article_id(url) for url in stored_urls) if i is not None]
+        cursor._stored = len(ids)
+        if ids and cursor.newest_id is None:
+            cursor.newest_id = max(ids)
+            cursor.oldest_id = min(ids)
+        return cursor
+
+    def to_dict(self):
+        return {
+            'newest_id': self.newest_id,
+            'newest_date': self.newest_date,
+            'oldest_id': self.oldest_id,
+            'oldest_date': self.oldest_date,
+            'oldest_page': self.oldest_page,
+            'shifted': self.shifted,
+            'per_page': self.per_page,
+            'complete': self.complete,
+            'tail_checked': self.tail_checked,
+            'ranges': [r for r in self.ranges if r[1] is None or r[0] <= r[1]],
+        }
+
+    def _ids(self, listing):
+        ids = [i for i in (article_id(url) for url in listing) if i is not None]
+        if listing:
+            self.per_page = max(self.per_page or 0, len(listing))
+        return ids
+
+    @staticmethod
+    def _dated(articles, pick):
+        dated = [(article_id(article_url(a)), article_date(a)) for a in articles]
+        dated = [(i, d) for i, d in dated if i is not None and d]
+        return pick(dated) if dated else (None, None)
+
+    # Tête de liste
+
+    @property
+    def has_head(self):
+        """Faux tant qu'aucun article n'est connu : tout est alors de l'archive."""
+        return self.newest_id is not None
+
+    def start_head(self):
+        self._head_start = self.newest_id
+        self._head_new = 0
+        self._head_max = None
+        self._head_date = None
+
+    def head_page(self, listing, articles):
+        """
+        Enregistre une page de tête (`listing` : toutes les URLs de la page, `articles` :
+        les articles récupérés). Renvoie True s'il faut lire la page suivante.
+        """
+        listing = listing or [article_url(a) for a in articles]
+        ids = self._ids(listing)
+        if ids:
+            self._head_new += sum(1 for i in ids if self._head_start is None or i > self._head_start)
+            if self._head_max is None or max(ids) > self._head_max:
+                self._head_max = max(ids)
+            newest_id, newest_date = self._dated(articles, max)
+            if newest_id is not None and newest_id == self._head_max:
+                self._head_date = newest_date
+        if self._head_start is None:
+            return bool(listing)
+        if ids:
+            return bool(listing) and min(ids) > self._head_start
+        # Pas d'identifiants : la tête connue est atteinte dès qu'un article de la page était déjà vu
+        return bool(listing) and len(articles) == len(listing)
+
+    def finish_head(self):
+        """Tête entièrement parcourue : elle devient la nouvelle référence."""
+        self.shifted += self._head_new
+        if self._head_max is not None and (self.newest_id is None or self._head_max > self.newest_id):
+            self.newest_id = self._head_max
+            self.newest_date = self._head_date or self.newest_date
+
+    def add_head(self, articles):
+        """
+        Articles récents trouvés hors de la liste (flux RSS, sitemap) quand la tête n'est
+        pas relue : ils avancent la tête et font glisser l'archive comme une page de tête.
+        """
+        ids = [i for i in (article_id(article_url(a)) for a in articles) if i is not None]
+        new_ids = [i for i in ids if self.newest_id is None or i > self.newest_id]
+        self.shifted += len(new_ids)
+        if new_ids:
+            self.newest_id = max(new_ids)
+            newest_id, newest_date = self._dated(articles, max)
+            if newest_id == self.newest_id:
+                self.newest_date = newest_date
+
+    # Archive
+
+    def archive_page(self, now=None):
+        """Page où reprendre l'archive, ou None si elle est déjà entièrement parcourue."""
+        now = time.time() if now is None else now
+        if self.complete and self.tail_checked and now - self.tail_checked < TAIL_RECHECK_INTERVAL:
+            return None
+        per_page = self.per_page or DEFAULT_PER_PAGE
+        if self.ranges:
+            # Reprise de tranches commencées : les décaler des articles publiés depuis,
+            # avec une page de recouvrement quand le décalage n'est pas un nombre entier de pages
+            pages, extra = divmod(self.shifted, per_page)
+            self.ranges = [[start + pages, None if end is None else end + pages + (1 if extra else 0)]
+                           for start, end in self.ranges if end is None or start <= end]
+            self.shifted = 0
+            self._locating = False
+            return self.ranges[0][0] if self.ranges else None
+        self._locating = self.oldest_id is not None
+        self._back_steps = 0
+        if self.oldest_page is not None:
+            page = self.oldest_page + self.shifted // per_page
+        else:
+            page = (self._stored + self.shifted) // per_page
+        return max(page, 1)
+
+    def tail_page(self, page_number, listing, articles):
+        """Enregistre une page d'archive, renvoie le numéro de la prochaine page à lire."""
+        listing = listing or [article_url(a) for a in articles]
+        ids = self._ids(listing)
+        if self._locating and ids:
+            if min(ids) > self.oldest_id and not self._back_steps:
+                # Page encore trop récente : l'article le plus ancien a glissé plus loin
+                return page_number + 1
+            if max(ids) < self.oldest_id and self._back_steps < MAX_BACK_STEPS and page_number > 1:
+                # Trop loin (articles supprimés entre-temps) : remonter
+                self._back_steps += 1
+                return page_number - 1
+        self._locating = False
+        self._record_tail(page_number, ids, articles)
+        self.oldest_page = page_number
+        self.shifted = 0
+        return page_number + 1
+
+    @property
+    def locating(self):
+        """Vrai tant que la page de l'article le plus ancien n'a pas été retrouvée."""
+        return self._locating
+
+    def _record_tail(self, page_number, ids, articles):
+        if ids and (self.oldest_id is None or min(ids) <= self.oldest_id):
+            self.oldest_id = min(ids)
+            self.oldest_page = page_number
+            oldest_id, oldest_date = self._dated(articles, min)
+            if oldest_id == self.oldest_id:
+                self.oldest_date = oldest_date
+        if self.newest_id is None and ids:
+            self.newest_id = max(ids)
+            self.newest_date = self._dated(articles, max)[1]
+
+    def plan_ranges(self, first_page, last_page, range_pages=RANGE_PAGES):
+        """
+        Découpe les pages [first_page, last_page] en tranches ; la dernière reste
+        ouverte pour suivre l'archive si elle s'allonge pendant le parcours.
+        """
+        self.ranges = [[start, min(start + range_pages - 1, last_page)]
+                       for start in range(first_page, last_page + 1, range_pages)]
+        if self.ranges:
+            self.ranges[-1][1] = None
+        self.shifted = 0
+
+    def range_page(self, page_range, page_number, listing, articles):
+        """
+        Enregistre une page lue dans la tranche `page_range` (un élément de self.ranges).
+        Renvoie la prochaine page de la tranche, ou None si elle est terminée.
+        Une page vide ferme la tranche : à n'appeler que pour une page effectivement lue.
+        """
+        listing = listing or [article_url(a) for a in articles]
+        if not listing:
+            # Page vide : fin de l'archive (ou archive raccourcie depuis le découpage)
+            page_range[0] = page_number
+            page_range[1] = page_number - 1
+            return None
+        self._record_tail(page_number, self._ids(listing), articles)
+        page_range[0] = page_number + 1
+        if page_range[1] is not None and page_range[0] > page_range[1]:
+            return None
+        return page_range[0]
+
+    def finish_ranges(self):
+        """Vrai (et archive marquée terminée) quand toutes les tranches sont lues."""
+        if any(end is None or start <= end for start, end in self.ranges):
+            return False
+        self.ranges = []
+        self.finish_tail()
+        return True
+
+    def finish_tail(self, now=None):
+        self.complete = True
+        self.tail_checked = time.time() if now is None else now
+
+    def __str__(self):
+        return (f"newest #{self.newest_id} ({self.newest_date}), oldest #{self.oldest_id} "
+                f"({self.oldest_date}) on page {self.oldest_page}")
+
+
+async def crawl_listing(cursor, scrape_page, save_page):
+    """
+    Parcours d'une catégorie avec son curseur : d'abord la nouvelle tête, puis la
+    suite de l'archive tant que le budget du run le permet.
+    - scrape_page(page_number, listing) : nouveaux articles de la page, None ou [] quand
+      la liste est finie ; ajoute à `listing` les URLs de tous les articles de la page ;
+      lève ListingFetchError (fetch_listing) quand la page n'a pas pu être lue ;
+    - save_page(articles) : sauvegarde les articles et le curseur après chaque page.
+    Renvoie les nouveaux articles de la tête seulement : ceux rattrapés dans l'archive
+    ne sont pas des parutions récentes et fausseraient le RefreshPlanner du démon.
+    """
+    head_articles = []
+
+    async def visit(page_number):
+        listing = []
+        articles = await scrape_page(page_number, listing)
+        return listing, articles
+
+    if cursor.has_head:
+        cursor.start_head()
+        page_number = 1
+        while True:
+            if current_budget().exhausted():
+                logger.info(f"Run budget exhausted ({current_budget()}) while reading the head, next run starts again from page 1")
+                return head_articles
+            try:
+                listing, articles = await visit(page_number)
+            except ListingFetchError as e:
+                logger.warning(f"Listing page {page_number} not read ({e}), next run starts again from page 1")
+                return head_articles
+            if articles is None and not listing:
+                break
+            more = cursor.head_page(listing, articles or [])
+            head_articles.extend(articles or [])
+            await save_page(articles or [])
+            if not more:
+                break
+            page_number += 1
+        cursor.finish_head()
+        await save_page([])
+
+    page_number = cursor.archive_page()
+    if page_number is None:
+        return head_articles
+
+    if not cursor.ranges:
+        # Se recaler page par page sur l'article le plus ancien déjà connu
+        while True:
+            if current_budget().exhausted():
+                logger.info(f"Run budget exhausted ({current_budget()}), next run resumes the archive after {cursor}")
+                return head_articles
+            try:
+                listing, articles = await visit(page_number)
+            except ListingFetchError as e:
+                # Queue inchangée : la même page est relue au prochain run
+                logger.warning(f"Archive page {page_number} not read ({e}), next run resumes after {cursor}")
+                return head_articles
+            if not articles and not listing:
+                cursor.finish_tail()
+                await save_page([])
+                logger.info(f"End of the archive reached at page {page_number}")
+                return head_articles
+            page_number = cursor.tail_page(page_number, listing, articles or [])
+            await save_page(articles or [])
+            if not cursor.locating:
+                break
+
+        # Dernière page de l'archive, puis découpage en tranches
+        async def has_articles(probe_page):
+            listing, articles = await visit(probe_page)
+            await save_page(articles or [])
+            return bool(listing or articles)
+
+        try:
+            last_page = await find_last_page(has_articles, page_number)
+        except ListingFetchError as e:
+            # Une page non lue fausserait la borne : pas de découpage avant le prochain run
+            logger.warning(f"Archive page not read while looking for the last page ({e}), next run tries again after {cursor}")
+            await save_page([])
+            return head_articles
+        if last_page is None:
+            cursor.finish_tail()
+            await save_page([])
+            logger.info(f"End of the archive reached at page {page_number}")
+            return head_articles
+        cursor.plan_ranges(page_number, last_page)
+        await save_page([])
+        logger.info(f"Archive pages {page_number}-{last_page} split into {len(cursor.ranges)} ranges")
+
+    async def walk(page_range):
+        page_number = page_range[0]
+        while page_number is not None:
+            if current_budget().exhausted():
+                return
+            try:
+                listing, articles = await visit(page_number)
+            except ListingFetchError as e:
+                # Tranche laissée ouverte à cette page, reprise au prochain run
+                logger.warning(f"Archive page {page_number} not read ({e}), its range is resumed on the next run")
+                return
+            page_number = cursor.range_page(page_range, page_number, listing, articles or [])
+            await save_page(articles or [])
+
+    pending = list(cursor.ranges)
+
+    async def worker():
+        while pending:
+            await walk(pending.pop(0))
+
+    await asyncio.gather(*(worker() for _ in range(ARCHIVE_WORKERS)))
+    if cursor.finish_ranges():
+        logger.info("End of the archive reached")
+    else:
+        logger.info(f"Archive not finished ({current_budget()}), next run resumes {len(cursor.to_dict()['ranges'])} archive ranges")
+    await save_page([])
+    return head_articles
+
+
+async def find_last_page(has_articles, first_page=1):
+    """
+    Dernière page non vide d'une liste paginée, à partir de `first_page` (ou None si
+    elle est vide) : sondage exponentiel first+1, first+2, first+4, ... jusqu'à une
+    page vide, puis recherche dichotomique entre la dernière page pleine et celle-ci.
+    Environ 2·log2(n) requêtes au lieu de n. Une page non lue n'est pas une borne :
+    l'exception de `has_articles` (ListingFetchError) interrompt la recherche.
+    """
+    if not await has_articles(first_page):
+        return None
+    low, step = first_page, 1
+    while True:
+        high = first_page + step
+        if not await has_articles(high):
+            break
+        low, step = high, step * 2
+    while high - low > 1:
+        middle = (low + high) // 2
+        if await has_articles(middle):
+            low = middle
+        else:
+            high = middle
+    return low
@@ -0,0 +1,381 @@
+import argparse
+import asyncio
+import importlib.util
+import json
+import logging
+import os
+import random
+import signal
+import sys
+import time
+
+import aiohttp
+
+from common import columnar, fastpath, latency, singleflight
+from common.bandwidth import MAX_BYTES_PER_SECOND, MAX_HOST_BYTES_PER_SECOND, bandwidth, byte_category, format_bytes
+from common.parse_cache import parse_cache
+from common.raw_pages import raw_pages
+from common.revisit import revisits
+from common.rate_limit import limiter
+from common.run_guard import RunLock
+from common.refresh import DEFAULT_MAX_INTERVAL, DEFAULT_MIN_INTERVAL, DEFAULT_TARGET_NEW_PER_POLL, RefreshPlanner
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_INTERVAL = 3600  # comme schedule.every().hour dans les scripts
+DEFAULT_MAX_CONCURRENT_JOBS = 4
+DEFAULT_SHUTDOWN_TIMEOUT = 300
+DEFAULT_STATE_DIR = os.path.join(ROOT_DIR, 'state')
+STARTUP_SPREAD = 60  # secondes, pour ne pas lancer tous les jobs au même instant
+
+# Scripts hébergés par le démon : chemin relatif à la racine du dépôt et coroutine
+# principale (elle accepte le paramètre `session`).
+JOBS = {
+    'bn-actualites': ('Business News/Busines-Actualités.py', 'scrape_all_articles'),
+    'bn-auto': ('Business News/Business-Auto.py', 'scrape_all_articles'),
+    'bn-tv': ('Business News/Business-BNTv.py', 'scrape_all_articles'),
+    'bn-dossiers': ('Business News/Business-Dossiers.py', 'scrape_all_articles'),
+    'bn-caricature': ('Business News/Business-OpCaricature.py', 'scrape_all_articles'),
+    'bn-chroniques': ('Business News/Business-OpChroniques.py', 'scrape_all_articles'),
+    'bn-tribunes': ('Business News/Business-OpTribunes.py', 'scrape_all_articles'),
+    'bn-reseaux': ('Business News/Business-SurResaux.py', 'scrape_all_articles'),
+    'bn-check': ('Business News/Businessnews-BNcheck.py', 'scrape_all_articles'),
+    'bn-all': ('BNall/BN.py', 'scrape_all_categories'),
+    'bn-10jrs': ('BN10jrs/BN10j.py', 'scrape_all_categories'),
+    'bn-ids': ('BNall/BN.py', 'discover_ids'),
+    'leaders-blog': ('Leaders/Leaders-Blog.py', 'scrape_all_articles'),
+    'leaders-dossier': ('Leaders/Leaders-Dossier.py', 'scrape_all_articles'),
+    'leaders-hommage': ('Leaders/Leaders-Hommage.py', 'scrape_all_articles'),
+    'leaders-lifestyle': ('Leaders/Leaders-Lifestyle.py', 'scrape_all_articles'),
+    'leaders-news': ('Leaders/Leaders-News.py', 'scrape_all_articles'),
+    'leaders-notes': ('Leaders/Leaders-Notes.py', 'scrape_all_articles'),
+    'leaders-opinion': ('Leaders/Leaders-Opinion.py', 'scrape_all_articles'),
+    'leaders-success': ('Leaders/Leaders-Success.py', 'scrape_all_articles'),
+    'leaders-tv': ('Leaders/Leaders-TV.py', 'scrape_all_articles'),
+    'leaders-who': ('Leaders/Leaders-Who.py', 'scrape_all_articles'),
+    'leaders-10jrs': ('Leaders10jrs/Lead10.py', 'scrape_all_categories'),
+    'challenges-10jrs': ('challenges/challenges10jrs.py', 'scrape_all_categories'),
+    'wmc-10jrs': ('wmc10jrs/web10jrs.py', 'scrape_all_categories'),
+}
+
+# Ces scripts renvoient à chaque run tous les articles des 10 derniers jours, et non
+# les seuls nouveaux : les nouveaux articles sont ceux absents du run précédent.
+SNAPSHOT_JOBS = {'bn-10jrs', 'leaders-10jrs', 'challenges-10jrs', 'wmc-10jrs'}
+
+# Jobs lancés seulement s'ils sont activés dans la config ("enabled": true)
+OPT_IN_JOBS = {'bn-ids'}
+
+
+def article_key(article):
+    if isinstance(article, dict):
+        return article.get('url') or article.get('url_video') or article.get('id')
+    return None
+
+
+def result_by_category(name, result):
+    """Articles renvoyés par un run, regroupés par clé de catégorie ('job' ou 'job/catégorie')."""
+    if isinstance(result, list):
+        return {name: result}
+    if isinstance(result, dict):
+        return {f"{name}/{category}": articles for category, articles in result.items() if isinstance(articles, list)}
+    return {}
+
+
+def load_script(path, name):
+    """
+    Importe un script comme module. Le dossier courant est celui du script pendant
+    l'import : les chemins de sortie (os.getcwd()) sont les mêmes qu'avec
+    `cd <dossier> && python <script>`.
+    """
+    spec = importlib.util.spec_from_file_location(f"crawl_job_{name.replace('-', '_')}", path)
+    module = importlib.util.module_from_spec(spec)
+    previous_dir = os.getcwd()
+    os.chdir(os.path.dirname(path))
+    try:
+        spec.loader.exec_module(module)
+    finally:
+        os.chdir(previous_dir)
+    return module
+
+
+class Job:
+    def __init__(self, name, script, entry, interval):
+        self.name = name
+        self.script = script
+        self.entry = entry
+        self.interval = interval  # None : intervalle adaptatif
+        self.previous_urls = {}
+        self.module = None
+        self.next_run = 0.0
+        self.task = None
+        self.runs = 0
+        self.failures = 0
+        self.last_duration = None
+
+    def load(self):
+        self.module = load_script(os.path.join(ROOT_DIR, self.script), self.name)
+
+
+class CrawlDaemon:
+    """
+    Héberge tous les crawls sur une seule boucle asyncio persistante.
+
+    La session aiohttp (pool de connexions, cache DNS) et les modules des scripts
+    (index des fichiers de sortie, caches) restent en mémoire d'un run à l'autre.
+    Un même job ne tourne jamais deux fois en parallèle.
+    SIGTERM/SIGINT : arrêt propre (on attend la fin des runs en cours).
+    SIGHUP : relecture de la configuration et rechargement des scripts.
+    """
+
+    def __init__(self, config_path=None, only=None, once=False, state_dir=DEFAULT_STATE_DIR):
+        self.config_path = config_path
+        self.state_dir = state_dir
+        self.planner = None
+        self.only = set(only or [])
+        self.once = once
+        self.jobs = {}
+        self.session = None
+        self._stopping = asyncio.Event()
+        self._wakeup = asyncio.Event()
+        self._reload_requested = False
+        self._slots = None
+        self._export_lock = asyncio.Lock()
+        self.config = {}
+
+    # Configuration
+
+    def read_config(self):
+        config = {}
+        if self.config_path and os.path.exists(self.config_path):
+            with open(self.config_path, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+        return config
+
+    def load_jobs(self):
+        self.config = self.read_config()
+        default_interval = self.config.get('interval', DEFAULT_INTERVAL)
+        adaptive = self.config.get('adaptive', True)
+        self.planner = RefreshPlanner(
+            os.path.join(self.state_dir, 'refresh_history.json'),
+            default_interval=default_interval,
+            min_interval=self.config.get('min_interval', DEFAULT_MIN_INTERVAL),
+            max_interval=self.config.get('max_interval', DEFAULT_MAX_INTERVAL),
+            target_new_per_poll=self.config.get('target_new_per_poll', DEFAULT_TARGET_NEW_PER_POLL),
+        )
+        jobs_config = self.config.get('jobs', {})
+        jobs = {}
+        for name, (script, entry) in JOBS.items():
+            job_config = jobs_config.get(name, {})
+            if self.only and name not in self.only:
+                continue
+            if not job_config.get('enabled', name not in OPT_IN_JOBS):
+                continue
+            interval = job_config.get('interval', None if adaptive else default_interval)
+            job = self.jobs.get(name)
+            if job is None:
+                job = Job(name, script, entry, interval)
+                job.next_run = random.uniform(0, STARTUP_SPREAD) if not self.once else 0.0
+            job.interval = interval
+            try:
+                job.load()
+            except Exception as e:
+                logger.error(f"Unable to load {script} for job '{name}': {e}")
+                if job.module is None:
+                    continue
+            jobs[name] = job
+        self.jobs = jobs
+        self._slots = asyncio.Semaphore(self.config.get('max_concurrent_jobs', DEFAULT_MAX_CONCURRENT_JOBS))
+        bandwidth.configure(self.config.get('max_bytes_per_second', MAX_BYTES_PER_SECOND),
+                            self.config.get('max_host_bytes_per_second', MAX_HOST_BYTES_PER_SECOND))
+        logger.info(f"Loaded {len(jobs)} crawl jobs: {', '.join(sorted(jobs))}")
+
+    # Signaux
+
+    def stop(self):
+        logger.info("Shutdown requested, waiting for running crawls to finish...")
+        self._stopping.set()
+        self._wakeup.set()
+
+    def reload(self):
+        logger.info("Reload requested")
+        self._reload_requested = True
+        self._wakeup.set()
+
+    def _install_signal_handlers(self, loop):
+        handlers = {signal.SIGINT: self.stop, signal.SIGTERM: self.stop}
+        if hasattr(signal, 'SIGHUP'):
+            handlers[signal.SIGHUP] = self.reload
+        for sig, handler in handlers.items():
+            try:
+                loop.add_signal_handler(sig, handler)
+            except (NotImplementedError, RuntimeError):
+                pass  # Windows : seul Ctrl+C est géré (KeyboardInterrupt)
+
+    # Exécution
+
+    async def _run_job(self, job):
+        async with self._slots:
+            if self._stopping.is_set():
+                return
+            started = time.monotonic()
+            logger.info(f"Job '{job.name}' started")
+            try:
+                # Octets comptés sous le nom du job
+                with byte_category(job.name):
+                    result = await getattr(job.module, job.entry)(session=self.session)
+                job.runs += 1
+                self._observe(job, result)
+                await self._export(job)
+            except asyncio.CancelledError:
+                logger.warning(f"Job '{job.name}' cancelled")
+                raise
+            except Exception as e:
+                job.failures += 1
+                logger.exception(f"Job '{job.name}' failed: {e}")
+            finally:
+                job.last_duration = time.monotonic() - started
+                logger.info(f"Job '{job.name}' finished in {job.last_duration:.1f}s")
+
+    def _observe(self, job, result):
+        """Transmet au planificateur le nombre de nouveaux articles de chaque catégorie."""
+        for key, articles in result_by_category(job.name, result).items():
+            urls = set(filter(None, (article_key(article) for article in articles)))
+            if job.name in SNAPSHOT_JOBS:
+                previous = job.previous_urls.get(key)
+                job.previous_urls[key] = urls
+                if previous is None:
+                    self.planner.restart(key)
+                    continue
+                new_count = len(urls - previous)
+            else:
+                new_count = len(urls)
+            self.planner.record(key, new_count)
+        try:
+            self.planner.save()
+        except IOError as e:
+            logger.error(f"Error saving refresh history: {e}")
+
+    async def _export(self, job):
+        """
+        Ajoute au jeu de données colonnaire (option "columnar_export") les articles du
+        fichier de sortie du job qui n'y sont pas encore, ou qui ont été mis à jour.
+        """
+        root = self.config.get('columnar_export')
+        output_file = getattr(job.module, 'output_file', None)
+        if not root or not output_file or not os.path.exists(output_file):
+            return
+        root = os.path.join(ROOT_DIR, root)
+        # Le fichier n'est pas lu pendant qu'un autre run l'écrit : il sera exporté après son run
+        lock = RunLock(output_file + '.lock')
+        if not lock.acquire():
+            logger.info(f"{output_file} is being written, not exporting it now")
+            return
+        try:
+            async with self._export_lock:
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(None, columnar.export_json, root, output_file)
+        except (ImportError, IOError, ValueError) as e:
+            logger.error(f"Columnar export of {output_file} failed: {e}")
+        finally:
+            lock.release()
+
+    def _job_interval(self, job):
+        if job.interval is not None:
+            return job.interval
+        keys = [key for key in self.planner.stats if key == job.name or key.startswith(job.name + '/')]
+        return self.planner.next_interval(keys)
+
+    def _on_job_done(self, job, task):
+        job.task = None
+        loop = asyncio.get_running_loop()
+        # Prochain run : un intervalle après le début du précédent, jamais en parallèle
+        interval = self._job_interval(job)
+        job.next_run = max(job.next_run + interval, loop.time())
+        logger.info(f"Job '{job.name}' next run in {job.next_run - loop.time():.0f}s")
+        self._wakeup.set()
+
+    def _start_due_jobs(self, loop):
+        now = loop.time()
+        for job in self.jobs.values():
+            if job.task is None and job.next_run <= now and not (self.once and job.runs + job.failures):
+                job.next_run = now
+                job.task = loop.create_task(self._run_job(job))
+                job.task.add_done_callback(lambda task, job=job: self._on_job_done(job, task))
+
+    def _next_wakeup(self, loop):
+        waiting = [job.next_run for job in self.jobs.values() if job.task is None]
+        if not waiting:
+            return None
+        return max(0.0, min(waiting) - loop.time())
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        self._install_signal_handlers(loop)
+        self.load_jobs()
+
+        connector = aiohttp.TCPConnector(limit=100, ttl_dns_cache=600, keepalive_timeout=60)
+        self.session = aiohttp.ClientSession(connector=connector)
+        try:
+            while not self._stopping.is_set():
+                if self._reload_requested:
+                    self._reload_requested = False
+                    self.load_jobs()
+                self._start_due_jobs(loop)
+                if self.once and all(job.task is None and job.runs + job.failures for job in self.jobs.values()):
+                    break
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self._next_wakeup(loop))
+                except asyncio.TimeoutError:
+                    pass
+            await self._drain()
+        finally:
+            await self.session.close()
+        for summary in latency.summaries():
+            logger.info(f"Latency {summary}")
+        for summary in fastpath.summaries():
+            logger.info(f"Fast path {summary}")
+        logger.info(f"Parse cache: {parse_cache.summary()}")
+        raw_pages.flush()
+        logger.info(f"Revisits: {revisits.summary()}")
+        revisits.save()
+        for host, (rate, max_rate) in limiter.rates().items():
+            logger.info(f"Rate limit {host}: {rate:.2f}/{max_rate:.2f} requests/s")
+        for category, size in bandwidth.totals('category', time.strftime('%Y-%m-%d')).most_common():
+            logger.info(f"Downloaded today: {format_bytes(size)} for {category}")
+        bandwidth.save()
+        logger.info(f"Crawl daemon stopped ({singleflight.responses}; {singleflight.results})")
+
+    async def _drain(self):
+        running = [job.task for job in self.jobs.values() if job.task is not None]
+        if not running:
+            return
+        timeout = self.config.get('shutdown_timeout', DEFAULT_SHUTDOWN_TIMEOUT)
+        done, pending = await asyncio.wait(running, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.wait(pending)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run all the crawls in one long-lived process")
+    parser.add_argument('--config', help="JSON configuration file (see common/README.md)")
+    parser.add_argument('--job', action='append', dest='jobs', choices=sorted(JOBS), help="only run these jobs")
+    parser.add_argument('--state-dir', default=DEFAULT_STATE_DIR, help="where the daemon keeps its state (refresh history, ...)")
+    parser.add_argument('--once', action='store_true', help="run every job once, then exit")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    daemon = CrawlDaemon(args.config, only=args.jobs, once=args.once, state_dir=args.state_dir)
+    try:
+        asyncio.run(daemon.run())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,143 @@
+from bs4 import Tag
+
+# Extraction déclarative : les règles d'un site (titre, date, auteur, corps, liens)
+# sont décrites une fois au chargement du script, puis évaluées en un seul parcours de
+# l'arbre au lieu d'un soup.find / find_all par champ. Les résultats sont ceux des
+# appels find équivalents : premier élément dans l'ordre du document, sélecteurs de
+# repli essayés dans l'ordre, recherches limitées au sous-arbre d'un autre élément.
+
+
+def _match_value(value, wanted):
+    if wanted is True:
+        return value is not None
+    if value is None:
+        return False
+    if isinstance(value, list):
+        # Attribut à valeurs multiples (class) : une des valeurs ou la chaîne complète, comme find
+        return wanted in value or wanted == ' '.join(value)
+    return value == wanted
+
+
+class Select:
+    """Critères d'un soup.find : nom (ou liste de noms) de balise, class_ et attributs."""
+
+    def __init__(self, name=None, class_=None, **attrs):
+        self.names = None if name is None else ({name} if isinstance(name, str) else set(name))
+        self.attrs = dict(attrs)
+        if class_ is not None:
+            self.attrs['class'] = class_
+
+    def matches(self, tag):
+        if self.names is not None and tag.name not in self.names:
+            return False
+        return all(_match_value(tag.get(key), wanted) for key, wanted in self.attrs.items())
+
+
+class First:
+    """soup.find(a) or soup.find(b) or ... ; `within` : nom d'une règle First sans `within`."""
+
+    def __init__(self, *selects, within=None):
+        self.selects = selects
+        self.within = within
+
+
+class All:
+    """container.find_all(...) dans l'élément retenu par la règle `within` (ou tout le document)."""
+
+    def __init__(self, select, within=None):
+        self.selects = (select,)
+        self.within = within
+
+
+class Extractor:
+    """
+    Extractor(title=First(...), content=First(...), links=All(..., within='content')).
+    run(soup) renvoie {nom: élément ou None} pour les règles First et {nom: liste}
+    pour les règles All. Le parcours s'arrête dès que toutes les règles ont leur
+    résultat définitif.
+    """
+
+    def __init__(self, **rules):
+        self.rules = rules
+        for name, rule in rules.items():
+            parent = rules.get(rule.within) if rule.within else None
+            if rule.within and not (isinstance(parent, First) and parent.within is None):
+                raise ValueError(f"Rule '{name}': 'within' must name a First rule without 'within'")
+            if rule.within and len(rule.selects) != 1:
+                raise ValueError(f"Rule '{name}': a rule with 'within' takes a single selector")
+        self.top = [name for name, rule in rules.items() if rule.within is None]
+        # Règles limitées à chaque règle First : candidat i -> matches dans son sous-arbre
+        self.scoped = {name: [child for child, rule in rules.items() if rule.within == name]
+                       for name in self.top if isinstance(rules[name], First)}
+
+    def run(self, soup):
+        rules = self.rules
+        # Premier élément de chaque sélecteur des règles First, éléments des règles All
+        firsts = {name: [None] * len(rule.selects) for name, rule in rules.items() if isinstance(rule, First)}
+        alls = {name: [] for name, rule in rules.items() if isinstance(rule, All) and rule.within is None}
+        # Pour les règles limitées : {règle: {candidat: résultat}}
+        scoped_firsts = {name: {} for name, rule in rules.items() if isinstance(rule, First) and rule.within}
+        scoped_alls = {name: {} for name, rule in rules.items() if isinstance(rule, All) and rule.within}
+        open_scopes = []  # [parent, candidat, dernier descendant]
+        closed = set()  # (parent, candidat) dont le sous-arbre a été parcouru
+        pending = set(self.top) | set(scoped_firsts) | set(scoped_alls)
+
+        def settled(name):
+            rule = rules[name]
+            if rule.within is None:
+                return isinstance(rule, First) and firsts[name][0] is not None
+            if firsts[rule.within][0] is None:
+                return False
+            if isinstance(rule, First) and 0 in scoped_firsts[name] and scoped_firsts[name][0] is not None:
+                return True
+            return (rule.within, 0) in closed
+
+        for node in soup.descendants:
+            changed = False
+            if isinstance(node, Tag):
+                for scope in open_scopes:
+                    parent, candidate, _ = scope
+                    for child in self.scoped[parent]:
+                        rule = rules[child]
+                        if not rule.selects[0].matches(node):
+                            continue
+                        if isinstance(rule, All):
+                            scoped_alls[child].setdefault(candidate, []).append(node)
+                        elif scoped_firsts[child].get(candidate) is None:
+                            scoped_firsts[child][candidate] = node
+                            changed = True
+                for name in self.top:
+                    rule = rules[name]
+                    if isinstance(rule, All):
+                        if rule.selects[0].matches(node):
+                            alls[name].append(node)
+                        continue
+                    found = firsts[name]
+                    for index, select in enumerate(rule.selects):
+                        if found[index] is None and select.matches(node):
+                            found[index] = node
+                            changed = True
+                            if self.scoped[name]:
+                                open_scopes.append([name, index, node._last_descendant()])
+            if open_scopes:
+                for scope in [scope for scope in open_scopes if scope[2] is node]:
+                    open_scopes.remove(scope)
+                    closed.add((scope[0], scope[1]))
+                    changed = True
+            if changed:
+                pending = {name for name in pending if not settled(name)}
+                if not pending:
+                    break
+
+        result = {}
+        for name, rule in rules.items():
+            if rule.within is None:
+                result[name] = alls[name] if isinstance(rule, All) else next((tag for tag in firsts[name] if tag is not None), None)
+                continue
+            candidates = firsts[rule.within]
+            chosen = next((index for index, tag in enumerate(candidates) if tag is not None), None)
+            if isinstance(rule, All):
+                result[name] = scoped_alls[name].get(chosen, [])
+            else:
+                result[name] = scoped_firsts[name].get(chosen)
+        return result
@@ -0,0 +1,336 @@
+import bisect
+import functools
+import html as htmllib
+import logging
+import re
+from collections import deque
+from html.entities import html5
+
+logger = logging.getLogger(__name__)
+
+# Chemin rapide d'extraction : les champs d'un article sont lus directement dans le
+# HTML brut, à partir des balises repères du gabarit du site, sans construire d'arbre.
+# Tout ce que le chemin rapide ne sait pas lire à l'identique de BeautifulSoup
+# (html.parser) lève MarkupError : la page passe alors par l'extraction complète.
+
+VERIFY_EVERY = 50  # une page réussie sur VERIFY_EVERY est aussi extraite par le DOM et comparée
+WINDOW = 100  # pages observées pour le taux de réussite
+ALERT_RATE = 0.5  # en dessous, le gabarit du site a probablement changé
+
+VOID_ELEMENTS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'keygen', 'link', 'meta',
+                 'param', 'source', 'track', 'wbr'}
+RAW_TEXT_ELEMENTS = {'script', 'style'}
+
+_TAG = re.compile(r'<(/?)([a-zA-Z][^\s/>]*)((?:[^>"\']|"[^"]*"|\'[^\']*\')*?)(/?)>')
+# Commentaires et balises qui séparent les chaînes de texte d'un élément
+_SPLIT = re.compile(r'<!--.*?-->|</?[a-zA-Z][^\s/>]*(?:[^>"\']|"[^"]*"|\'[^\']*\')*?/?>', re.S)
+_ATTR = re.compile(r'([^\s=/>"\']+)(?:\s*=\s*("[^"]*"|\'[^\']*\'|[^\s>]+))?')
+_COMMENT = re.compile(r'<!--.*?-->', re.S)
+_OPAQUE = re.compile(r'<!--.*?(?:-->|$)|<(script|style)(?=[\s/>]).*?(?:</\1(?=[\s/>])|$)|<[!?][^>]*>', re.S | re.I)
+_last_spans = (None, [], [])
+_REFERENCE = re.compile(r'&(#[0-9a-zA-Z]*|[a-zA-Z][a-zA-Z0-9]*)(;?)')
+# '&#' mal formé : html.parser peut lire toute la suite du document comme du texte
+_BROKEN_NUMERIC = re.compile(r'&#(?![0-9]+;|[xX][0-9a-fA-F]+;)')
+
+
+class MarkupError(ValueError):
+    """Balisage que le chemin rapide ne lit pas comme BeautifulSoup : repli sur le DOM."""
+
+
+def _attributes(text):
+    attrs = {}
+    for name, value in _ATTR.findall(text):
+        if value[:1] in ('"', "'"):
+            value = value[1:-1]
+        attrs[name.lower()] = htmllib.unescape(value)
+    return attrs
+
+
+def _matches(attrs, wanted):
+    for key, value in wanted.items():
+        actual = attrs.get(key)
+        if value is True:
+            if actual is None:
+                return False
+        elif key == 'class':
+            classes = (actual or '').split()
+            if value not in classes and value != ' '.join(classes):
+                return False
+        elif actual != value:
+            return False
+    return True
+
+
+def _tags(html, pos, end):
+    """(nom, fermante, vide, attributs, début, fin) des balises de html[pos:end], sans commentaires."""
+    while True:
+        lt = html.find('<', pos, end)
+        if lt < 0:
+            return
+        if html.startswith('<!--', lt):
+            close = html.find('-->', lt + 4, end)
+            if close < 0:
+                raise MarkupError("Unclosed comment")
+            pos = close + 3
+            continue
+        if html.startswith('<!', lt) or html.startswith('<?', lt):
+            close = html.find('>', lt, end)
+            if close < 0:
+                raise MarkupError("Unclosed declaration")
+            pos = close + 1
+            continue
+        match = _TAG.match(html, lt, end)
+        if match is None:
+            raise MarkupError(f"Unparsed '<' at {lt}")
+        closing, name, attrs, empty = match.groups()
+        name = name.lower()
+        yield name, bool(closing), bool(empty) or name in VOID_ELEMENTS, attrs, lt, match.end()
+        pos = match.end()
+        if not closing and name in RAW_TEXT_ELEMENTS:
+            close = re.compile(rf'</{name}[\s/>]', re.I).search(html, pos, end)
+            pos = close.start() if close else end
+
+
+def _same_reference(name, semicolon):
+    """True si html.unescape et BeautifulSoup décodent la référence &name; de la même façon."""
+    if not semicolon:
+        return False
+    if not name.startswith('#'):
+        return name + ';' in html5 and name != 'Tab'
+    try:
+        code = int(name[2:], 16) if name[1:2] in ('x', 'X') else int(name[1:])
+    except ValueError:
+        return False
+    # Caractères de contrôle, surrogates et non-caractères : décodés différemment
+    if code == 0x0a or 0x20 <= code < 0x7f or 0x80 <= code < 0xd800:
+        return not 0xfdd0 <= code <= 0xfdef
+    return 0xe000 <= code <= 0x10ffff and code & 0xfffe != 0xfffe and not 0xfdd0 <= code <= 0xfdef
+
+
+def _check_text(text):
+    """Une référence mal formée change aussi le découpage du HTML par html.parser : repli."""
+    if '&' in text:
+        for match in _REFERENCE.finditer(_COMMENT.sub('', text)):
+            if not _same_reference(*match.groups()):
+                raise MarkupError(f"Character reference {match.group()!r} decoded differently by BeautifulSoup")
+
+
+class Element:
+    """Élément trouvé dans le HTML brut : attributs et bornes de son contenu."""
+
+    def __init__(self, html, name, attrs, start, end):
+        self.html = html
+        self.name = name
+        self.attrs = attrs
+        self.start = start
+        self.end = end
+
+    def __getitem__(self, key):
+        return self.attrs[key]
+
+    def get(self, key, default=None):
+        return self.attrs.get(key, default)
+
+    def strings(self):
+        """Chaînes de texte de l'élément dans l'ordre, sans les retirer ni les nettoyer (element.strings)."""
+        strings = []
+        for piece in _SPLIT.split(self.html[self.start:self.end]):
+            if '<' in piece:
+                raise MarkupError("Markup other than tags and comments")
+            if piece:
+                strings.append(htmllib.unescape(piece))
+        return strings
+
+    def text(self, separator=''):
+        """element.get_text(separator, strip=True)."""
+        return separator.join([string.strip() for string in self.strings() if string.strip()])
+
+    def find_all(self, names, **attrs):
+        return find_all(self.html, names, self.start, self.end, **attrs)
+
+    def find(self, names, **attrs):
+        return find(self.html, names, self.start, self.end, **attrs)
+
+
+def _walk(html, start, end):
+    """
+    Éléments de html[start:end] (bien formé, sinon MarkupError), avec leurs bornes,
+    dans l'ordre du document.
+    """
+    elements = []
+    stack = []
+    pos = start
+    for name, closing, empty, attrs, tag_start, tag_end in _tags(html, start, end):
+        _check_text(html[pos:tag_start])
+        pos = tag_end
+        if name in RAW_TEXT_ELEMENTS:
+            raise MarkupError(f"<{name}> in the extracted region")
+        if closing:
+            if not stack or stack[-1][0] != name:
+                raise MarkupError(f"Unexpected </{name}> at {tag_start}")
+            open_name, open_attrs, inner_start, index = stack.pop()
+            elements[index] = Element(html, open_name, open_attrs, inner_start, tag_start)
+        elif empty:
+            elements.append(Element(html, name, attrs, tag_end, tag_end))
+        else:
+            stack.append((name, attrs, tag_end, len(elements)))
+            elements.append(None)
+    if stack:
+        raise MarkupError(f"Unclosed <{stack[-1][0]}>")
+    _check_text(html[pos:end])
+    return elements
+
+
+def _close(html, name, start, limit):
+    """Fin du contenu de l'élément `name` ouvert juste avant `start`."""
+    depth = 0
+    for tag_name, closing, empty, attrs, tag_start, tag_end in _tags(html, start, limit):
+        if tag_name in RAW_TEXT_ELEMENTS:
+            raise MarkupError(f"<{tag_name}> in the extracted region")
+        if empty:
+            continue
+        if not closing:
+            depth += 1
+        elif depth:
+            depth -= 1
+        elif tag_name == name:
+            return tag_start
+        else:
+            raise MarkupError(f"Unexpected </{tag_name}> at {tag_start}")
+    raise MarkupError(f"Unclosed <{name}>")
+
+
+@functools.lru_cache(maxsize=64)
+def _open_pattern(names):
+    return re.compile('<(?:%s)(?=[\\s/>])' % '|'.join(map(re.escape, sorted(names))), re.I)
+
+
+def _opaque_spans(html):
+    """Bornes des commentaires, déclarations et contenus script/style : pas d'éléments dedans."""
+    global _last_spans
+    if _last_spans[0] is not html:
+        spans = [(match.start(), match.end()) for match in _OPAQUE.finditer(html)]
+        _last_spans = (html, [span[0] for span in spans], [span[1] for span in spans])
+    return _last_spans[1], _last_spans[2]
+
+
+def _hidden(html, pos):
+    starts, ends = _opaque_spans(html)
+    index = bisect.bisect_right(starts, pos) - 1
+    return index >= 0 and pos < ends[index]
+
+
+def find(html, names, start=0, end=None, class_=None, **attrs):
+    """soup.find(names, class_=..., **attrs) sur html[start:end] ; le contenu est vérifié bien formé."""
+    end = len(html) if end is None else end
+    pattern = _open_pattern(frozenset([names] if isinstance(names, str) else names))
+    if class_ is not None:
+        attrs['class'] = class_
+    pos = start
+    while True:
+        # Balises ouvrantes candidates cherchées par expression régulière, sans tokenizer
+        candidate = pattern.search(html, pos, end)
+        if candidate is None:
+            return None
+        pos = candidate.end()
+        tag = _TAG.match(html, candidate.start(), end)
+        if tag is None or _hidden(html, candidate.start()):
+            continue
+        closing, name, raw_attrs, empty = tag.groups()
+        name = name.lower()
+        parsed = _attributes(raw_attrs)
+        if not _matches(parsed, attrs):
+            continue
+        empty = bool(empty) or name in VOID_ELEMENTS
+        inner_end = tag.end() if empty else _close(html, name, tag.end(), end)
+        if _BROKEN_NUMERIC.search(html, start, inner_end):
+            raise MarkupError("Malformed numeric character reference before the element")
+        if not empty:
+            _walk(html, tag.end(), inner_end)
+        return Element(html, name, parsed, tag.end(), inner_end)
+
+
+def find_all(html, names, start=0, end=None, class_=None, **attrs):
+    """element.find_all(names, ...) sur html[start:end], qui doit être bien formé."""
+    end = len(html) if end is None else end
+    names = {names} if isinstance(names, str) else set(names)
+    if class_ is not None:
+        attrs['class'] = class_
+    found = []
+    for element in _walk(html, start, end):
+        if element.name not in names:
+            continue
+        if isinstance(element.attrs, str):
+            element.attrs = _attributes(element.attrs)
+        if _matches(element.attrs, attrs):
+            found.append(element)
+    return found
+
+
+class FastPath:
+    """
+    FastPath(name, fast, full) : appelé comme `full(html_content, url)`, essaie d'abord `fast`, qui renvoie
+    None (ou lève MarkupError) quand la page ne passe pas sa validation. Compte les
+    réussites, les replis et les écarts constatés sur les pages vérifiées, et prévient
+    quand le taux de réussite chute (gabarit du site modifié).
+    """
+
+    def __init__(self, name, fast, full, verify_every=VERIFY_EVERY):
+        self.name = name
+        self.fast = fast
+        self.full = full
+        self.verify_every = verify_every
+        self.hits = 0
+        self.fallbacks = 0
+        self.mismatches = 0
+        self.recent = deque(maxlen=WINDOW)
+        self._alerted = False
+        _instances.append(self)
+
+    def __call__(self, html_content, url):
+        try:
+            result = self.fast(html_content, url)
+        except MarkupError as e:
+            logger.debug(f"Fast path {self.name}: {e}")
+            result = None
+        if result is None:
+            self.fallbacks += 1
+            self._observe(False)
+            return self.full(html_content, url)
+        self.hits += 1
+        if self.verify_every and self.hits % self.verify_every == 0:
+            full = self.full(html_content, url)
+            if full != result:
+                self.mismatches += 1
+                self._observe(False)
+                logger.warning(f"Fast path {self.name} disagrees with the full parser on {url}")
+                return full
+        self._observe(True)
+        return result
+
+    def _observe(self, hit):
+        self.recent.append(hit)
+        if len(self.recent) < self.recent.maxlen:
+            return
+        rate = self.hit_rate()
+        if rate < ALERT_RATE and not self._alerted:
+            logger.warning(f"Fast path {self.name}: {rate:.0%} hits over the last {len(self.recent)} pages, "
+                           f"the site template may have changed")
+            self._alerted = True
+        elif rate >= ALERT_RATE:
+            self._alerted = False
+
+    def hit_rate(self):
+        return sum(self.recent) / len(self.recent) if self.recent else None
+
+    def summary(self):
+        total = self.hits + self.fallbacks
+        rate = f"{self.hits / total:.0%}" if total else "n/a"
+        return f"{self.name}: {rate} fast ({self.hits} hits, {self.fallbacks} fallbacks, {self.mismatches} mismatches)"
+
+
+_instances = []
+
+
+def summaries():
+    return [fast_path.summary() for fast_path in _instances]
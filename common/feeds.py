@@ -0,0 +1,256 @@
+import argparse
+import asyncio
+import gzip
+import json
+import logging
+import os
+import sys
+import xml.etree.ElementTree as ElementTree
+from collections import namedtuple
+from email.utils import parsedate_to_datetime
+from urllib.parse import urljoin, urlparse
+from urllib.request import url2pathname
+
+import aiohttp
+
+from common.retry import fetch_with_retries
+
+logger = logging.getLogger(__name__)
+
+# Découverte des nouveaux articles par les flux RSS/Atom et les sitemaps (y compris
+# les sitemaps « news » et les index de sitemaps), au lieu de télécharger et parser
+# une page de liste HTML par catégorie. Les documents sont relus avec des requêtes
+# conditionnelles (ETag / Last-Modified) et, dans un index de sitemaps, seuls les
+# sitemaps dont le <lastmod> a changé sont relus.
+# Une source peut aussi être un fichier local (chemin ou URL file://).
+
+FeedEntry = namedtuple('FeedEntry', ['url', 'lastmod', 'title', 'status'])
+
+NEW = 'new'
+CHANGED = 'changed'
+
+
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1].lower()
+
+
+def _child_text(element, *names):
+    """Texte du premier descendant trouvé, par ordre de préférence des noms."""
+    texts = {}
+    for child in element.iter():
+        name = _local_name(child.tag)
+        if child is not element and name in names and name not in texts and child.text and child.text.strip():
+            texts[name] = child.text.strip()
+    return next((texts[name] for name in names if name in texts), None)
+
+
+def _normalize_date(value):
+    """Dates RFC 822 (RSS) ramenées en ISO 8601 ; les dates ISO sont gardées telles quelles."""
+    if not value:
+        return None
+    if value[:4].isdigit():
+        return value
+    try:
+        return parsedate_to_datetime(value).isoformat()
+    except (TypeError, ValueError):
+        return value
+
+
+def parse_feed(data, base_url=''):
+    """
+    Analyse un flux RSS 2.0, Atom, un sitemap ou un index de sitemaps.
+    Renvoie (entrées [(url, lastmod, titre)], sitemaps enfants [(url, lastmod)]).
+    """
+    if data[:2] == b'\x1f\x8b':
+        data = gzip.decompress(data)
+    root = ElementTree.fromstring(data)
+    kind = _local_name(root.tag)
+    entries, children = [], []
+    if kind == 'rss' or kind == 'rdf':
+        for item in root.iter():
+            if _local_name(item.tag) == 'item':
+                link = _child_text(item, 'link', 'guid')
+                if link:
+                    date = _child_text(item, 'updated', 'date', 'pubdate')
+                    entries.append((urljoin(base_url, link), _normalize_date(date), _child_text(item, 'title')))
+    elif kind == 'feed':
+        for entry in root:
+            if _local_name(entry.tag) != 'entry':
+                continue
+            link = None
+            for child in entry:
+                if _local_name(child.tag) == 'link' and child.get('rel', 'alternate') == 'alternate':
+                    link = child.get('href')
+                    break
+            if link:
+                date = _child_text(entry, 'updated', 'published')
+                entries.append((urljoin(base_url, link), _normalize_date(date), _child_text(entry, 'title')))
+    elif kind == 'urlset':
+        for url in root:
+            if _local_name(url.tag) != 'url':
+                continue
+            loc = _child_text(url, 'loc')
+            if loc:
+                # Sitemaps « news » : la date de publication tient lieu de lastmod
+                date = _child_text(url, 'lastmod', 'publication_date')
+                entries.append((urljoin(base_url, loc), _normalize_date(date), _child_text(url, 'title')))
+    elif kind == 'sitemapindex':
+        for sitemap in root:
+            if _local_name(sitemap.tag) == 'sitemap':
+                loc = _child_text(sitemap, 'loc')
+                if loc:
+                    children.append((urljoin(base_url, loc), _child_text(sitemap, 'lastmod')))
+    else:
+        raise ValueError(f"Unknown feed format <{root.tag}>")
+    return entries, children
+
+
+def _local_path(source):
+    parsed = urlparse(source)
+    if parsed.scheme == 'file':
+        return url2pathname(parsed.path)
+    if parsed.scheme in ('http', 'https'):
+        return None
+    return source
+
+
+class FeedDiscovery:
+    """
+    Sources de découverte d'un site. discover() renvoie les entrées nouvelles ou
+    dont le lastmod a changé depuis le dernier save() ; l'appelant les traite puis
+    appelle save() pour les marquer comme vues.
+    """
+
+    def __init__(self, sources, state_path=None, ssl=None, headers=None):
+        self.sources = list(sources)
+        self.state_path = state_path
+        self.ssl = ssl
+        self.headers = headers or {}
+        self.state = {'documents': {}, 'entries': {}}
+        self._pending = {}
+        self.failed = []
+        self.read = []  # URLs de toutes les entrées lues au dernier discover(), nouvelles ou non
+        self.modified = 0  # documents relus au dernier discover() (les autres n'ont pas changé)
+        self.load()
+
+    def load(self):
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                self.state = json.load(f)
+        except (IOError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable feed state {self.state_path}: {e}")
+
+    def save(self):
+        self.state['entries'].update(self._pending)
+        self._pending = {}
+        if not self.state_path:
+            return
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def forget(self, url):
+        """L'entrée n'a pas pu être traitée : elle sera de nouveau proposée au prochain discover()."""
+        self._pending.pop(url, None)
+
+    async def _read(self, session, source):
+        """Contenu du document, ou None s'il n'a pas changé depuis la dernière lecture."""
+        document = self.state['documents'].setdefault(source, {})
+        path = _local_path(source)
+        if path is not None:
+            mtime = os.stat(path).st_mtime_ns
+            if document.get('mtime') == mtime:
+                return None
+            with open(path, 'rb') as f:
+                data = f.read()
+            document['mtime'] = mtime
+            return data
+
+        headers = dict(self.headers)
+        if document.get('etag'):
+            headers['If-None-Match'] = document['etag']
+        if document.get('last_modified'):
+            headers['If-Modified-Since'] = document['last_modified']
+        response = await fetch_with_retries(session, source, read='bytes', ssl=self.ssl, headers=headers)
+        if response.status == 304:
+            return None
+        if response.status != 200:
+            raise IOError(f"HTTP {response.status} for {source}")
+        document['etag'] = response.headers.get('ETag')
+        document['last_modified'] = response.headers.get('Last-Modified')
+        return response.body
+
+    async def _walk(self, session, source, found):
+        documents = self.state['documents']
+        try:
+            data = await self._read(session, source)
+            if data is None:
+                logger.debug(f"Feed not modified: {source}")
+                return
+            self.modified += 1
+            entries, children = parse_feed(data, source)
+            found.extend(entries)
+            for child, lastmod in children:
+                known = documents.get(child, {}).get('lastmod')
+                if lastmod and known == lastmod:
+                    continue
+                await self._walk(session, child, found)
+                documents.setdefault(child, {})['lastmod'] = lastmod
+        except Exception:
+            # Ne pas garder l'ETag d'un document mal lu (ou d'un index dont un sitemap a
+            # échoué) : il serait ensuite « non modifié » et ses entrées perdues
+            documents.pop(source, None)
+            raise
+
+    async def discover(self, session):
+        """Entrées nouvelles ou modifiées de toutes les sources (FeedEntry)."""
+        self.failed = []
+        self.modified = 0
+        found = []
+        for source in self.sources:
+            try:
+                await self._walk(session, source, found)
+            except (IOError, OSError, ValueError, ElementTree.ParseError, aiohttp.ClientError) as e:
+                logger.warning(f"Feed discovery failed for {source}: {e}")
+                self.failed.append(source)
+
+        self.read = [url for url, lastmod, title in found]
+        known = self.state['entries']
+        result = {}
+        for url, lastmod, title in found:
+            if url in result:
+                continue
+            if url not in known:
+                result[url] = FeedEntry(url, lastmod, title, NEW)
+            elif lastmod and known[url] != lastmod:
+                result[url] = FeedEntry(url, lastmod, title, CHANGED)
+            self._pending[url] = lastmod
+        logger.info(f"Feed discovery: {len(found)} entries, {len(result)} new or changed")
+        return list(result.values())
+
+
+async def _main(args):
+    discovery = FeedDiscovery(args.sources, args.state)
+    async with aiohttp.ClientSession() as session:
+        entries = await discovery.discover(session)
+    for entry in entries:
+        print(f"{entry.status}\t{entry.lastmod or ''}\t{entry.url}")
+    if args.state:
+        discovery.save()
+    return 1 if discovery.failed else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="List new or changed URLs of RSS/Atom feeds and sitemaps")
+    parser.add_argument('sources', nargs='+', help="feed or sitemap URLs, or local files")
+    parser.add_argument('--state', help="state file; without it every entry is reported as new")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    return asyncio.run(_main(args))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+import asyncio
+import heapq
+import itertools
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+FRESH = 'fresh'
+BACKFILL = 'backfill'
+
+DEFAULT_BACKFILL_INTERVAL = 2.0  # secondes minimum entre deux pages d'archive
+
+
+class Frontier:
+    """
+    File de pages à crawler à deux voies :
+    - FRESH : têtes de liste (nouveaux articles), toujours servie en premier, les
+      pages les moins profondes d'abord ;
+    - BACKFILL : pages d'archive, servie seulement quand la voie FRESH est vide et
+      au plus une page toutes les `backfill_interval` secondes.
+
+    Les workers appellent get() jusqu'à recevoir None (plus rien à faire ou file
+    fermée), puis task_done() après chaque élément traité.
+    """
+
+    def __init__(self, backfill_interval=DEFAULT_BACKFILL_INTERVAL):
+        self.backfill_interval = backfill_interval
+        self._fresh = []
+        self._backfill = deque()
+        self._counter = itertools.count()
+        self._in_flight = 0
+        self._closed = False
+        self._next_backfill = 0.0
+        self._wakeup = asyncio.Event()
+        self.served = {FRESH: 0, BACKFILL: 0}
+
+    def push(self, item, lane=FRESH, priority=0):
+        if self._closed:
+            return
+        if lane == FRESH:
+            heapq.heappush(self._fresh, (priority, next(self._counter), item))
+        else:
+            self._backfill.append(item)
+        self._notify()
+
+    def _notify(self):
+        self._wakeup.set()
+
+    def close(self):
+        """Arrête la distribution (budget épuisé, arrêt du démon...)."""
+        self._closed = True
+        self._fresh.clear()
+        self._backfill.clear()
+        self._notify()
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def pending(self):
+        return {FRESH: len(self._fresh), BACKFILL: len(self._backfill)}
+
+    async def get(self):
+        """Renvoie (voie, élément), ou None quand il n'y a plus rien à distribuer."""
+        loop = asyncio.get_running_loop()
+        while True:
+            if self._closed:
+                return None
+            if self._fresh:
+                self._in_flight += 1
+                self.served[FRESH] += 1
+                return FRESH, heapq.heappop(self._fresh)[2]
+            now = loop.time()
+            if self._backfill and now >= self._next_backfill:
+                self._next_backfill = now + self.backfill_interval
+                self._in_flight += 1
+                self.served[BACKFILL] += 1
+                return BACKFILL, self._backfill.popleft()
+            if not self._backfill and self._in_flight == 0:
+                return None
+            # Attendre un nouvel élément, la fin d'une tâche ou le prochain créneau d'archive
+            self._wakeup.clear()
+            timeout = max(0.0, self._next_backfill - now) if self._backfill else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def task_done(self):
+        self._in_flight -= 1
+        self._notify()
@@ -0,0 +1,101 @@
+import logging
+import math
+from collections import deque
+from urllib.parse import urlparse
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# Latences observées par hôte, d'où sont tirés les timeouts de chaque phase d'une
+# requête et le délai après lequel une requête lente est doublée (« hedging »).
+
+WINDOW = 200  # dernières requêtes gardées par hôte
+MIN_SAMPLES = 20  # en dessous, timeouts par défaut et pas de hedging
+
+# Timeouts par défaut (secondes), puis bornes des timeouts adaptés
+DEFAULT_CONNECT = 10.0
+DEFAULT_FIRST_BYTE = 30.0
+DEFAULT_TOTAL = 60.0
+MIN_CONNECT, MAX_CONNECT = 2.0, 15.0
+MIN_FIRST_BYTE, MAX_FIRST_BYTE = 5.0, 45.0
+MIN_TOTAL, MAX_TOTAL = 10.0, 90.0
+TIMEOUT_FACTOR = 3.0  # timeout = FACTOR x p99 de la phase
+
+HEDGE_PERCENTILE = 95
+MIN_HEDGE_DELAY = 0.5
+
+
+def percentile(samples, p):
+    """Percentile (rang le plus proche) d'une liste non vide."""
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def _clamp(value, low, high):
+    return max(low, min(high, value))
+
+
+class HostLatency:
+    """
+    Durées des dernières requêtes d'un hôte : jusqu'aux en-têtes de la réponse
+    (connexion + premier octet) et totale (corps compris).
+    """
+
+    def __init__(self, host, window=WINDOW):
+        self.host = host
+        self.first_byte = deque(maxlen=window)
+        self.total = deque(maxlen=window)
+
+    def record(self, first_byte, total):
+        self.first_byte.append(first_byte)
+        self.total.append(total)
+
+    def record_timeout(self, timeout):
+        # Une requête expirée compte pour la durée du timeout : sans cela les timeouts
+        # ne pourraient jamais remonter quand l'hôte ralentit
+        self.record(timeout.sock_read or timeout.total, timeout.total)
+
+    @property
+    def ready(self):
+        return len(self.total) >= MIN_SAMPLES
+
+    def timeout(self):
+        """aiohttp.ClientTimeout par phase, d'après le p99 observé."""
+        if not self.ready:
+            return aiohttp.ClientTimeout(total=DEFAULT_TOTAL, sock_connect=DEFAULT_CONNECT, sock_read=DEFAULT_FIRST_BYTE)
+        first_byte = percentile(self.first_byte, 99) * TIMEOUT_FACTOR
+        total = percentile(self.total, 99) * TIMEOUT_FACTOR
+        return aiohttp.ClientTimeout(
+            total=_clamp(total, MIN_TOTAL, MAX_TOTAL),
+            # La connexion est une partie du délai jusqu'au premier octet
+            sock_connect=_clamp(first_byte, MIN_CONNECT, MAX_CONNECT),
+            sock_read=_clamp(first_byte, MIN_FIRST_BYTE, MAX_FIRST_BYTE),
+        )
+
+    def hedge_delay(self):
+        """Délai après lequel doubler une requête (p95 de la durée totale), ou None."""
+        if not self.ready:
+            return None
+        return max(MIN_HEDGE_DELAY, percentile(self.total, HEDGE_PERCENTILE))
+
+    def summary(self):
+        if not self.total:
+            return f"{self.host}: no samples"
+        return (f"{self.host}: p50 {percentile(self.total, 50):.2f}s, p95 {percentile(self.total, 95):.2f}s, "
+                f"p99 {percentile(self.total, 99):.2f}s over {len(self.total)} requests")
+
+
+_hosts = {}
+
+
+def latency_for(url):
+    """Latences de l'hôte de `url`, partagées par tous les scripts du processus."""
+    host = urlparse(url).netloc
+    if host not in _hosts:
+        _hosts[host] = HostLatency(host)
+    return _hosts[host]
+
+
+def summaries():
+    return [tracker.summary() for tracker in _hosts.values()]
@@ -0,0 +1,185 @@
+import atexit
+import functools
+import json
+import logging
+import os
+import time
+from collections import namedtuple
+
+from common.run_guard import current_budget, file_lock
+
+logger = logging.getLogger(__name__)
+
+# Cache négatif des URLs mortes ou illisibles (« tombstones ») : une URL en échec n'est
+# plus remise en file avant l'expiration de son délai, qui dépend de la raison de
+# l'échec et double à chaque nouvel échec (jusqu'à MAX_TTL).
+
+GONE = 'gone'  # 404 / 410
+PARSE_FAILURE = 'parse'  # page lue mais sans titre reconnu
+SERVER_ERROR = 'server'  # erreurs 5xx répétées
+
+Policy = namedtuple('Policy', ['ttl', 'strikes'])  # délai de base, échecs avant blocage
+POLICIES = {
+    GONE: Policy(7 * 24 * 3600, 1),
+    PARSE_FAILURE: Policy(24 * 3600, 1),
+    SERVER_ERROR: Policy(3600, 2),
+}
+MAX_TTL = 30 * 24 * 3600
+STRIKE_INTERVAL = 60  # deux échecs plus rapprochés (tentatives d'un même fetch) n'en font qu'un
+SAVE_INTERVAL = 10  # secondes minimum entre deux écritures du fichier (plus une à la sortie)
+FETCHED_ENTRIES = 10000  # pages lues retenues en mémoire pour track_failures
+
+# Valeurs de repli des scripts quand le titre d'un article n'a pas été trouvé
+FALLBACK_TITLES = {'Titre non trouvé', 'Titre non disponible'}
+
+CACHE_FILE = 'dead_urls.json'
+
+
+class NegativeCache:
+    """
+    URLs en échec, enregistrées dans un fichier JSON :
+    {url: {'reason', 'strikes', 'failed', 'until'}}. blocked(url) est vrai jusqu'à
+    `until` ; l'entrée est gardée ensuite pour que l'échec suivant double le délai,
+    puis oubliée MAX_TTL après son expiration.
+
+    Plusieurs scripts partagent le fichier : save() le relit sous verrou et n'y
+    applique que les entrées modifiées par ce processus depuis l'écriture précédente.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self._changes = {}  # url -> entrée modifiée, ou None si supprimée
+        self._fetched = {}  # url -> date de la dernière page lue (200), en mémoire seulement
+        self._saved_at = 0.0
+        self.load()
+
+    def _read(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (IOError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable negative cache {self.path}: {e}")
+            return {}
+        now = time.time()
+        # Un premier échec pas encore bloquant (until à 0) compte depuis sa date
+        return {url: entry for url, entry in entries.items()
+                if max(entry.get('until', 0), entry.get('failed') or 0) + MAX_TTL > now}
+
+    def load(self):
+        self.entries = self._read()
+
+    def save(self):
+        if not self._changes:
+            return
+        tmp_path = self.path + '.tmp'
+        try:
+            with file_lock(self.path + '.lock'):
+                entries = self._read()
+                for url, entry in self._changes.items():
+                    if entry is None:
+                        entries.pop(url, None)
+                    else:
+                        entries[url] = entry
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(entries, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+            # Les échecs enregistrés entre-temps par les autres scripts valent aussi ici
+            self.entries = entries
+            self._changes = {}
+            self._saved_at = time.monotonic()
+        except IOError as e:
+            logger.error(f"Error saving negative cache {self.path}: {e}")
+
+    def _changed(self, url):
+        self._changes[url] = self.entries.get(url)
+        if time.monotonic() - self._saved_at >= SAVE_INTERVAL:
+            self.save()
+
+    def record(self, url, reason, now=None):
+        now = time.time() if now is None else now
+        policy = POLICIES[reason]
+        entry = self.entries.get(url)
+        if entry is None or entry['reason'] != reason:
+            entry = {'reason': reason, 'strikes': 0, 'failed': None, 'until': 0}
+        if entry['failed'] is None or now - entry['failed'] >= STRIKE_INTERVAL:
+            entry['strikes'] += 1
+        entry['failed'] = now
+        if entry['strikes'] >= policy.strikes:
+            ttl = min(policy.ttl * 2 ** (entry['strikes'] - policy.strikes), MAX_TTL)
+            entry['until'] = now + ttl
+            logger.info(f"Negative cache: {url} ({reason}, {entry['strikes']} failures) skipped for {ttl / 3600:.0f}h")
+        self.entries[url] = entry
+        self._changed(url)
+        return entry
+
+    def fetched(self, url):
+        """Appelé par fetch quand la page a été lue (200) : seules ces pages peuvent être illisibles."""
+        self._fetched.pop(url, None)
+        self._fetched[url] = time.time()
+        if len(self._fetched) > FETCHED_ENTRIES:
+            # Pages de liste, jamais relevées par track_failures : les plus anciennes partent
+            del self._fetched[next(iter(self._fetched))]
+
+    def fetched_since(self, url, since):
+        """Vrai si fetch a lu la page de `url` depuis `since` (l'indication est consommée)."""
+        fetched_at = self._fetched.pop(url, None)
+        return fetched_at is not None and fetched_at >= since
+
+    def gone_since(self, url, since):
+        """Vrai si fetch a enregistré un 404/410 pour `url` depuis `since`."""
+        entry = self.entries.get(url)
+        return entry is not None and entry['reason'] == GONE and (entry['failed'] or 0) >= since
+
+    def blocked(self, url, now=None):
+        """Vrai si l'URL ne doit pas être remise en file pour l'instant."""
+        entry = self.entries.get(url)
+        if entry is None or entry['until'] <= (time.time() if now is None else now):
+            return False
+        current_budget().skipped += 1
+        return True
+
+    def clear(self, url):
+        if self.entries.pop(url, None) is not None:
+            self._changed(url)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+# Partagé par tous les scripts d'un même processus (le démon les charge tous)
+dead_urls = NegativeCache(os.path.join(os.getcwd(), CACHE_FILE))
+atexit.register(dead_urls.save)
+
+
+def _title(result):
+    if isinstance(result, dict):
+        return result.get('titre', result.get('title'))
+    if isinstance(result, tuple) and result:
+        return result[0]
+    return None
+
+
+def track_failures(func):
+    """
+    Décorateur de fetch_article_content(session, url) : un article dont le titre n'a
+    pas été trouvé est enregistré comme PARSE_FAILURE seulement si fetch a bien lu la
+    page (dead_urls.fetched) ; un 404 ou une erreur serveur est enregistré par fetch,
+    les autres réponses (403, 429 après les tentatives, ...) ne le sont pas. Un
+    article lu correctement efface l'entrée de l'URL.
+    """
+    @functools.wraps(func)
+    async def wrapper(session, url, *args, **kwargs):
+        started = time.time()
+        result = await func(session, url, *args, **kwargs)
+        title = _title(result)
+        fetched = dead_urls.fetched_since(url, started)
+        if title in FALLBACK_TITLES:
+            if fetched:
+                dead_urls.record(url, PARSE_FAILURE)
+        elif title:
+            dead_urls.clear(url)
+        return result
+    return wrapper
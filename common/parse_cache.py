@@ -0,0 +1,235 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Cache des résultats d'extraction : une page déjà extraite (même HTML, même URL) n'est
+# pas reparsée. La clé est le hash du HTML et de l'URL ; chaque extracteur (un par
+# script) a un nom et une version, et incrémenter la version n'invalide que les
+# entrées de ce script. Base SQLite bornée (les entrées les moins récemment utilisées
+# sont supprimées) avec un LRU en mémoire devant ; la base n'est lue et écrite que dans
+# un thread dédié, hors de la boucle d'événements des scripts.
+
+MAX_ENTRIES = 20000  # entrées sur disque, quelques Ko chacune
+MEMORY_ENTRIES = 1000
+TRIM_EVERY = 200  # écritures entre deux vérifications de la taille de la base
+TOUCH_INTERVAL = 3600  # date d'utilisation mise à jour au plus une fois par heure et par entrée
+DB_TIMEOUT = 5.0
+
+CACHE_FILE = 'parse_cache.sqlite'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS parse_cache (
+    extractor TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    record TEXT NOT NULL,
+    used REAL NOT NULL,
+    PRIMARY KEY (extractor, digest)
+);
+CREATE INDEX IF NOT EXISTS parse_cache_used ON parse_cache (used);
+"""
+
+
+def page_digest(html_content, url):
+    """Hash d'une page telle que l'extracteur la reçoit (HTML décodé et URL)."""
+    data = url.encode('utf-8') + b'\0' + html_content.encode('utf-8', 'surrogatepass')
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class ParseCache:
+    """
+    Résultats d'extraction par (extracteur, hash de la page). cached(nom, version, parse)
+    renvoie une coroutine parse_cached(html_content, url) qui appelle parse(html_content,
+    url) avec le cache devant. Les accès à la base se font dans le thread du cache : une
+    lecture est attendue sans bloquer la boucle d'événements, les écritures sont
+    envoyées sans être attendues.
+    """
+
+    def __init__(self, path, max_entries=MAX_ENTRIES, memory_entries=MEMORY_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.memory = OrderedDict()  # (extracteur, version, hash) -> enregistrement JSON
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._db = None
+        self._writes = 0
+        self._purged = set()  # (extracteur, version) dont les autres versions ont été supprimées
+        # Un seul thread : la connexion lui appartient et les écritures se suivent dans l'ordre
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='parse-cache')
+
+    def _connect(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, timeout=DB_TIMEOUT, isolation_level=None)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            self._db.executescript(SCHEMA)
+        return self._db
+
+    def _call(self, func, *args):
+        """Exécute func(*args) dans le thread du cache et attend son résultat (hors boucle d'événements)."""
+        return self._executor.submit(func, *args).result()
+
+    async def _run(self, func, *args):
+        """Exécute func(*args) dans le thread du cache sans bloquer la boucle d'événements."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def _remember(self, key, text):
+        self.memory[key] = text
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def _from_memory(self, key):
+        text = self.memory.get(key)
+        if text is not None:
+            self.memory.move_to_end(key)
+            self.memory_hits += 1
+        return text
+
+    def _found(self, key, text):
+        if text is None:
+            self.misses += 1
+            return None
+        self.disk_hits += 1
+        self._remember(key, text)
+        return json.loads(text)
+
+    def _read(self, extractor, version, digest):
+        """Enregistrement JSON sur disque, ou None (thread du cache)."""
+        try:
+            db = self._connect()
+            row = db.execute('SELECT record, used FROM parse_cache WHERE extractor = ? AND digest = ? AND version = ?',
+                             (extractor, digest, version)).fetchone()
+            if row is None:
+                return None
+            text, used = row
+            now = time.time()
+            if now - used >= TOUCH_INTERVAL:
+                db.execute('UPDATE parse_cache SET used = ? WHERE extractor = ? AND digest = ?', (now, extractor, digest))
+        except sqlite3.Error as e:
+            logger.warning(f"Parse cache {self.path} unavailable: {e}")
+            return None
+        return text
+
+    def _write(self, extractor, version, digest, text):
+        """Écrit un enregistrement et borne la base de temps en temps (thread du cache)."""
+        try:
+            self._connect().execute('INSERT OR REPLACE INTO parse_cache VALUES (?, ?, ?, ?, ?)',
+                                    (extractor, digest, version, text, time.time()))
+            self._writes += 1
+            if self._writes % TRIM_EVERY == 0:
+                self._trim()
+        except sqlite3.Error as e:
+            logger.warning(f"Parse cache {self.path} unavailable: {e}")
+
+    def _trim(self):
+        deleted = self._connect().execute(
+            'DELETE FROM parse_cache WHERE rowid IN '
+            '(SELECT rowid FROM parse_cache ORDER BY used DESC LIMIT -1 OFFSET ?)', (self.max_entries,)).rowcount
+        if deleted:
+            logger.info(f"Parse cache: removed {deleted} least recently used entries")
+        return deleted
+
+    def _delete(self, extractor, keep_version):
+        return self._connect().execute('DELETE FROM parse_cache WHERE extractor = ? AND version IS NOT ?',
+                                       (extractor, keep_version)).rowcount
+
+    def _purge(self, extractor, version):
+        """Supprime les entrées des autres versions de l'extracteur (thread du cache)."""
+        try:
+            deleted = self._delete(extractor, version)
+            if deleted:
+                logger.info(f"Parse cache: dropped {deleted} entries of older {extractor} extractors")
+        except sqlite3.Error as e:
+            logger.warning(f"Parse cache {self.path} unavailable: {e}")
+
+    def _forget(self, extractor, keep_version):
+        self.memory = OrderedDict((key, text) for key, text in self.memory.items()
+                                  if key[0] != extractor or key[1] == keep_version)
+
+    def get(self, extractor, version, digest):
+        key = (extractor, version, digest)
+        text = self._from_memory(key)
+        if text is not None:
+            return json.loads(text)
+        return self._found(key, self._call(self._read, extractor, version, digest))
+
+    def put(self, extractor, version, digest, record):
+        text = json.dumps(record, ensure_ascii=False)
+        self._remember((extractor, version, digest), text)
+        self._executor.submit(self._write, extractor, version, digest, text)
+
+    def flush(self):
+        """Attend la fin des écritures envoyées au thread du cache."""
+        self._call(lambda: None)
+
+    def trim(self):
+        """Garde les max_entries entrées les plus récemment utilisées."""
+        return self._call(self._trim)
+
+    def invalidate(self, extractor, keep_version=None):
+        """Supprime les entrées de `extractor` (sauf celles de `keep_version`) ; renvoie leur nombre."""
+        self._forget(extractor, keep_version)
+        return self._call(self._delete, extractor, keep_version)
+
+    def cached(self, extractor, version, parse):
+        """Coroutine parse(html_content, url) dont les résultats sont gardés pour (extractor, version)."""
+        async def parse_cached(html_content, url):
+            if (extractor, version) not in self._purged:
+                self._purged.add((extractor, version))
+                self._forget(extractor, version)
+                self._executor.submit(self._purge, extractor, version)
+            digest = page_digest(html_content, url)
+            key = (extractor, version, digest)
+            text = self._from_memory(key)
+            if text is not None:
+                return json.loads(text)
+            record = self._found(key, await self._run(self._read, extractor, version, digest))
+            if record is None:
+                record = parse(html_content, url)
+                self.put(extractor, version, digest, record)
+            return record
+        parse_cached.__wrapped__ = parse
+        return parse_cached
+
+    def entries(self):
+        """{(extracteur, version): nombre d'entrées} sur disque."""
+        rows = self._call(lambda: self._connect().execute(
+            'SELECT extractor, version, COUNT(*) FROM parse_cache GROUP BY extractor, version ORDER BY extractor').fetchall())
+        return {(extractor, version): count for extractor, version, count in rows}
+
+    def summary(self):
+        hits = self.memory_hits + self.disk_hits
+        return f"{hits} hits ({self.memory_hits} memory, {self.disk_hits} disk), {self.misses} misses"
+
+
+# Partagé par tous les scripts d'un même processus (le démon les charge tous)
+parse_cache = ParseCache(os.path.join(os.getcwd(), CACHE_FILE))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show or clear the cached extraction results")
+    parser.add_argument('--file', default=CACHE_FILE, help="Cache file (default: %(default)s)")
+    parser.add_argument('--clear', metavar='EXTRACTOR', help="Remove the entries of this extractor")
+    args = parser.parse_args(argv)
+    cache = ParseCache(args.file)
+    if args.clear:
+        print(f"Removed {cache.invalidate(args.clear)} entries of {args.clear}")
+    for (extractor, version), count in cache.entries().items():
+        print(f"{count:>8}  {extractor} (version {version})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,267 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# Limiteur de débit par hôte (seau à jetons) partagé par tous les processus de la
+# machine : l'état des seaux est dans une base SQLite, chaque prise de jeton est une
+# transaction. Le débit de départ vient du Crawl-delay de robots.txt ; il est divisé
+# par deux à chaque 429/503 et remonte doucement tant que l'hôte répond.
+# Les transactions passent par un thread dédié (l'attente d'un verrou SQLite ne bloque
+# pas la boucle asyncio) et les réponses réussies, comptées en mémoire, ne sont
+# écrites qu'avec la prise de jeton suivante pour le même hôte. Si la base est
+# inutilisable (verrouillée trop longtemps, disque plein...), les requêtes du processus
+# sont espacées localement au débit par défaut.
+
+DEFAULT_RATE = 4.0  # requêtes par seconde sans Crawl-delay
+DEFAULT_BURST = 5.0  # jetons d'avance (l'ancien Semaphore(5) des scripts)
+MIN_RATE = 0.1
+RATE_STEP = 0.05  # hausse du débit par réponse réussie
+THROTTLE_FACTOR = 0.5  # baisse du débit sur 429/503
+ROBOTS_TTL = 24 * 3600
+ROBOTS_RETRY = 3600  # robots.txt illisible : nouvel essai après ce délai
+ROBOTS_TIMEOUT = 10
+MAX_SLEEP = 5.0  # attente maximale avant de réessayer de prendre un jeton
+DB_TIMEOUT = 5.0
+
+# Hors du répertoire courant pour être partagé quel que soit l'endroit d'où un script est lancé
+RATE_FILE = os.path.join(tempfile.gettempdir(), 'crawl_rate.sqlite')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    host TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL,
+    rate REAL NOT NULL,
+    max_rate REAL NOT NULL,
+    burst REAL NOT NULL,
+    robots_checked REAL
+)
+"""
+
+
+def robots_limits(text, user_agent='*'):
+    """
+    (débit max, seau) d'après le Crawl-delay du groupe `user_agent` d'un robots.txt,
+    sinon les valeurs par défaut. urllib.robotparser n'accepte que des délais entiers.
+    """
+    delay = None
+    agents, reading_agents = set(), False
+    for line in text.splitlines():
+        line = line.split('#', 1)[0].strip()
+        if ':' not in line:
+            continue
+        field, value = (part.strip() for part in line.split(':', 1))
+        field = field.lower()
+        if field == 'user-agent':
+            if not reading_agents:
+                agents = set()
+            agents.add(value.lower())
+            reading_agents = True
+            continue
+        reading_agents = False
+        if field == 'crawl-delay' and user_agent.lower() in agents:
+            try:
+                delay = float(value)
+            except ValueError:
+                continue
+    if delay and delay > 0:
+        return min(DEFAULT_RATE, 1 / delay), 1.0
+    return DEFAULT_RATE, DEFAULT_BURST
+
+
+class RateLimiter:
+    """
+    Seaux à jetons par hôte dans `path`. acquire(url) attend un jeton de l'hôte ;
+    throttled(url) et succeeded(url) ajustent son débit (AIMD) entre MIN_RATE et le
+    maximum autorisé par robots.txt.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._db = None
+        self._robots = {}  # hôte -> tâche de lecture de robots.txt en cours
+        self._successes = Counter()  # hôte -> réponses réussies pas encore écrites
+        self._robots_next = {}  # hôte -> date de la prochaine vérification de robots.txt
+        self._local_next = {}  # hôte -> prochaine requête permise sans la base
+        # Un seul thread : la connexion lui appartient et les transactions du processus se suivent
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='rate-limit')
+
+    def _connect(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, timeout=DB_TIMEOUT, isolation_level=None)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute(SCHEMA)
+        return self._db
+
+    async def _run(self, func):
+        """Exécute la transaction `func(db)` dans le thread du limiteur."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._transaction, func)
+
+    def _transaction(self, func):
+        db = self._connect()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            result = func(db)
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+        return result
+
+    def _bucket(self, db, host, now):
+        row = db.execute('SELECT tokens, updated, rate, max_rate, burst, robots_checked FROM buckets WHERE host = ?',
+                         (host,)).fetchone()
+        if row is None:
+            db.execute('INSERT INTO buckets VALUES (?, ?, ?, ?, ?, ?, NULL)',
+                       (host, DEFAULT_BURST, now, DEFAULT_RATE, DEFAULT_RATE, DEFAULT_BURST))
+            return DEFAULT_BURST, now, DEFAULT_RATE, DEFAULT_RATE, DEFAULT_BURST, None
+        return row
+
+    async def _take(self, host):
+        """Prend un jeton ; renvoie 0 ou le délai avant le prochain jeton."""
+        successes = self._successes.pop(host, 0)
+
+        def take(db):
+            now = time.time()
+            tokens, updated, rate, max_rate, burst, _ = self._bucket(db, host, now)
+            tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+            # Hausse due aux réponses réussies depuis la prise précédente
+            rate = min(max_rate, rate + successes * RATE_STEP) if successes else rate
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate
+            db.execute('UPDATE buckets SET tokens = ?, updated = ?, rate = ? WHERE host = ?', (tokens, now, rate, host))
+            return wait
+        try:
+            return await self._run(take)
+        except BaseException:
+            # Transaction annulée : les réponses réussies seront écrites avec le jeton suivant
+            self._successes[host] += successes
+            raise
+
+    async def _robots_next_check(self, host):
+        """Date de la prochaine lecture de robots.txt enregistrée pour l'hôte (None : jamais lu)."""
+        return await self._run(lambda db: self._bucket(db, host, time.time())[5])
+
+    async def _set_limits(self, host, max_rate, burst, next_check):
+        def update(db):
+            now = time.time()
+            _, _, rate, _, _, _ = self._bucket(db, host, now)
+            db.execute('UPDATE buckets SET rate = ?, max_rate = ?, burst = ?, tokens = MIN(tokens, ?), robots_checked = ? '
+                       'WHERE host = ?', (min(rate, max_rate), max_rate, burst, burst, next_check, host))
+        # En mémoire d'abord : si la base est inutilisable, robots.txt n'est pas relu à chaque requête
+        self._robots_next[host] = next_check
+        await self._run(update)
+
+    async def _read_robots(self, session, scheme, host):
+        url = f"{scheme}://{host}/robots.txt"
+        try:
+            async with session.get(url, timeout=aiohttp.ClientTimeout(total=ROBOTS_TIMEOUT)) as response:
+                text = await response.text() if response.status == 200 else ''
+        except (aiohttp.ClientError, asyncio.TimeoutError, UnicodeDecodeError) as e:
+            logger.warning(f"Could not read {url}: {e!r}")
+            await self._set_limits(host, DEFAULT_RATE, DEFAULT_BURST, time.time() + ROBOTS_RETRY)
+            return
+        max_rate, burst = robots_limits(text)
+        await self._set_limits(host, max_rate, burst, time.time() + ROBOTS_TTL)
+        if max_rate < DEFAULT_RATE:
+            logger.info(f"robots.txt of {host}: at most {max_rate:.2f} requests/s")
+
+    async def _check_robots(self, session, url):
+        parts = urlparse(url)
+        host = parts.netloc
+        # Date de la prochaine vérification gardée en mémoire : pas de transaction par requête
+        if time.time() < self._robots_next.get(host, 0):
+            return
+        if host not in self._robots:
+            next_check = await self._robots_next_check(host)
+            if next_check is not None and next_check >= time.time():
+                self._robots_next[host] = next_check
+                return
+            # Une seule lecture de robots.txt à la fois par hôte dans le processus
+            self._robots[host] = asyncio.ensure_future(self._read_robots(session, parts.scheme or 'https', host))
+        task = self._robots[host]
+        try:
+            await asyncio.shield(task)
+        finally:
+            if task.done():
+                self._robots.pop(host, None)
+
+    async def acquire(self, url, session=None):
+        """Attend un jeton de l'hôte de `url` (robots.txt est lu avec `session` au besoin)."""
+        host = urlparse(url).netloc
+        try:
+            if session is not None:
+                await self._check_robots(session, url)
+            while True:
+                wait = await self._take(host)
+                if not wait:
+                    self._local_next.pop(host, None)
+                    return
+                await asyncio.sleep(min(wait, MAX_SLEEP))
+        except sqlite3.Error as e:
+            if host not in self._local_next:
+                logger.warning(f"Rate limit database {self.path} unavailable ({e!r}), "
+                               f"pacing {host} at {DEFAULT_RATE:.2f} requests/s in this process")
+            await self._local_wait(host)
+
+    async def _local_wait(self, host):
+        """Sans la base : une requête tous les 1/DEFAULT_RATE secondes par hôte, dans ce processus."""
+        now = time.monotonic()
+        start = max(now, self._local_next.get(host, now))
+        self._local_next[host] = start + 1 / DEFAULT_RATE
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    async def throttled(self, url):
+        host = urlparse(url).netloc
+        # Les réponses réussies d'avant le 429/503 ne comptent plus
+        self._successes.pop(host, None)
+
+        def slow_down(db):
+            _, _, rate, _, _, _ = self._bucket(db, host, time.time())
+            rate = max(MIN_RATE, rate * THROTTLE_FACTOR)
+            db.execute('UPDATE buckets SET rate = ?, tokens = MIN(tokens, 0) WHERE host = ?', (rate, host))
+            return rate
+        try:
+            rate = await self._run(slow_down)
+        except sqlite3.Error as e:
+            logger.warning(f"Throttled by {host}, but the rate could not be lowered in {self.path}: {e!r}")
+            return
+        logger.warning(f"Throttled by {host}: rate lowered to {rate:.2f} requests/s")
+
+    def succeeded(self, url):
+        """Compte une réponse réussie, écrite avec le prochain jeton pris pour l'hôte."""
+        self._successes[urlparse(url).netloc] += 1
+
+    def rates(self):
+        """{hôte: (débit courant, débit max)} de tous les processus."""
+        # Connexion à part : celle du limiteur appartient à son thread
+        try:
+            db = sqlite3.connect(self.path, timeout=DB_TIMEOUT)
+            try:
+                db.execute(SCHEMA)
+                rows = db.execute('SELECT host, rate, max_rate FROM buckets').fetchall()
+            finally:
+                db.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Could not read the rates in {self.path}: {e}")
+            return {}
+        return {host: (rate, max_rate) for host, rate, max_rate in rows}
+
+
+# Partagé par tous les scripts d'un processus, et par les processus via RATE_FILE
+limiter = RateLimiter(RATE_FILE)
@@ -0,0 +1,130 @@
+import atexit
+import glob
+import logging
+import os
+import time
+from datetime import date, datetime
+
+from common.archive import ArchiveError, ArchiveWriter
+from common.parse_cache import page_digest
+
+logger = logging.getLogger(__name__)
+
+# Pages brutes des articles : le HTML reçu par l'extracteur d'un script est gardé avec
+# l'article qu'il en a tiré, pour pouvoir réextraire tout ce qui a été téléchargé
+# quand un extracteur change (python -m common.reextract), sans refaire de requêtes.
+# Archives .bna (common.archive) d'un fichier par processus et par jour ; les pages
+# sont écrites par blocs de FLUSH_PAGES. Un arrêt brutal perd les pages en attente ;
+# s'il survient pendant une écriture, l'archive reste sans index et common.archive le
+# reconstruit à partir des blocs complets.
+#
+# Par défaut les scripts gardent leur coupure après les conteneurs (common.streaming) :
+# la page gardée est celle qui a été lue, et la coupure utilisée est enregistrée avec
+# elle. Avec FULL_PAGES, les pages sont lues et gardées entières, pour qu'une
+# réextraction voie aussi ce qui suit les conteneurs (auteur cherché après le corps de
+# l'article...), au prix de la bande passante économisée par la coupure.
+#
+# Les archives les plus anciennes sont supprimées après chaque écriture : au-delà de
+# MAX_AGE_DAYS jours, puis tant que le répertoire dépasse MAX_BYTES.
+
+RAW_DIR = 'raw_pages'
+FLUSH_PAGES = 50
+FULL_PAGES = False
+MAX_AGE_DAYS = 30
+MAX_BYTES = 2 * 1024 ** 3
+
+
+class RawPages:
+    """
+    add(extracteur, version, url, html_content, article, stop_after) garde une page
+    et son extraction ; une page identique déjà gardée pour cet extracteur par le
+    processus est ignorée. cutoff(conteneurs) donne le stop_after à passer à fetch.
+    """
+
+    def __init__(self, directory, flush_pages=FLUSH_PAGES, full_pages=FULL_PAGES,
+                 max_age_days=MAX_AGE_DAYS, max_bytes=MAX_BYTES):
+        self.directory = directory
+        self.flush_pages = flush_pages
+        self.full_pages = full_pages
+        self.max_age_days = max_age_days
+        self.max_bytes = max_bytes
+        self._pending = []
+        self._seen = set()  # (extracteur, hash) des pages déjà gardées
+
+    def cutoff(self, containers):
+        """Conteneurs après lesquels la page peut ne plus être lue : aucun si elle est gardée entière."""
+        return None if self.full_pages else containers
+
+    def add(self, extractor, version, url, html_content, article, stop_after=None):
+        digest = page_digest(html_content, url)
+        if (extractor, digest) in self._seen:
+            return
+        self._seen.add((extractor, digest))
+        self._pending.append({
+            'url': url,
+            'extractor': extractor,
+            'version': version,
+            'fetched_at': datetime.now().isoformat(timespec='seconds'),
+            'digest': digest,
+            'html': html_content,
+            # Page lue jusqu'à la fin de ces conteneurs seulement (None : page entière)
+            'stop_after': [list(container) for container in stop_after] if stop_after else None,
+            'article': dict(article),
+        })
+        if len(self._pending) >= self.flush_pages:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        path = os.path.join(self.directory, f"{date.today().isoformat()}-{os.getpid()}.bna")
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with ArchiveWriter(path, block_records=len(self._pending)) as archive:
+                archive.extend(self._pending)
+            self._pending = []
+        except (IOError, ArchiveError) as e:
+            logger.error(f"Error saving raw pages to {path}: {e}")
+            return
+        self.prune(keep=path)
+
+    def prune(self, keep=None):
+        """Supprime les archives trop anciennes, puis les plus anciennes tant que le répertoire est trop gros."""
+        archives = []
+        for path in glob.glob(os.path.join(self.directory, '*.bna')):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            archives.append((stat.st_mtime, stat.st_size, path))
+        archives.sort()
+        total = sum(size for _, size, _ in archives)
+        oldest = time.time() - self.max_age_days * 86400
+        for mtime, size, path in archives:
+            if path == keep:
+                continue
+            if mtime >= oldest and total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f"Could not remove old raw pages {path}: {e}")
+                continue
+            total -= size
+            logger.info(f"Removed old raw pages {path}")
+
+
+def archive_paths(paths):
+    """Archives .bna des répertoires ou fichiers donnés, dans l'ordre chronologique."""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            found.extend(sorted(glob.glob(os.path.join(path, '*.bna'))))
+        else:
+            found.append(path)
+    return found
+
+
+# Partagé par tous les scripts d'un même processus (le démon les charge tous)
+raw_pages = RawPages(os.path.join(os.getcwd(), RAW_DIR))
+atexit.register(raw_pages.flush)
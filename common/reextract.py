@@ -0,0 +1,209 @@
+import argparse
+import glob
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from collections import Counter, defaultdict
+
+from common.archive import ArchiveError, ArchiveReader, ArchiveWriter
+from common.daemon import ROOT_DIR, load_script
+from common.raw_pages import RAW_DIR, archive_paths
+
+logger = logging.getLogger(__name__)
+
+# Réextraction des pages brutes (common.raw_pages) avec les extracteurs actuels des
+# scripts, sans requête réseau. Chaque bloc d'une archive est une tâche d'un pool de
+# processus ; un worker importe une fois chaque script rencontré et appelle son
+# extraction sans le cache (parse_article.__wrapped__). Le processus principal écrit
+# les nouveaux enregistrements au fil de l'eau dans l'archive de sortie et compare
+# chaque article à celui extrait au moment du téléchargement.
+
+OUTPUT_FILE = 'reextracted.bna'
+EXAMPLES = 5  # URLs montrées par extracteur et par champ modifié
+
+# État d'un worker : archives ouvertes, scripts importés, clés déjà dans la sortie
+_readers = {}
+_modules = {}
+_done = frozenset()
+_only = None
+
+
+def record_key(record):
+    """Clé d'un enregistrement réextrait : une page par version d'extracteur."""
+    return f"{record['extractor']}/{record['version']}/{record['digest']}"
+
+
+def _init_worker(done, only):
+    global _done, _only
+    _done = done
+    _only = only
+    # Les scripts affichent chaque URL traitée : le bilan suffit ici
+    sys.stdout = open(os.devnull, 'w')
+
+
+def _module(extractor):
+    """Script dont le nom de fichier est `extractor`, None s'il n'existe plus."""
+    if extractor not in _modules:
+        paths = glob.glob(os.path.join(ROOT_DIR, '*', f"{extractor}.py"))
+        _modules[extractor] = load_script(paths[0], extractor) if paths else None
+    return _modules[extractor]
+
+
+def _changed_fields(old, new):
+    return sorted(field for field in set(old) | set(new) if old.get(field) != new.get(field))
+
+
+def reextract_block(task):
+    """Réextrait les pages du bloc (archive, position) ; renvoie un résultat par page."""
+    path, offset = task
+    reader = _readers.get(path)
+    if reader is None:
+        reader = _readers[path] = ArchiveReader(path)
+    results = []
+    for page in reader.block(offset):
+        extractor = page['extractor']
+        if _only and extractor not in _only:
+            continue
+        module = _module(extractor)
+        if module is None:
+            results.append({'extractor': extractor, 'url': page['url'], 'status': 'unknown'})
+            continue
+        record = {
+            'url': page['url'],
+            'extractor': extractor,
+            'version': module.EXTRACTOR_VERSION,
+            'fetched_at': page['fetched_at'],
+            'digest': page['digest'],
+        }
+        if record_key(record) in _done:
+            results.append({'extractor': extractor, 'url': page['url'], 'status': 'done'})
+            continue
+        try:
+            article = module.parse_article.__wrapped__(page['html'], page['url'])
+        except Exception as e:
+            results.append({'extractor': extractor, 'url': page['url'], 'status': 'error', 'error': repr(e)})
+            continue
+        # Aller-retour JSON : même représentation que l'article stocké (listes, clés)
+        record['article'] = json.loads(json.dumps(article, ensure_ascii=False))
+        old = page['article']
+        fields = _changed_fields(old, record['article'])
+        results.append({
+            'extractor': extractor,
+            'url': page['url'],
+            'status': 'changed' if fields else 'unchanged',
+            'previous_version': page['version'],
+            # Page lue seulement jusqu'à la fin des conteneurs du script : la suite manque
+            'cut': bool(page.get('stop_after')),
+            'record': record,
+            'changes': {field: [old.get(field), record['article'].get(field)] for field in fields},
+        })
+    return results
+
+
+class Report:
+    """Bilan par extracteur : pages, articles inchangés / modifiés, erreurs, champs modifiés."""
+
+    def __init__(self):
+        self.counts = defaultdict(Counter)
+        self.fields = defaultdict(Counter)
+        self.examples = defaultdict(list)
+
+    def add(self, result):
+        extractor = result['extractor']
+        self.counts[extractor]['pages'] += 1
+        self.counts[extractor][result['status']] += 1
+        if result.get('cut'):
+            self.counts[extractor]['cut'] += 1
+        for field in result.get('changes', ()):
+            self.fields[extractor][field] += 1
+            if len(self.examples[(extractor, field)]) < EXAMPLES:
+                self.examples[(extractor, field)].append(result['url'])
+        if result['status'] == 'error' and len(self.examples[(extractor, None)]) < EXAMPLES:
+            self.examples[(extractor, None)].append(f"{result['url']}: {result['error']}")
+
+    def lines(self):
+        for extractor in sorted(self.counts):
+            counts = self.counts[extractor]
+            line = (f"{extractor}: {counts['pages']} pages, {counts['unchanged']} unchanged, "
+                    f"{counts['changed']} changed, {counts['error']} errors")
+            if counts['done']:
+                line += f", {counts['done']} already re-extracted"
+            if counts['cut']:
+                line += f", {counts['cut']} stored cut after the containers"
+            if counts['unknown']:
+                line += f", {counts['unknown']} without a script"
+            yield line
+            for field, count in self.fields[extractor].most_common():
+                yield f"    {field}: {count} changed, e.g. {', '.join(self.examples[(extractor, field)])}"
+            for error in self.examples[(extractor, None)]:
+                yield f"    error: {error}"
+
+
+def reextract(paths, output, workers=None, only=None, diff_file=None):
+    """Réextrait les pages des archives `paths` dans `output` ; renvoie le bilan (Report)."""
+    tasks = []
+    for path in archive_paths(paths):
+        try:
+            with ArchiveReader(path) as reader:
+                tasks.extend((path, block['offset']) for block in reader.index['blocks'])
+        except (IOError, ArchiveError) as e:
+            logger.error(f"Skipping raw page archive {path}: {e}")
+
+    report = Report()
+    seen = set()
+    started = time.perf_counter()
+    diff = open(diff_file, 'a', encoding='utf-8') if diff_file else None
+    try:
+        with ArchiveWriter(output, key=record_key) as writer:
+            done = frozenset(writer.index['keys'])
+            with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(done, only)) as pool:
+                for results in pool.imap_unordered(reextract_block, tasks):
+                    for result in results:
+                        record = result.get('record')
+                        if record is not None:
+                            # Même page gardée par deux processus : une seule fois
+                            key = record_key(record)
+                            if key in seen:
+                                continue
+                            seen.add(key)
+                            writer.add(record)
+                        report.add(result)
+                        if diff is not None and result['status'] in ('changed', 'error'):
+                            entry = {key: result[key] for key in ('extractor', 'url', 'status') if key in result}
+                            if record is not None:
+                                entry.update(previous_version=result['previous_version'], version=record['version'],
+                                             changes=result['changes'])
+                            else:
+                                entry['error'] = result['error']
+                            diff.write(json.dumps(entry, ensure_ascii=False) + '\n')
+    finally:
+        if diff is not None:
+            diff.close()
+    report.elapsed = time.perf_counter() - started
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the current extractors again over the stored raw pages")
+    parser.add_argument('paths', nargs='*', default=[RAW_DIR], help="raw page archives or directories (default: %(default)s)")
+    parser.add_argument('--output', default=OUTPUT_FILE, help="archive receiving the new records (default: %(default)s)")
+    parser.add_argument('--workers', type=int, help="worker processes (default: one per core)")
+    parser.add_argument('--only', action='append', metavar='EXTRACTOR', help="only re-extract the pages of this script")
+    parser.add_argument('--diff', metavar='FILE', help="append every changed article (old and new fields) to this JSON lines file")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    report = reextract(args.paths, args.output, args.workers, set(args.only) if args.only else None, args.diff)
+    for line in report.lines():
+        print(line)
+    pages = sum(counts['pages'] for counts in report.counts.values())
+    rate = pages / report.elapsed if report.elapsed else 0
+    print(f"Re-extracted {pages} pages in {report.elapsed:.1f} s ({rate:.0f} pages/s) into {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,161 @@
+import json
+import logging
+import math
+import os
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+HOURS = 24
+DEFAULT_INTERVAL = 3600
+DEFAULT_MIN_INTERVAL = 600
+DEFAULT_MAX_INTERVAL = 12 * 3600
+DEFAULT_TARGET_NEW_PER_POLL = 1.0
+DEFAULT_HALF_LIFE = 7 * 24 * 3600
+DEFAULT_JITTER = 0.1
+STEP = 300  # pas d'intégration du taux d'arrivée (secondes)
+
+# A priori : un article par intervalle par défaut, avec le poids d'une seule journée
+# d'observation, pour que les mesures prennent vite le dessus.
+PRIOR_EXPOSURE = 24 * 3600
+
+
+class CategoryStats:
+    """
+    Taux d'arrivée d'une catégorie, appris à partir des runs successifs.
+
+    Pour chaque heure de la journée on garde (avec décroissance exponentielle) le
+    nombre de nouveaux articles observés et la durée d'exposition correspondante.
+    """
+
+    def __init__(self, arrivals=None, exposure=None, updated=None, last_poll=None):
+        self.arrivals = arrivals or [0.0] * HOURS
+        self.exposure = exposure or [0.0] * HOURS
+        self.updated = updated
+        self.last_poll = last_poll
+
+    def to_dict(self):
+        return {
+            'arrivals': self.arrivals,
+            'exposure': self.exposure,
+            'updated': self.updated,
+            'last_poll': self.last_poll,
+        }
+
+    def decay(self, now, half_life):
+        if self.updated is not None and now > self.updated:
+            factor = 0.5 ** ((now - self.updated) / half_life)
+            self.arrivals = [value * factor for value in self.arrivals]
+            self.exposure = [value * factor for value in self.exposure]
+        self.updated = now
+
+    def observe(self, new_count, now, half_life):
+        """Répartit les arrivées depuis le dernier passage sur les heures couvertes."""
+        self.decay(now, half_life)
+        if self.last_poll is None or now <= self.last_poll:
+            self.last_poll = now
+            return
+        start = self.last_poll
+        span = now - start
+        position = start
+        while position < now:
+            hour_end = (math.floor(position / 3600) + 1) * 3600
+            chunk = min(hour_end, now) - position
+            hour = time.localtime(position).tm_hour
+            self.exposure[hour] += chunk
+            self.arrivals[hour] += new_count * chunk / span
+            position += chunk
+        self.last_poll = now
+
+    def rate(self, hour, default_interval):
+        """Nouveaux articles par seconde attendus à cette heure de la journée."""
+        total_arrivals = sum(self.arrivals)
+        total_exposure = sum(self.exposure)
+        prior_rate = 1.0 / default_interval
+        overall = (total_arrivals + prior_rate * PRIOR_EXPOSURE) / (total_exposure + PRIOR_EXPOSURE)
+        # Profil horaire lissé vers la moyenne globale (une heure d'a priori par tranche)
+        return (self.arrivals[hour] + overall * 3600) / (self.exposure[hour] + 3600)
+
+
+class RefreshPlanner:
+    """
+    Calcule l'intervalle avant le prochain passage de chaque catégorie à partir de
+    son historique de publication : les rubriques très actives sont relevées plus
+    souvent, les rubriques calmes beaucoup moins, avec un peu d'aléa pour que les
+    passages ne tombent pas tous en début d'heure.
+
+    L'intervalle est le temps nécessaire, selon le profil horaire, pour que
+    `target_new_per_poll` nouveaux articles soient attendus, borné par
+    [min_interval, max_interval].
+    """
+
+    def __init__(self, path=None, default_interval=DEFAULT_INTERVAL, min_interval=DEFAULT_MIN_INTERVAL,
+                 max_interval=DEFAULT_MAX_INTERVAL, target_new_per_poll=DEFAULT_TARGET_NEW_PER_POLL,
+                 half_life=DEFAULT_HALF_LIFE, jitter=DEFAULT_JITTER):
+        self.path = path
+        self.default_interval = default_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.target_new_per_poll = target_new_per_poll
+        self.half_life = half_life
+        self.jitter = jitter
+        self.stats = {}
+        self.load()
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.stats = {key: CategoryStats(**value) for key, value in data.items()}
+        except (IOError, ValueError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable refresh history {self.path}: {e}")
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({key: stats.to_dict() for key, stats in self.stats.items()}, f)
+        os.replace(tmp_path, self.path)
+
+    def record(self, key, new_count, now=None):
+        """Enregistre le résultat d'un passage : `new_count` nouveaux articles."""
+        now = time.time() if now is None else now
+        self.stats.setdefault(key, CategoryStats()).observe(new_count, now, self.half_life)
+
+    def restart(self, key, now=None):
+        """Repart de `now` sans compter d'arrivées (première observation d'un job « instantané »)."""
+        now = time.time() if now is None else now
+        stats = self.stats.setdefault(key, CategoryStats())
+        stats.decay(now, self.half_life)
+        stats.last_poll = now
+
+    def interval(self, key, now=None):
+        """Intervalle (sans aléa) avant le prochain passage de la catégorie `key`."""
+        now = time.time() if now is None else now
+        stats = self.stats.get(key)
+        if stats is None or not any(stats.exposure):
+            return float(self.default_interval)
+        expected = 0.0
+        elapsed = 0.0
+        while elapsed < self.max_interval:
+            rate = stats.rate(time.localtime(now + elapsed).tm_hour, self.default_interval)
+            step_expected = rate * STEP
+            if expected + step_expected >= self.target_new_per_poll:
+                elapsed += (self.target_new_per_poll - expected) / rate
+                break
+            expected += step_expected
+            elapsed += STEP
+        return float(min(max(elapsed, self.min_interval), self.max_interval))
+
+    def next_interval(self, keys, now=None):
+        """
+        Intervalle avec aléa pour un job couvrant plusieurs catégories : le job doit
+        repasser dès que l'une d'elles le demande.
+        """
+        base = min((self.interval(key, now) for key in keys), default=float(self.default_interval))
+        return base * random.uniform(1 - self.jitter, 1 + self.jitter)
@@ -0,0 +1,353 @@
+import asyncio
+import json
+import logging
+import random
+import time
+from collections import namedtuple
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+
+import aiohttp
+
+from common.bandwidth import Throttle, bandwidth
+from common.charsets import ACCEPT_ENCODING, encoding_for
+from common.latency import latency_for
+from common.rate_limit import limiter
+from common.run_guard import current_budget
+from common.streaming import ContainerCutoff
+
+logger = logging.getLogger(__name__)
+
+# Couche commune de nouvelles tentatives des requêtes HTTP :
+# - réessaie les erreurs réseau, les timeouts et les statuts transitoires (429, 5xx),
+#   en respectant l'en-tête Retry-After ;
+# - attente entre deux tentatives avec « decorrelated jitter » ;
+# - budget de nouvelles tentatives par run (proportionnel au nombre de requêtes) ;
+# - disjoncteur par hôte : après plusieurs échecs d'affilée, plus aucune requête vers
+#   l'hôte pendant un délai qui double à chaque réouverture ;
+# - timeouts par phase tirés des latences de l'hôte (common.latency) et requêtes
+#   doublées quand la réponse tarde au-delà du p95 ;
+# - chaque requête prend d'abord un jeton du limiteur de débit de l'hôte (common.rate_limit),
+#   et son corps est lu sous le plafond de bande passante (common.bandwidth), jusqu'à la
+#   fin des éléments utiles de la page quand `stop_after` est donné (common.streaming).
+
+RETRY_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+MAX_ATTEMPTS = 4
+BASE_DELAY = 1.0
+MAX_DELAY = 30.0
+MAX_RETRY_AFTER = 120  # au-delà, la réponse est rendue telle quelle plutôt que d'attendre
+
+# Budget de nouvelles tentatives d'un run : RETRY_BUDGET_MIN + RETRY_BUDGET_RATIO x requêtes
+RETRY_BUDGET_MIN = 20
+RETRY_BUDGET_RATIO = 0.1
+
+BREAKER_THRESHOLD = 5  # échecs d'affilée qui ouvrent le disjoncteur d'un hôte
+BREAKER_COOLDOWN = 30.0
+BREAKER_MAX_COOLDOWN = 600.0
+BREAKER_MAX_WAIT = 120.0  # disjoncteur ouvert plus longtemps : échec immédiat (CircuitOpenError)
+PROBE_POLL = 0.5
+
+HEDGE_REQUESTS = True
+HEDGE_BUDGET_RATIO = 0.05  # requêtes doublées : au plus 5 % des requêtes du run
+
+Response = namedtuple('Response', ['status', 'headers', 'body', 'url'])
+
+
+class CircuitOpenError(aiohttp.ClientError):
+    """Hôte en défaut : requête refusée sans être envoyée."""
+
+
+class CircuitBreaker:
+    """
+    Disjoncteur d'un hôte. Fermé : les requêtes passent. Ouvert : elles attendent la
+    fin du délai (ou échouent tout de suite s'il reste plus de BREAKER_MAX_WAIT
+    secondes ou plus que le budget du run). À la fin du délai une seule requête
+    d'essai passe ; son succès referme le disjoncteur, son échec le rouvre pour un
+    délai doublé.
+    """
+
+    def __init__(self, host, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN, max_cooldown=BREAKER_MAX_COOLDOWN):
+        self.host = host
+        self.threshold = threshold
+        self.base_cooldown = cooldown
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.failures = 0
+        self.open_until = None
+        self.probing = False
+        self.opened = 0
+
+    @property
+    def state(self):
+        if self.open_until is None:
+            return 'closed'
+        return 'half-open' if time.monotonic() >= self.open_until else 'open'
+
+    async def acquire(self):
+        """Attend que l'hôte accepte une requête ; renvoie True si c'est la requête d'essai."""
+        while True:
+            if self.open_until is None:
+                return False
+            wait = self.open_until - time.monotonic()
+            if wait > 0:
+                remaining = current_budget().remaining_seconds()
+                if wait > BREAKER_MAX_WAIT or (remaining is not None and wait > remaining):
+                    raise CircuitOpenError(f"Circuit open for {self.host} ({wait:.0f}s left)")
+                await asyncio.sleep(wait)
+            elif not self.probing:
+                self.probing = True
+                return True
+            else:
+                # Une requête d'essai est en cours : attendre son résultat
+                await asyncio.sleep(PROBE_POLL)
+
+    def success(self):
+        if self.open_until is not None:
+            logger.info(f"Circuit closed for {self.host}")
+        self.failures = 0
+        self.open_until = None
+        self.probing = False
+        self.cooldown = self.base_cooldown
+
+    def failure(self):
+        self.failures += 1
+        if self.probing or (self.open_until is None and self.failures >= self.threshold):
+            self.open(self.cooldown)
+            self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+
+    def open(self, seconds, reason=None):
+        until = time.monotonic() + seconds
+        if self.open_until is None or until > self.open_until:
+            self.open_until = until
+        self.probing = False
+        self.opened += 1
+        logger.warning(f"Circuit open for {self.host} for {seconds:.0f}s ({reason or f'{self.failures} failures in a row'})")
+
+    def release(self):
+        """Requête d'essai terminée sans verdict (annulée) : laisser passer la suivante."""
+        self.probing = False
+
+
+_breakers = {}
+
+
+def breaker_for(url):
+    """Disjoncteur de l'hôte de `url`, partagé par tous les scripts du processus."""
+    host = urlparse(url).netloc
+    if host not in _breakers:
+        _breakers[host] = CircuitBreaker(host)
+    return _breakers[host]
+
+
+def retry_after(headers, now=None):
+    """Délai demandé par l'en-tête Retry-After (secondes ou date HTTP), ou None."""
+    value = headers.get('Retry-After') if headers else None
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    now = datetime.now(timezone.utc) if now is None else now
+    return max(0.0, (date - now).total_seconds())
+
+
+def next_delay(previous, base=BASE_DELAY, cap=MAX_DELAY):
+    """Decorrelated jitter : aléatoire entre base et 3 x l'attente précédente, plafonné."""
+    return min(cap, random.uniform(base, max(base, previous * 3)))
+
+
+def retry_allowed(budget=None):
+    budget = budget or current_budget()
+    return budget.retries < RETRY_BUDGET_MIN + RETRY_BUDGET_RATIO * budget.requests
+
+
+async def _read(response, read, stop_after=None, throttle=None):
+    """Corps de la réponse selon `read`, et secondes passées à attendre la bande passante."""
+    if read not in ('text', 'bytes', 'json'):
+        raise ValueError(f"Unknown read mode '{read}'")
+    url = str(response.url)
+    cutoff = ContainerCutoff(stop_after, encoding_for(url, response.charset)) if stop_after else None
+    data, waited = await bandwidth.read(response, cutoff, throttle)
+    if read == 'bytes':
+        return data, waited
+    # Un seul décodage, avec l'encodage déclaré du site (pas de détection)
+    encoding = encoding_for(url, response.charset, data)
+    if read == 'json' and encoding == 'utf-8':
+        return json.loads(data), waited
+    text = data.decode(encoding, errors='replace')
+    if read == 'text':
+        return text, waited
+    return json.loads(text), waited
+
+
+async def _within(request, total, throttle):
+    """
+    Attend `request` au plus `total` secondes, sans compter les attentes du plafond de
+    bande passante (throttle.seconds) : un hôte rapide n'expire pas parce que le
+    processus se bride lui-même.
+    """
+    if total is None:
+        return await request
+    deadline = time.monotonic() + total
+    task = asyncio.ensure_future(request)
+    try:
+        while True:
+            remaining = deadline + throttle.seconds - time.monotonic()
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
+            done, _ = await asyncio.wait({task}, timeout=remaining)
+            if done:
+                return task.result()
+    finally:
+        if not task.done():
+            task.add_done_callback(_consume)
+            task.cancel()
+
+
+async def _attempt(session, url, read, latency, kwargs, stop_after=None):
+    """Une requête, avec les timeouts adaptés à l'hôte ; sa durée est enregistrée."""
+    options = dict(kwargs)
+    timeout = options.setdefault('timeout', latency.timeout())
+    # Délai total appliqué par _within, hors bridage ; aiohttp garde ceux de connexion et de lecture
+    options['timeout'] = aiohttp.ClientTimeout(total=None, connect=timeout.connect,
+                                               sock_connect=timeout.sock_connect, sock_read=timeout.sock_read)
+    options['headers'] = {'Accept-Encoding': ACCEPT_ENCODING, **(options.get('headers') or {})}
+    await limiter.acquire(url, session)
+    started = time.monotonic()
+    throttle = Throttle()
+
+    async def request():
+        body = None
+        async with session.get(url, **options) as response:
+            first_byte = time.monotonic() - started
+            if response.status == 200:
+                body, _ = await _read(response, read, stop_after, throttle)
+        return response, first_byte, body
+
+    try:
+        response, first_byte, body = await _within(request(), timeout.total, throttle)
+    except asyncio.TimeoutError:
+        latency.record_timeout(timeout)
+        raise
+    # L'attente due au plafond de bande passante n'est pas une latence de l'hôte
+    latency.record(first_byte, time.monotonic() - started - throttle.seconds)
+    return Response(response.status, response.headers, body, str(response.url))
+
+
+def _consume(task):
+    # Requête perdante annulée ou en échec : son exception ne sera jamais lue
+    if not task.cancelled():
+        task.exception()
+
+
+def hedge_allowed(budget):
+    return budget.hedges < HEDGE_BUDGET_RATIO * budget.requests
+
+
+async def _hedged(attempt, latency, budget, hedge):
+    """
+    Lance `attempt()` ; si la réponse n'est pas arrivée après le p95 de l'hôte, lance
+    une seconde requête identique et garde la première réponse obtenue, l'autre est
+    annulée.
+    """
+    tasks = {asyncio.ensure_future(attempt())}
+    try:
+        delay = latency.hedge_delay() if hedge else None
+        if delay is not None:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done and hedge_allowed(budget):
+                budget.spend()
+                budget.hedges += 1
+                logger.debug(f"Hedging request after {delay:.2f}s")
+                tasks.add(asyncio.ensure_future(attempt()))
+        error = None
+        while tasks:
+            done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            task.add_done_callback(_consume)
+            task.cancel()
+
+
+async def fetch_with_retries(session, url, read='text', max_attempts=MAX_ATTEMPTS, hedge=None, stop_after=None, **kwargs):
+    """
+    GET avec nouvelles tentatives. Renvoie Response(status, headers, body, url) ; le
+    corps (texte, octets ou JSON selon `read`) n'est lu que pour un statut 200. Un
+    statut transitoire encore en échec après les tentatives est renvoyé tel quel ;
+    la dernière erreur réseau est relevée. Les timeouts suivent les latences de
+    l'hôte et une requête lente est doublée (`hedge`, HEDGE_REQUESTS par défaut).
+    `stop_after` : liste de (balise, classes) après lesquels la page n'est plus lue.
+    Les autres arguments vont à session.get (ssl, headers, params...).
+    """
+    breaker = breaker_for(url)
+    latency = latency_for(url)
+    budget = current_budget()
+    hedge = HEDGE_REQUESTS if hedge is None else hedge
+    delay = BASE_DELAY
+    attempt = 0
+    # Un échec par requête pour le disjoncteur : les tentatives d'une seule URL ne
+    # l'ouvrent pas à elles seules (l'échec d'une requête d'essai compte toujours)
+    failure_counted = False
+    while True:
+        attempt += 1
+        probe = await breaker.acquire()
+        budget.spend()
+        wait = None
+        try:
+            # Pas de requête doublée vers un hôte en défaut
+            response = await _hedged(lambda: _attempt(session, url, read, latency, kwargs, stop_after),
+                                     latency, budget, hedge and not probe)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if isinstance(e, CircuitOpenError):
+                raise
+            if probe or not failure_counted:
+                breaker.failure()
+                failure_counted = True
+            result, error = None, e
+            logger.warning(f"Error fetching {url} (attempt {attempt}/{max_attempts}): {e!r}")
+        except BaseException:
+            if probe:
+                breaker.release()
+            raise
+        else:
+            if response.status not in RETRY_STATUSES:
+                breaker.success()
+                limiter.succeeded(url)
+                return response
+            if probe or not failure_counted:
+                breaker.failure()
+                failure_counted = True
+            if response.status in (429, 503):
+                await limiter.throttled(url)
+            wait = retry_after(response.headers)
+            if wait is not None and response.status in (429, 503):
+                # L'hôte demande une pause : elle vaut pour toutes ses requêtes
+                breaker.open(min(wait, BREAKER_MAX_COOLDOWN), f"Retry-After on HTTP {response.status}")
+            result, error = response, None
+            logger.warning(f"HTTP {response.status} for {url} (attempt {attempt}/{max_attempts})")
+
+        if attempt >= max_attempts or not retry_allowed(budget) or (wait is not None and wait > MAX_RETRY_AFTER):
+            if attempt < max_attempts:
+                logger.warning(f"Giving up on {url}: retry budget exhausted or Retry-After too long")
+            if error is not None:
+                raise error
+            return result
+        delay = next_delay(delay)
+        budget.retries += 1
+        await asyncio.sleep(max(delay, wait or 0))
+
+
+def breaker_states():
+    return {host: breaker.state for host, breaker in _breakers.items()}
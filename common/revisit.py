@@ -0,0 +1,245 @@
+import asyncio
+import atexit
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from datetime import datetime
+
+import aiohttp
+
+from common.cursor import article_date
+from common.negative_cache import FALLBACK_TITLES, GONE, dead_urls
+from common.raw_pages import raw_pages
+from common.retry import fetch_with_retries
+from common.run_guard import current_budget, file_lock
+
+logger = logging.getLogger(__name__)
+
+# Revérification des articles déjà enregistrés (corrections, mises à jour) : chaque
+# article suivi garde le hash de son contenu extrait et la date de sa prochaine
+# vérification, d'autant plus lointaine que l'article est ancien (toutes les heures
+# au début, tous les quelques jours ensuite, plus du tout après MAX_AGE). La page est
+# redemandée avec If-None-Match / If-Modified-Since ; l'enregistrement de l'article
+# n'est remplacé que si le hash a changé.
+
+MIN_INTERVAL = 3600
+AGE_RATIO = 1.0  # prochaine vérification après une durée égale à l'âge de l'article
+MAX_INTERVAL = 4 * 24 * 3600
+MAX_AGE = 14 * 24 * 3600  # plus aucune vérification au-delà
+MAX_PER_RUN = 20  # vérifications au plus par run d'un script, les plus en retard d'abord
+SAVE_INTERVAL = 10  # secondes minimum entre deux écritures du fichier (plus une à la sortie)
+
+# Champ ajouté aux enregistrements d'un article modifié
+UPDATED_FIELD = 'date_mise_a_jour'
+
+SCHEDULE_FILE = 'revisits.json'
+
+# Date de publication des articles : « 19/10/2026 | 10:00 », « News - 01.10.2026 »
+DATE_PATTERN = re.compile(r'\b(\d{1,2})[/.-](\d{1,2})[/.-](\d{4})\b')
+
+
+def content_hash(article):
+    """Hash du contenu extrait d'un article (indépendant de l'ordre des champs)."""
+    data = json.dumps(article, ensure_ascii=False, sort_keys=True).encode('utf-8')
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def next_interval(age):
+    return min(MAX_INTERVAL, max(MIN_INTERVAL, age * AGE_RATIO))
+
+
+def published_before(article, now):
+    """
+    Origine de l'âge d'un article : maintenant, ou la fin du jour de publication si
+    l'article date d'un jour précédent (articles trouvés en parcourant l'archive).
+    """
+    match = DATE_PATTERN.search(str(article_date(article) or ''))
+    if match is None:
+        return now
+    day, month, year = (int(part) for part in match.groups())
+    try:
+        published = datetime(year, month, day).timestamp()
+    except (ValueError, OverflowError):
+        return now
+    return min(now, published + 24 * 3600)
+
+
+class RevisitSchedule:
+    """
+    Articles suivis, par extracteur (un par script), enregistrés dans un fichier JSON :
+    {extracteur: {url: {'hash', 'version', 'origin', 'due', 'etag', 'last_modified', 'updates'}}}.
+    track() suit un nouvel article, revisit() revérifie ceux qui sont dus.
+    Plusieurs scripts partagent le fichier : save() le relit sous verrou et n'y
+    applique que les entrées modifiées par ce processus depuis l'écriture précédente.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.checks = 0
+        self.not_modified = 0
+        self.updated = 0
+        self._changes = {}  # (extracteur, url) -> entrée modifiée, ou None si supprimée
+        self._saved_at = 0.0
+        self.load()
+
+    def _read(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (IOError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable revisit schedule {self.path}: {e}")
+            return {}
+        now = time.time()
+        return {extractor: {url: entry for url, entry in urls.items() if entry['origin'] + MAX_AGE > now}
+                for extractor, urls in entries.items()}
+
+    def load(self):
+        self.entries = self._read()
+
+    def save(self):
+        if not self._changes:
+            return
+        tmp_path = self.path + '.tmp'
+        try:
+            with file_lock(self.path + '.lock'):
+                entries = self._read()
+                for (extractor, url), entry in self._changes.items():
+                    if entry is None:
+                        entries.get(extractor, {}).pop(url, None)
+                    else:
+                        entries.setdefault(extractor, {})[url] = entry
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(entries, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+            # Articles suivis ou revérifiés entre-temps par les autres scripts
+            self.entries = entries
+            self._changes = {}
+            self._saved_at = time.monotonic()
+        except IOError as e:
+            logger.error(f"Error saving revisit schedule {self.path}: {e}")
+
+    def _changed(self, extractor, url):
+        self._changes[(extractor, url)] = self.entries.get(extractor, {}).get(url)
+        if time.monotonic() - self._saved_at >= SAVE_INTERVAL:
+            self.save()
+
+    def track(self, extractor, version, url, article, now=None):
+        """Suit un article qui vient d'être extrait (sans effet s'il l'est déjà)."""
+        urls = self.entries.setdefault(extractor, {})
+        if url in urls or article.get('titre', article.get('title')) in FALLBACK_TITLES:
+            return
+        now = time.time() if now is None else now
+        origin = published_before(article, now)
+        if now - origin >= MAX_AGE:
+            return
+        urls[url] = {
+            'hash': content_hash(article),
+            'version': version,
+            'origin': origin,
+            'due': now + next_interval(now - origin),
+            'etag': None,
+            'last_modified': None,
+            'updates': 0,
+        }
+        self._changed(extractor, url)
+
+    def due(self, extractor, articles_file, now=None, limit=MAX_PER_RUN):
+        """URLs de `articles_file` à revérifier, les plus en retard d'abord."""
+        now = time.time() if now is None else now
+        urls = self.entries.get(extractor, {})
+        due = sorted((entry['due'], url) for url, entry in urls.items() if entry['due'] <= now and url in articles_file)
+        return [url for _, url in due[:limit]]
+
+    def _reschedule(self, extractor, url, now):
+        entry = self.entries[extractor][url]
+        age = now - entry['origin']
+        if age >= MAX_AGE:
+            del self.entries[extractor][url]
+        else:
+            entry['due'] = now + next_interval(age)
+        self._changed(extractor, url)
+
+    async def revisit(self, session, extractor, version, articles_file, parse_article, stop_after=None):
+        """
+        Revérifie les articles dus de `articles_file` (au plus MAX_PER_RUN) ; renvoie
+        les enregistrements des articles modifiés, à remplacer dans le fichier (ArticleFile.replace).
+        """
+        if current_budget().exhausted():
+            return []
+        urls = [url for url in self.due(extractor, articles_file) if not dead_urls.blocked(url)]
+        results = await asyncio.gather(*(self._revisit(session, extractor, version, url, articles_file,
+                                                       parse_article, stop_after) for url in urls))
+        updated = [record for record in results if record is not None]
+        if urls:
+            logger.info(f"Revisited {len(urls)} {extractor} articles, {len(updated)} updated")
+        return updated
+
+    async def _revisit(self, session, extractor, version, url, articles_file, parse_article, stop_after):
+        entry = self.entries[extractor][url]
+        headers = {}
+        if entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        stop_after = raw_pages.cutoff(stop_after)
+        try:
+            response = await fetch_with_retries(session, url, stop_after=stop_after, headers=headers)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            # Pas de nouvelle date : l'article sera revérifié au prochain run
+            logger.warning(f"Error revisiting {url}: {e!r}")
+            return None
+        now = time.time()
+        self.checks += 1
+        # Entrée relue : une écriture du fichier pendant la requête a pu recharger le suivi
+        entry = self.entries.get(extractor, {}).get(url)
+        if entry is None:
+            return None
+        if response.status == 304:
+            self.not_modified += 1
+            self._reschedule(extractor, url, now)
+            return None
+        if response.status in (404, 410):
+            dead_urls.record(url, GONE)
+            self.entries[extractor].pop(url, None)
+            self._changed(extractor, url)
+            logger.info(f"Revisit: {url} is gone, no longer tracked")
+            return None
+        if response.status != 200:
+            return None
+
+        entry['etag'] = response.headers.get('ETag')
+        entry['last_modified'] = response.headers.get('Last-Modified')
+        content = await parse_article(response.body, url)
+        raw_pages.add(extractor, version, url, response.body, content, stop_after)
+        digest = content_hash(content)
+        changed = digest != entry['hash'] and content.get('titre', content.get('title')) not in FALLBACK_TITLES
+        # Extracteur modifié depuis le dernier passage : un écart ne viendrait pas du site
+        stale = entry['version'] != version
+        entry['version'] = version
+        if changed:
+            entry['hash'] = digest
+            if not stale:
+                entry['updates'] += 1
+        self._reschedule(extractor, url, now)
+        if not changed or stale:
+            return None
+        self.updated += 1
+        logger.info(f"Revisit: {url} was updated")
+        record = articles_file.get(url) or {}
+        record.update(content)
+        record[UPDATED_FIELD] = datetime.fromtimestamp(now).isoformat(timespec='seconds')
+        return record
+
+    def summary(self):
+        return f"{self.checks} checks, {self.not_modified} not modified, {self.updated} updated"
+
+
+# Partagé par tous les scripts d'un même processus (le démon les charge tous)
+revisits = RevisitSchedule(os.path.join(os.getcwd(), SCHEDULE_FILE))
+atexit.register(revisits.save)
@@ -0,0 +1,170 @@
+import contextlib
+import contextvars
+import functools
+import logging
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+# Budget par défaut d'un run : il doit se terminer avant le run suivant (toutes les heures)
+DEFAULT_MAX_SECONDS = 55 * 60
+DEFAULT_MAX_REQUESTS = 5000
+
+
+class RunLock:
+    """
+    Verrou inter-processus (fichier verrouillé avec flock / msvcrt) : deux runs qui
+    écrivent le même fichier de sortie ne peuvent pas tourner en même temps, qu'ils
+    viennent du démon ou de scripts lancés à la main.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def acquire(self):
+        f = open(self.path, 'a+')
+        try:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            f.close()
+            return False
+        f.seek(0)
+        f.truncate()
+        f.write(f"{os.getpid()}\n")
+        f.flush()
+        self._file = f
+        return True
+
+    def release(self):
+        if self._file is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            else:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._file.close()
+            self._file = None
+
+
+@contextlib.contextmanager
+def file_lock(path):
+    """
+    Verrou inter-processus bloquant sur le fichier `path`, pour relire, fusionner et
+    réécrire un fichier d'état partagé par plusieurs scripts (dead_urls.json...).
+    """
+    with open(path, 'a+') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class RunBudget:
+    """Limite de durée et de nombre de requêtes d'un run."""
+
+    def __init__(self, max_seconds=None, max_requests=None, name=None):
+        self.name = name
+        self.max_seconds = max_seconds
+        self.max_requests = max_requests
+        self.started = time.monotonic()
+        self.requests = 0
+        self.coalesced = 0  # requêtes évitées par common.singleflight
+        self.skipped = 0  # URLs du cache négatif non remises en file
+        self.retries = 0  # nouvelles tentatives de common.retry (comptées aussi dans requests)
+        self.hedges = 0  # requêtes doublées par common.retry (comptées aussi dans requests)
+        self.bytes = 0  # octets lus par common.bandwidth
+
+    def spend(self, requests=1):
+        self.requests += requests
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def remaining_seconds(self):
+        if self.max_seconds is None:
+            return None
+        return max(0.0, self.max_seconds - self.elapsed())
+
+    def exhausted(self):
+        if self.max_seconds is not None and self.elapsed() >= self.max_seconds:
+            return True
+        return self.max_requests is not None and self.requests >= self.max_requests
+
+    def __str__(self):
+        text = f"{self.requests} requests in {self.elapsed():.0f}s"
+        if self.bytes:
+            text += f", {self.bytes / (1024 * 1024):.1f} MB downloaded"
+        if self.retries:
+            text += f", {self.retries} retries"
+        if self.hedges:
+            text += f", {self.hedges} hedged"
+        if self.coalesced:
+            text += f", {self.coalesced} duplicates coalesced"
+        if self.skipped:
+            text += f", {self.skipped} dead URLs skipped"
+        return text
+
+
+_current_budget = contextvars.ContextVar('run_budget', default=None)
+
+
+def current_budget():
+    """Budget du run en cours (illimité en dehors d'un run gardé)."""
+    budget = _current_budget.get()
+    if budget is None:
+        budget = RunBudget()
+        _current_budget.set(budget)
+    return budget
+
+
+def guarded_run(lock_path, max_seconds=DEFAULT_MAX_SECONDS, max_requests=DEFAULT_MAX_REQUESTS):
+    """
+    Décorateur de la coroutine principale d'un script :
+    - le run est ignoré si un autre run détient déjà le verrou `lock_path` ;
+    - un RunBudget neuf est accessible via current_budget() pendant le run (les tâches
+      créées par asyncio.gather en héritent).
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            lock = RunLock(lock_path)
+            if not lock.acquire():
+                logger.warning(f"Another run holds {lock_path}, skipping this run")
+                print(f"Another run is already in progress ({lock_path}), skipping this run")
+                return None
+            # Nom du run : celui du fichier de sortie (Actualites.json.lock -> Actualites)
+            name = os.path.basename(lock_path).split('.')[0]
+            token = _current_budget.set(RunBudget(max_seconds, max_requests, name))
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                budget = _current_budget.get()
+                logger.info(f"Run finished: {budget}")
+                _current_budget.reset(token)
+                lock.release()
+        return wrapper
+    return decorator
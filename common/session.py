@@ -0,0 +1,16 @@
+import contextlib
+
+import aiohttp
+
+
+@contextlib.asynccontextmanager
+async def client_session(session=None):
+    """
+    Réutilise la session aiohttp fournie (celle du démon, dont le pool de connexions
+    reste ouvert entre deux runs) ou en ouvre une pour la durée du run.
+    """
+    if session is not None:
+        yield session
+        return
+    async with aiohttp.ClientSession() as own_session:
+        yield own_session
@@ -0,0 +1,96 @@
+import asyncio
+import copy
+import functools
+import logging
+
+from common.run_guard import current_budget
+
+logger = logging.getLogger(__name__)
+
+# Plusieurs scripts et catégories se recouvrent (BN Dossiers / Actualites, BNall et
+# Business News/*, BN10jrs et BNall...) : la même URL est souvent demandée plusieurs
+# fois en même temps, surtout dans le démon où tous les jobs partagent la même boucle.
+# Un appel identique à un appel en cours attend le résultat de celui-ci au lieu de
+# refaire la requête (et l'analyse).
+
+
+class SingleFlight:
+    """
+    Appels asynchrones en cours, par clé. Le premier appel d'une clé s'exécute ; les
+    appels suivants faits avant sa fin reçoivent le même résultat (ou la même
+    exception). La clé est oubliée dès la fin de l'appel : ce n'est pas un cache.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}
+        self.calls = 0
+        self.saved = 0
+
+    def __len__(self):
+        return len(self._calls)
+
+    async def do(self, key, func, *args, **kwargs):
+        """Renvoie (résultat, partagé) ; partagé vaut True si l'appel a été regroupé."""
+        task = self._calls.get(key)
+        if task is not None:
+            self.saved += 1
+            current_budget().coalesced += 1
+            logger.debug(f"Coalesced {self.name} call for {key}")
+            return await asyncio.shield(task), True
+
+        self.calls += 1
+        task = asyncio.ensure_future(func(*args, **kwargs))
+        self._calls[key] = task
+        task.add_done_callback(lambda _: self._calls.pop(key, None))
+        # shield : l'annulation d'un appelant n'annule pas la requête des autres
+        return await asyncio.shield(task), False
+
+    def __str__(self):
+        return f"{self.name}: {self.calls} calls, {self.saved} duplicates coalesced"
+
+
+# Réponses HTTP (texte des pages), partagées par tous les scripts : clé = URL, ou
+# (URL, conteneurs) pour une page lue seulement jusqu'à la fin de certains conteneurs
+responses = SingleFlight('fetch')
+# Résultats d'analyse, propres à chaque fonction : clé = (fichier, fonction, URL)
+results = SingleFlight('parse')
+
+
+def _url(args, kwargs):
+    # Signature des scripts : fetch(session, url), fetch_article_content(session, url)
+    return kwargs['url'] if 'url' in kwargs else args[1]
+
+
+def _fetch_key(args, kwargs):
+    # fetch(session, url, stop_after=None) : un corps coupé après les conteneurs d'un
+    # script ne convient qu'aux appels qui attendent les mêmes conteneurs
+    stop_after = kwargs['stop_after'] if 'stop_after' in kwargs else (args[2] if len(args) > 2 else None)
+    url = _url(args, kwargs)
+    if not stop_after:
+        return url
+    return (url, tuple(tuple(container) for container in stop_after))
+
+
+def coalesce_fetch(func):
+    """Décorateur de fetch(session, url, stop_after) : une seule requête par URL (et coupure) en cours."""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        result, shared = await responses.do(_fetch_key(args, kwargs), func, *args, **kwargs)
+        return result
+    return wrapper
+
+
+def coalesce_result(func):
+    """
+    Décorateur de fetch_article_content(session, url) : une seule requête et une seule
+    analyse par URL en cours. Les appels regroupés reçoivent une copie du résultat,
+    que les scripts complètent parfois (catégorie...).
+    """
+    name = (func.__code__.co_filename, func.__qualname__)
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        result, shared = await results.do(name + (_url(args, kwargs),), func, *args, **kwargs)
+        return copy.deepcopy(result) if shared else result
+    return wrapper
@@ -0,0 +1,56 @@
+import codecs
+import logging
+from html.parser import HTMLParser
+
+logger = logging.getLogger(__name__)
+
+# Arrêt anticipé de la lecture d'une page : le HTML est passé morceau par morceau à un
+# tokenizer incrémental (html.parser), qui signale quand tous les éléments attendus
+# par le script (conteneur de l'article, titre, date...) ont été refermés. La suite
+# (pied de page, scripts, articles liés) n'est pas téléchargée.
+
+
+class ContainerCutoff(HTMLParser):
+    """
+    `containers` : liste de (balise, classes) comme dans soup.find('div', class_='...').
+    feed(chunk) renvoie True dès que chaque élément a été vu et refermé ; un élément
+    absent de la page fait lire la page entière.
+    """
+
+    def __init__(self, containers, encoding='utf-8'):
+        super().__init__(convert_charrefs=False)
+        self.containers = [(tag, frozenset(classes.split())) for tag, classes in containers]
+        self.pending = set(range(len(self.containers)))
+        self.depths = {}  # indice -> profondeur des balises de même nom dans l'élément ouvert
+        self.complete = not self.pending
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+
+    def feed_bytes(self, chunk):
+        if not self.complete:
+            self.feed(self._decoder.decode(chunk))
+        return self.complete
+
+    def handle_starttag(self, tag, attrs):
+        for index in self.depths:
+            if self.containers[index][0] == tag:
+                self.depths[index] += 1
+        classes = None
+        for index in self.pending:
+            container_tag, wanted = self.containers[index]
+            if container_tag != tag or index in self.depths:
+                continue
+            if classes is None:
+                classes = set((dict(attrs).get('class') or '').split())
+            if wanted <= classes:
+                self.depths[index] = 1
+
+    def handle_endtag(self, tag):
+        for index in list(self.depths):
+            if self.containers[index][0] != tag:
+                continue
+            self.depths[index] -= 1
+            if not self.depths[index]:
+                del self.depths[index]
+                self.pending.discard(index)
+        if not self.pending:
+            self.complete = True
@@ -0,0 +1,194 @@
+import asyncio
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from urllib.parse import urljoin
+
+import aiohttp
+from bs4 import BeautifulSoup
+
+from common.retry import fetch_with_retries
+
+logger = logging.getLogger(__name__)
+
+# Source « API REST » des sites WordPress (WebManagerCenter, Challenges) : titre,
+# date ISO, auteur, contenu et catégories arrivent en JSON par lots de PER_PAGE
+# articles, au lieu d'une page de liste plus une page HTML complète par article.
+
+PER_PAGE = 100  # maximum accepté par WordPress
+POST_FIELDS = 'id,link,date,modified,title,content,author,categories'
+FULL_SYNC_INTERVAL = 24 * 3600  # resynchronisation complète (articles supprimés...) une fois par jour
+SYNC_MARGIN = timedelta(minutes=5)  # recouvrement des synchronisations incrémentales
+UNKNOWN_AUTHOR = 'Auteur non disponible'
+
+
+class WordPressAPIError(Exception):
+    """API REST absente, désactivée ou réponse inattendue : repli sur le HTML."""
+
+
+class WordPressAPI:
+    def __init__(self, site_url, ssl=None, headers=None, per_page=PER_PAGE):
+        self.site_url = site_url.rstrip('/')
+        self.ssl = ssl
+        self.headers = headers
+        self.per_page = per_page
+        self._categories = None
+        self._authors = {}
+
+    async def get(self, session, route, params=None):
+        """GET sur /wp-json/wp/v2/<route>, renvoie (données JSON, en-têtes)."""
+        url = f"{self.site_url}/wp-json/wp/v2/{route}"
+        try:
+            response = await fetch_with_retries(session, url, read='json', params=params, ssl=self.ssl, headers=self.headers)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            # CircuitOpenError compris (sous-classe de ClientError) : le script repasse au HTML
+            logger.error(f"Error fetching API URL {url}: {e!r}")
+            raise WordPressAPIError(repr(e)) from e
+        except ValueError:
+            raise WordPressAPIError(f"{url} did not return JSON")
+        if response.status != 200:
+            raise WordPressAPIError(f"HTTP {response.status} for {response.url}")
+        logger.debug(f"Fetched API URL: {response.url}")
+        return response.body, response.headers
+
+    async def get_all(self, session, route, params):
+        """Toutes les pages d'une collection, d'après l'en-tête X-WP-TotalPages."""
+        params = dict(params, per_page=self.per_page, page=1)
+        items, headers = await self.get(session, route, params)
+        total_pages = int(headers.get('X-WP-TotalPages', 1) or 1)
+        for page in range(2, total_pages + 1):
+            more, _ = await self.get(session, route, dict(params, page=page))
+            items.extend(more)
+        return items
+
+    async def category_ids(self, session, slugs):
+        """
+        Identifiant de chaque catégorie et de ses sous-catégories (les pages de
+        catégorie du site listent aussi les articles des sous-catégories).
+        Renvoie {slug: set d'identifiants}.
+        """
+        if self._categories is None:
+            self._categories = await self.get_all(session, 'categories', {'_fields': 'id,slug,parent'})
+        by_slug = {category['slug']: category['id'] for category in self._categories}
+        children = {}
+        for category in self._categories:
+            children.setdefault(category['parent'], []).append(category['id'])
+        result = {}
+        for slug in slugs:
+            if slug not in by_slug:
+                raise WordPressAPIError(f"Unknown category slug '{slug}'")
+            ids, stack = set(), [by_slug[slug]]
+            while stack:
+                category_id = stack.pop()
+                if category_id not in ids:
+                    ids.add(category_id)
+                    stack.extend(children.get(category_id, []))
+            result[slug] = ids
+        return result
+
+    async def author_names(self, session, author_ids):
+        """Noms des auteurs (en un seul appel, avec cache) ; l'endpoint users est souvent fermé."""
+        missing = sorted(set(author_ids) - set(self._authors))
+        if missing:
+            try:
+                users = await self.get_all(session, 'users', {'include': ','.join(map(str, missing)), '_fields': 'id,name'})
+                self._authors.update({user['id']: user['name'] for user in users})
+            except WordPressAPIError as e:
+                logger.info(f"Author names not available from the API: {e}")
+            for author_id in missing:
+                self._authors.setdefault(author_id, UNKNOWN_AUTHOR)
+        return self._authors
+
+    async def posts(self, session, category_ids, after=None, modified_after=None):
+        params = {'categories': ','.join(map(str, sorted(category_ids))), '_fields': POST_FIELDS}
+        if after:
+            params['after'] = after.isoformat(timespec='seconds')
+        if modified_after:
+            params['modified_after'] = modified_after.isoformat(timespec='seconds')
+        return await self.get_all(session, 'posts', params)
+
+
+def html_text(fragment):
+    return BeautifulSoup(fragment or '', 'html.parser').get_text().strip()
+
+
+def post_to_article(post, authors, base_url):
+    """Article au format des scripts HTML (contenu = texte des <p>, tags = liens du contenu)."""
+    content_soup = BeautifulSoup(post.get('content', {}).get('rendered', ''), 'html.parser')
+    paragraphs = [p.get_text(strip=True) for p in content_soup.find_all('p')]
+    return {
+        'url': post['link'],
+        'title': html_text(post.get('title', {}).get('rendered')) or 'Titre non trouvé',
+        'date_of_publication': post.get('date', ''),
+        'content': ' '.join(paragraphs) or 'Contenu non disponible',
+        'author': authors.get(post.get('author'), UNKNOWN_AUTHOR),
+        'tags': [urljoin(base_url, link['href']) for link in content_soup.find_all('a', href=True)],
+    }
+
+
+def _load_json(path, default):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+    except (IOError, ValueError) as e:
+        logger.error(f"Error loading {path}: {e}")
+        return default
+
+
+def reset_sync(state_file):
+    """À appeler quand un run repasse par le HTML : le prochain run API sera complet."""
+    if os.path.exists(state_file):
+        os.remove(state_file)
+
+
+async def fetch_recent(api, session, category_slugs, days, output_file, state_file):
+    """
+    Articles des `days` derniers jours par catégorie ({nom: [articles]}), à partir de
+    l'API REST. `category_slugs` : {nom de la catégorie dans le fichier de sortie: slug}.
+
+    Si le run précédent est passé par l'API (état dans `state_file`), seuls les
+    articles modifiés depuis (modified_after) sont demandés et fusionnés avec le
+    fichier de sortie existant ; sinon, et une fois par jour, tout est relu (after).
+    Lève WordPressAPIError si l'API n'est pas utilisable.
+    """
+    now = datetime.now()
+    cutoff = now - timedelta(days=days)
+    ids_by_slug = await api.category_ids(session, category_slugs.values())
+
+    state = _load_json(state_file, {})
+    previous = {}
+    modified_after = None
+    if state.get('last_sync') and state.get('full_sync'):
+        full_sync = datetime.fromisoformat(state['full_sync'])
+        if (now - full_sync).total_seconds() < FULL_SYNC_INTERVAL:
+            previous = _load_json(output_file, {}).get('articles', {})
+            modified_after = datetime.fromisoformat(state['last_sync']) - SYNC_MARGIN
+
+    all_ids = set().union(*ids_by_slug.values())
+    posts = await api.posts(session, all_ids, after=cutoff, modified_after=modified_after)
+    authors = await api.author_names(session, {post.get('author') for post in posts if post.get('author')})
+    logger.info(f"REST API returned {len(posts)} posts ({'modified since ' + str(modified_after) if modified_after else 'full sync'})")
+
+    result = {}
+    for name, slug in category_slugs.items():
+        articles = {}
+        for article in previous.get(name, []):
+            try:
+                if datetime.fromisoformat(article['date_of_publication']) >= cutoff:
+                    articles[article['url']] = article
+            except (KeyError, ValueError):
+                continue
+        for post in posts:
+            if ids_by_slug[slug] & set(post.get('categories', [])):
+                articles[post['link']] = post_to_article(post, authors, api.site_url)
+        result[name] = sorted(articles.values(), key=lambda article: article['date_of_publication'], reverse=True)
+
+    state['last_sync'] = now.isoformat(timespec='seconds')
+    if modified_after is None:
+        state['full_sync'] = now.isoformat(timespec='seconds')
+    with open(state_file, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=4)
+    return result
@@ -0,0 +1,19 @@
+import pytest
+
+from common import bandwidth, latency, rate_limit, retry
+
+
+@pytest.fixture
+def isolated(monkeypatch, tmp_path):
+    """
+    Limiteur de débit, compteur de bande passante, disjoncteurs et latences propres
+    au test : rien n'est écrit hors de tmp_path et aucune attente entre les tentatives.
+    """
+    monkeypatch.setattr(rate_limit, 'DEFAULT_RATE', 1000.0)
+    monkeypatch.setattr(rate_limit, 'DEFAULT_BURST', 1000.0)
+    monkeypatch.setattr(retry, 'limiter', rate_limit.RateLimiter(str(tmp_path / 'rate.sqlite')))
+    monkeypatch.setattr(retry, 'bandwidth', bandwidth.Bandwidth(str(tmp_path / 'bandwidth_usage.json')))
+    monkeypatch.setattr(retry, '_breakers', {})
+    monkeypatch.setattr(latency, '_hosts', {})
+    monkeypatch.setattr(retry, 'next_delay', lambda previous: 0.01)
+    return tmp_path
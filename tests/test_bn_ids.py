@@ -0,0 +1,52 @@
+import asyncio
+import importlib.util
+import json
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_bn(tmp_path, monkeypatch):
+    # Dossier courant temporaire : Articles.json et ids.json sont créés dans tmp_path
+    monkeypatch.chdir(tmp_path)
+    spec = importlib.util.spec_from_file_location('bn_ids', os.path.join(ROOT, 'BNall', 'BN.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    monkeypatch.setattr(module, 'ID_BATCH_INTERVAL', 0)
+    monkeypatch.setattr(module, 'MAX_CONSECUTIVE_MISSES', 20)
+    monkeypatch.setattr(module, 'MAX_IDS_PER_RUN', 30)
+    return module
+
+
+def test_rechecked_ids_are_counted_once(tmp_path, monkeypatch):
+    bn = load_bn(tmp_path, monkeypatch)
+    articles = {1000: 'Actualites', 990: 'Actualites'}
+    down = set()
+
+    async def fetch_article_by_id(session, number):
+        if number in down:
+            return bn.UNAVAILABLE
+        if number in articles:
+            url = f"{bn.base_url}/titre,520,{number},3"
+            return url, 520, {'url': url, 'title': 'Titre', 'date_of_publication': '', 'content': '', 'author': '', 'tags': []}
+        return None
+
+    monkeypatch.setattr(bn, 'fetch_article_by_id', fetch_article_by_id)
+    with open(bn.ids_file, 'w', encoding='utf-8') as f:
+        json.dump({'high': 1000, 'low': 1000}, f)
+
+    def tombstones():
+        with open(bn.ids_file, 'r', encoding='utf-8') as f:
+            return json.load(f)['tombstones']
+
+    # Premier run : 20 identifiants vides au-delà de la tête ; archive de 999 à 970, 990 est
+    # un article et le lot 974-970 échoue sur 972 (ses 4 autres identifiants sont comptés)
+    down = {972}
+    asyncio.run(bn.discover_ids())
+    first = tombstones()
+    assert first == 20 + 24 + 4
+
+    # La tête et le lot 974-970 sont retestés sans être recomptés ; l'archive va jusqu'à 945
+    down = set()
+    asyncio.run(bn.discover_ids())
+    assert tombstones() - first == 30 - 4
@@ -0,0 +1,42 @@
+import os
+
+from common import columnar
+from common.columnar import URLS_FILE, export_articles, read_columns
+
+URL = 'https://www.leaders.com.tn/article/32901-hommage'
+
+
+def article(title, date, updated=None):
+    record = {'url': URL, 'titre': title, 'date_publish': date, 'contenu': 'Texte'}
+    if updated:
+        record['date_mise_a_jour'] = updated
+    return record
+
+
+def test_update_moved_to_another_month_replaces_the_old_row(tmp_path):
+    root = str(tmp_path)
+    export_articles(root, 'Leaders', [('news', article('Premier titre', '31.10.2026'))])
+    export_articles(root, 'Leaders', [('news', article('Titre corrigé', '01.11.2026', '2026-11-01T09:00'))])
+    result = read_columns(root, ['title', 'month'])
+    assert result == {'title': ['Titre corrigé'], 'month': ['2026-11']}
+    # Aucune ligne de l'ancienne partition ne reste à la lecture
+    assert read_columns(root, ['url'], month='2026-10') == {'url': []}
+
+
+def test_update_in_the_same_partition_keeps_the_latest_row(tmp_path):
+    root = str(tmp_path)
+    export_articles(root, 'Leaders', [('news', article('Premier titre', '19.10.2026'))])
+    export_articles(root, 'Leaders', [('news', article('Deuxième titre', '19.10.2026', '2026-10-19T10:00'))])
+    export_articles(root, 'Leaders', [('news', article('Troisième titre', '19.10.2026', '2026-10-19T11:00'))])
+    assert read_columns(root, ['title'])['title'] == ['Troisième titre']
+
+
+def test_rows_of_an_old_export_without_partition_are_replaced(tmp_path):
+    root = str(tmp_path)
+    export_articles(root, 'Leaders', [('news', article('Premier titre', '31.10.2026'))])
+    # _urls.txt écrit avant que chaque ligne ne nomme sa partition
+    with open(os.path.join(root, URLS_FILE), 'w', encoding='utf-8') as f:
+        f.write(URL + '\n')
+    export_articles(root, 'Leaders', [('news', article('Titre corrigé', '01.11.2026', '2026-11-01T09:00'))])
+    assert columnar._load_exported(root)[2] is None
+    assert read_columns(root, ['title'])['title'] == ['Titre corrigé']
@@ -0,0 +1,116 @@
+import asyncio
+
+import aiohttp
+import pytest
+
+from common import cursor as cursor_module
+from common.cursor import ListingCursor, ListingFetchError, crawl_listing, fetch_listing
+from common.negative_cache import GONE, NegativeCache
+
+PER_PAGE = 2
+
+
+def article(number):
+    return {'url': f"https://www.businessnews.com.tn/titre,520,{number},3"}
+
+
+class Listing:
+    """
+    Liste paginée simulée : `pages` articles par page, du plus récent au plus ancien ;
+    les pages de `failing` ne peuvent pas être lues (ListingFetchError).
+    """
+
+    def __init__(self, pages, failing=()):
+        self.pages = pages
+        self.failing = set(failing)
+        self.read = []
+        self.saved = []
+
+    async def scrape(self, page_number, listing):
+        self.read.append(page_number)
+        if page_number in self.failing:
+            raise ListingFetchError(f"page {page_number}")
+        articles = [article(number) for number in self.pages.get(page_number, [])]
+        listing.extend(a['url'] for a in articles)
+        return articles or None
+
+    async def save(self, articles):
+        self.saved.extend(articles)
+
+
+def pages(count, newest=1000):
+    """`count` pages pleines, identifiants décroissants à partir de `newest`."""
+    return {page: [newest - (page - 1) * PER_PAGE - i for i in range(PER_PAGE)] for page in range(1, count + 1)}
+
+
+def test_failed_archive_page_is_not_the_end():
+    site = Listing(pages(3), failing={1})
+    cursor = ListingCursor()
+    asyncio.run(crawl_listing(cursor, site.scrape, site.save))
+    assert not cursor.complete
+    assert cursor.archive_page() == 1
+
+
+def test_empty_page_ends_the_archive():
+    site = Listing({})
+    cursor = ListingCursor()
+    asyncio.run(crawl_listing(cursor, site.scrape, site.save))
+    assert cursor.complete
+
+
+def test_failed_head_page_keeps_the_head():
+    site = Listing(pages(3), failing={1})
+    cursor = ListingCursor(newest_id=990, oldest_id=995, oldest_page=3, complete=True, tail_checked=0)
+    asyncio.run(crawl_listing(cursor, site.scrape, site.save))
+    assert cursor.newest_id == 990
+    assert site.read == [1]
+
+
+def test_fetch_listing_tells_failures_from_missing_pages(monkeypatch, tmp_path):
+    cache = NegativeCache(str(tmp_path / 'dead_urls.json'))
+    monkeypatch.setattr(cursor_module, 'dead_urls', cache)
+
+    async def missing(session, url):
+        cache.record(url, GONE)
+        return None
+
+    async def failed(session, url):
+        return None
+
+    async def broken(session, url):
+        raise aiohttp.ClientConnectionError('reset')
+
+    assert asyncio.run(fetch_listing(missing, None, 'https://site/page/9')) is None
+    with pytest.raises(ListingFetchError):
+        asyncio.run(fetch_listing(failed, None, 'https://site/page/2'))
+    with pytest.raises(ListingFetchError):
+        asyncio.run(fetch_listing(broken, None, 'https://site/page/3'))
+
+
+def test_failed_probe_does_not_bound_the_archive():
+    # Page 6 en échec pendant le sondage : pas de découpage sur une archive raccourcie
+    site = Listing(pages(40), failing={6})
+    cursor = ListingCursor()
+    asyncio.run(crawl_listing(cursor, site.scrape, site.save))
+    assert cursor.ranges == []
+    assert not cursor.complete
+    site.failing.clear()
+    asyncio.run(crawl_listing(cursor, site.scrape, site.save))
+    assert cursor.complete
+    assert set(range(1, 41)) <= set(site.read)
+
+
+def test_failed_range_page_keeps_the_range_open():
+    site = Listing(pages(60))
+    cursor = ListingCursor(newest_id=1000)
+    cursor.ranges = [[30, 40], [41, None]]
+    cursor.oldest_id, cursor.oldest_page = 1000 - 29 * PER_PAGE, 29
+    site.failing = {35}
+    asyncio.run(crawl_listing(cursor, site.scrape, site.save))
+    assert not cursor.complete
+    assert [35, 40] in cursor.ranges
+    site.failing.clear()
+    site.read.clear()
+    asyncio.run(crawl_listing(cursor, site.scrape, site.save))
+    assert cursor.complete
+    assert set(range(35, 41)) <= set(site.read)
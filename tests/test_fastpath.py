@@ -0,0 +1,78 @@
+import importlib.util
+import os
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BN_PAGE = '''<html><head><title>{title}</title></head><body>
+<div class="titreArticleZen">{title}</div>
+<div class="heureArticle fas fa-calendar">19/10/2026 10:30</div>
+<div class="date_artilce_zen">Le 19 octobre 2026</div>
+<div class="contenue_article_zen">
+<p>Premier <b>paragraphe</b> &eacute;crit <a href="/le-dinar,520,137212,3">lien</a></p>
+<div>Bloc <em>encadré</em></div>
+{signature}
+<p>   </p>
+</div>
+<div class="auteur_artilce_zen">Par la rédaction</div>
+</body></html>'''
+BN_SIGNATURES = [
+    '',
+    '<p style="text-align: right;"><strong>Mohamed Ali</strong></p>',
+    '<p style="text-align: right;"><em>Par</em> <strong>Sami B.</strong></p>',
+    '<div style="text-align: right;" dir="auto"><strong>Nadia K.</strong></div>',
+]
+
+LEADERS_PAGE = '''<html><body><h1 class="titlePage"> Le titre </h1>
+<div class="title">Le titre</div><div class="author">Leaders</div>
+<div class="infos">{rubrique} - 19.10.2026</div>
+<div class="desc article_body"><p>Texte <a href="https://www.leaders.com.tn/photo.jpg">photo</a> et <a href="/article/1">lien</a></p>
+<div>Encadré</div><h2>Intertitre</h2><li>Point</li><p></p></div>
+<div class="tags"><a href="/tag/1">Tag</a></div></body></html>'''
+
+BN_SCRIPTS = ['BNall/BN.py', 'Business News/Business-Auto.py', 'Business News/Business-BNTv.py',
+              'Business News/Business-Dossiers.py', 'Business News/Business-OpTribunes.py',
+              'Business News/Business-SurResaux.py', 'Business News/Businessnews-BNcheck.py']
+LEADERS_SCRIPTS = {'Leaders/Leaders-Dossier.py': 'Dossiers', 'Leaders/Leaders-Success.py': 'Success Story',
+                   'Leaders/Leaders-Lifestyle.py': 'Lifestyle-', "Leaders/Leaders-Who.py": "Who's Who",
+                   'Leaders/Leaders-TV.py': 'TV'}
+
+
+def load(path, tmp_path, monkeypatch):
+    # Dossier courant temporaire : les fichiers de sortie créés à l'import n'atterrissent pas dans le dépôt
+    monkeypatch.chdir(tmp_path)
+    spec = importlib.util.spec_from_file_location('fastpath_' + os.path.basename(path)[:-3].replace('-', '_'),
+                                                  os.path.join(ROOT, path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def assert_same(module, page):
+    fast = module.parse_article_markers(page, 'https://www.example.com/article')
+    assert fast is not None
+    full = module.parse_article_dom(page, 'https://www.example.com/article')
+    assert fast == full
+    # Même ordre des champs : les articles sont écrits tels quels dans le fichier JSON
+    if isinstance(full, dict):
+        assert list(fast) == list(full)
+
+
+@pytest.mark.parametrize('path', BN_SCRIPTS)
+def test_business_news_fast_path_matches_the_dom(path, tmp_path, monkeypatch):
+    module = load(path, tmp_path, monkeypatch)
+    for signature in BN_SIGNATURES:
+        assert_same(module, BN_PAGE.format(title='Le dinar se stabilise', signature=signature))
+
+
+@pytest.mark.parametrize('path', sorted(LEADERS_SCRIPTS))
+def test_leaders_fast_path_matches_the_dom(path, tmp_path, monkeypatch):
+    module = load(path, tmp_path, monkeypatch)
+    assert_same(module, LEADERS_PAGE.format(rubrique=LEADERS_SCRIPTS[path]))
+
+
+def test_bncheck_title_with_markup_falls_back(tmp_path, monkeypatch):
+    module = load('Business News/Businessnews-BNcheck.py', tmp_path, monkeypatch)
+    page = BN_PAGE.format(title='Le <i>dinar</i>', signature='')
+    assert module.parse_article_markers(page, 'https://www.example.com/article') is None
@@ -0,0 +1,164 @@
+import asyncio
+import gzip
+import hashlib
+import os
+import shutil
+from collections import Counter
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from common.feeds import CHANGED, NEW, FeedDiscovery, parse_feed
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures', 'feeds')
+
+BN = 'https://www.businessnews.com.tn/'
+SITEMAP_URLS = {
+    BN + 'la-bourse-de-tunis,520,137210,3',
+    BN + 'le-budget-2027,520,137209,3',
+    BN + 'le-dinar-se-stabilise,520,137212,3',
+}
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, name), 'rb') as f:
+        return f.read()
+
+
+def test_parse_rss():
+    entries, children = parse_feed(fixture('rss.xml'))
+    assert children == []
+    assert entries == [
+        (BN + 'le-dinar-se-stabilise,520,137212,3', '2026-10-19T09:30:00+01:00', "Le dinar se stabilise face à l'euro"),
+        (BN + 'saison-oleicole,520,137211,3', '2026-10-19T08:15:00+01:00', 'Saison oléicole : les prévisions revues à la hausse'),
+    ]
+
+
+def test_parse_atom_keeps_alternate_links():
+    entries, _ = parse_feed(fixture('atom.xml'), 'https://www.leaders.com.tn/feed.atom')
+    assert entries == [
+        ('https://www.leaders.com.tn/article/32901-hommage-a-un-grand-batisseur', '2026-10-19T10:00:00Z',
+         'Hommage à un grand bâtisseur'),
+        ('https://www.leaders.com.tn/article/32900-qui-est-qui', '2026-10-18T06:00:00Z', 'Qui est qui : la nouvelle équipe'),
+    ]
+
+
+def test_parse_sitemaps():
+    entries, children = parse_feed(fixture('sitemap_index.xml'), BN + 'sitemap_index.xml')
+    assert entries == []
+    assert children == [
+        (BN + 'sitemap-articles.xml', '2026-10-19T10:00:00+01:00'),
+        (BN + 'sitemap-news.xml', '2026-10-19T10:05:00+01:00'),
+    ]
+    # Sitemap « news » : date de publication et titre de l'extension news
+    entries, _ = parse_feed(fixture('sitemap-news.xml'))
+    assert entries == [(BN + 'le-dinar-se-stabilise,520,137212,3', '2026-10-19T09:30:00+01:00',
+                        "Le dinar se stabilise face à l'euro")]
+
+
+def test_parse_gzipped_sitemap():
+    assert parse_feed(gzip.compress(fixture('sitemap-articles.xml'))) == parse_feed(fixture('sitemap-articles.xml'))
+
+
+def _copy_fixtures(directory):
+    for name in os.listdir(FIXTURES):
+        shutil.copy(os.path.join(FIXTURES, name), os.path.join(directory, name))
+
+
+def _touch_lastmod(path, old, new):
+    with open(path, 'rb') as f:
+        data = f.read()
+    with open(path, 'wb') as f:
+        f.write(data.replace(old.encode(), new.encode()))
+    # mtime distinct même sur un système de fichiers à faible résolution
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_local_sources_report_new_then_changed_entries(tmp_path):
+    _copy_fixtures(tmp_path)
+    sources = [str(tmp_path / 'rss.xml'), str(tmp_path / 'sitemap_index.xml')]
+    state = str(tmp_path / 'feeds.json')
+
+    discovery = FeedDiscovery(sources, state)
+    entries = asyncio.run(discovery.discover(None))
+    assert discovery.failed == []
+    assert {entry.status for entry in entries} == {NEW}
+    assert {entry.url for entry in entries} == SITEMAP_URLS | {BN + 'saison-oleicole,520,137211,3'}
+    discovery.save()
+
+    # Fichiers inchangés : rien n'est relu
+    discovery = FeedDiscovery(sources, state)
+    assert asyncio.run(discovery.discover(None)) == []
+    assert discovery.modified == 0
+
+    _touch_lastmod(str(tmp_path / 'sitemap-articles.xml'), '2026-10-18T17:00:00+01:00', '2026-10-19T11:00:00+01:00')
+    _touch_lastmod(str(tmp_path / 'sitemap_index.xml'), '2026-10-19T10:00:00+01:00', '2026-10-19T11:00:00+01:00')
+    discovery = FeedDiscovery(sources, state)
+    entries = asyncio.run(discovery.discover(None))
+    assert [(entry.url, entry.status) for entry in entries] == [(BN + 'la-bourse-de-tunis,520,137210,3', CHANGED)]
+
+
+class FeedServer:
+    """Sert les fichiers d'un dossier avec ETag et réponses 304, en comptant les requêtes."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.hits = Counter()
+        self.not_modified = Counter()
+        app = web.Application()
+        app.router.add_get('/{name}', self.handle)
+        self.server = TestServer(app, host='127.0.0.1')
+
+    async def handle(self, request):
+        name = request.match_info['name']
+        path = os.path.join(self.directory, name)
+        if not os.path.exists(path):
+            return web.Response(status=404)
+        self.hits[name] += 1
+        with open(path, 'rb') as f:
+            data = f.read()
+        etag = '"%s"' % hashlib.md5(data).hexdigest()
+        if request.headers.get('If-None-Match') == etag:
+            self.not_modified[name] += 1
+            return web.Response(status=304, headers={'ETag': etag})
+        return web.Response(body=data, headers={'ETag': etag}, content_type='application/xml')
+
+    def url(self, name):
+        return str(self.server.make_url('/' + name))
+
+
+def test_http_sources_use_conditional_requests(isolated):
+    directory = isolated / 'site'
+    directory.mkdir()
+    _copy_fixtures(directory)
+    state = str(isolated / 'feeds.json')
+
+    async def main():
+        feeds = FeedServer(str(directory))
+        await feeds.server.start_server()
+        try:
+            async with aiohttp.ClientSession() as session:
+                discovery = FeedDiscovery([feeds.url('sitemap_index.xml')], state)
+                first = await discovery.discover(session)
+                discovery.save()
+                discovery = FeedDiscovery([feeds.url('sitemap_index.xml')], state)
+                second = await discovery.discover(session)
+                discovery.save()
+
+                # Un seul sitemap modifié dans l'index : lui seul est relu
+                _touch_lastmod(str(directory / 'sitemap-news.xml'), '2026-10-19T09:30:00+01:00', '2026-10-19T12:00:00+01:00')
+                _touch_lastmod(str(directory / 'sitemap_index.xml'), '2026-10-19T10:05:00+01:00', '2026-10-19T12:00:00+01:00')
+                discovery = FeedDiscovery([feeds.url('sitemap_index.xml')], state)
+                third = await discovery.discover(session)
+        finally:
+            await feeds.server.close()
+        return feeds, first, second, third
+
+    feeds, first, second, third = asyncio.run(main())
+    assert {entry.url for entry in first} == SITEMAP_URLS
+    assert second == []
+    assert feeds.not_modified['sitemap_index.xml'] == 1
+    assert [(entry.url, entry.status) for entry in third] == [(BN + 'le-dinar-se-stabilise,520,137212,3', CHANGED)]
+    assert feeds.hits == {'sitemap_index.xml': 3, 'sitemap-articles.xml': 1, 'sitemap-news.xml': 2}
@@ -0,0 +1,47 @@
+import asyncio
+import threading
+
+from common.parse_cache import ParseCache
+
+
+def test_cached_records_survive_a_new_process(tmp_path):
+    path = str(tmp_path / 'parse_cache.sqlite')
+    calls = []
+
+    def parse(html_content, url):
+        calls.append(url)
+        return {'url': url, 'length': len(html_content)}
+
+    cache = ParseCache(path)
+    parse_article = cache.cached('Leaders-Blog', 1, parse)
+    first = asyncio.run(parse_article('<p>page</p>', 'https://www.leaders.com.tn/article/1'))
+    again = asyncio.run(parse_article('<p>page</p>', 'https://www.leaders.com.tn/article/1'))
+    assert first == again == {'url': 'https://www.leaders.com.tn/article/1', 'length': 11}
+    assert calls == ['https://www.leaders.com.tn/article/1']
+    assert cache.memory_hits == 1
+    cache.flush()
+
+    # Nouveau processus : l'enregistrement vient de la base ; une autre version repart de zéro
+    cache = ParseCache(path)
+    assert asyncio.run(cache.cached('Leaders-Blog', 1, parse)('<p>page</p>', 'https://www.leaders.com.tn/article/1')) == first
+    assert cache.disk_hits == 1
+    asyncio.run(cache.cached('Leaders-Blog', 2, parse)('<p>page</p>', 'https://www.leaders.com.tn/article/1'))
+    cache.flush()
+    assert calls == ['https://www.leaders.com.tn/article/1'] * 2
+    assert cache.entries() == {('Leaders-Blog', 2): 1}
+
+
+def test_database_is_used_outside_the_event_loop(tmp_path, monkeypatch):
+    cache = ParseCache(str(tmp_path / 'parse_cache.sqlite'))
+    threads = set()
+    connect = cache._connect
+
+    def tracked():
+        threads.add(threading.current_thread().name)
+        return connect()
+
+    monkeypatch.setattr(cache, '_connect', tracked)
+    parse_article = cache.cached('BN-Auto', 1, lambda html_content, url: {'url': url})
+    asyncio.run(parse_article('<p>page</p>', 'https://www.businessnews.com.tn/a,520,1,3'))
+    cache.flush()
+    assert threads and all(name.startswith('parse-cache') for name in threads)
@@ -0,0 +1,85 @@
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+from common import rate_limit
+from common.rate_limit import RateLimiter
+
+URL = 'https://www.leaders.com.tn/article/1'
+HOST = 'www.leaders.com.tn'
+
+
+class Session:
+    """Session factice : robots.txt sans Crawl-delay, requêtes comptées."""
+
+    def __init__(self):
+        self.requests = 0
+
+    def get(self, url, **kwargs):
+        self.requests += 1
+        return Robots()
+
+
+class Robots:
+    status = 200
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def text(self):
+        return 'User-agent: *\nDisallow:\n'
+
+
+def test_robots_next_check_is_kept_in_memory(tmp_path, monkeypatch):
+    limiter = RateLimiter(str(tmp_path / 'rate.sqlite'))
+    transactions = []
+    run = limiter._run
+
+    async def counted(func):
+        transactions.append(func)
+        return await run(func)
+
+    monkeypatch.setattr(limiter, '_run', counted)
+    session = Session()
+
+    async def main():
+        for _ in range(3):
+            await limiter.acquire(URL, session)
+
+    asyncio.run(main())
+    assert session.requests == 1
+    # Lecture de l'état de robots.txt et limites au premier appel, puis seulement les jetons
+    assert len(transactions) == 2 + 3
+
+
+def test_successes_are_kept_when_the_transaction_fails(tmp_path, monkeypatch):
+    limiter = RateLimiter(str(tmp_path / 'rate.sqlite'))
+    limiter.succeeded(URL)
+    limiter.succeeded(URL)
+
+    async def locked(func):
+        raise sqlite3.OperationalError('database is locked')
+
+    monkeypatch.setattr(limiter, '_run', locked)
+    with pytest.raises(sqlite3.OperationalError):
+        asyncio.run(limiter._take(HOST))
+    assert limiter._successes[HOST] == 2
+
+
+def test_unusable_database_falls_back_to_local_pacing(tmp_path, monkeypatch):
+    monkeypatch.setattr(rate_limit, 'DEFAULT_RATE', 20.0)
+    limiter = RateLimiter(str(tmp_path / 'missing' / 'rate.sqlite'))
+
+    async def main():
+        started = time.monotonic()
+        for _ in range(3):
+            await limiter.acquire(URL)
+        return time.monotonic() - started
+
+    # Première requête immédiate, puis une toutes les 1/20 s
+    assert 0.09 < asyncio.run(main()) < 0.5
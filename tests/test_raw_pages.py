@@ -0,0 +1,35 @@
+import os
+import time
+
+from common.archive import ArchiveReader
+from common.raw_pages import RawPages
+
+
+def _old_archive(directory, name, size, age_days):
+    path = directory / name
+    path.write_bytes(b'\0' * size)
+    stamp = time.time() - age_days * 86400
+    os.utime(path, (stamp, stamp))
+    return path
+
+
+def test_cutoff_is_kept_by_default(tmp_path):
+    pages = RawPages(str(tmp_path))
+    assert pages.cutoff([('div', 'infos')]) == [('div', 'infos')]
+    assert RawPages(str(tmp_path), full_pages=True).cutoff([('div', 'infos')]) is None
+
+
+def test_flush_removes_old_archives(tmp_path):
+    expired = _old_archive(tmp_path, '2026-08-01-1.bna', 10, age_days=60)
+    oldest = _old_archive(tmp_path, '2026-10-01-1.bna', 600, age_days=18)
+    recent = _old_archive(tmp_path, '2026-10-15-1.bna', 600, age_days=4)
+
+    pages = RawPages(str(tmp_path), flush_pages=1, max_age_days=30, max_bytes=1500)
+    pages.add('Leaders-Opinion', 1, 'https://www.leaders.com.tn/article/1', '<p>page</p>', {'title': 't'})
+
+    assert not expired.exists()
+    assert not oldest.exists()
+    assert recent.exists()
+    (current,) = set(tmp_path.glob('*.bna')) - {recent}
+    with ArchiveReader(str(current)) as archive:
+        assert [record['url'] for record in archive.scan()] == ['https://www.leaders.com.tn/article/1']
@@ -0,0 +1,142 @@
+import asyncio
+import time
+from collections import Counter
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from common import latency, retry
+from common.retry import CircuitOpenError, fetch_with_retries
+
+
+class FaultServer:
+    """
+    Serveur local qui injecte des pannes : chaque chemin rejoue sa liste de réponses
+    (statut, en-têtes) puis répond 200, ou coupe la connexion pour 'drop'.
+    """
+
+    def __init__(self, scripts):
+        self.scripts = {path: list(steps) for path, steps in scripts.items()}
+        self.hits = Counter()
+        app = web.Application()
+        app.router.add_get('/{path:.*}', self.handle)
+        self.server = TestServer(app, host='127.0.0.1')
+
+    async def handle(self, request):
+        path = request.path
+        if path == '/robots.txt':
+            return web.Response(status=404)
+        self.hits[path] += 1
+        steps = self.scripts.get(path)
+        step = steps.pop(0) if steps else (200, {})
+        if step == 'drop':
+            request.transport.close()
+            return web.Response(status=200)
+        status, headers = step
+        return web.Response(status=status, headers=headers, text=f"{path} {status}")
+
+    def url(self, path):
+        return str(self.server.make_url(path))
+
+    async def __aenter__(self):
+        await self.server.start_server()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.server.close()
+
+
+def run(scripts, scenario):
+    async def main():
+        async with FaultServer(scripts) as server, aiohttp.ClientSession() as session:
+            return await scenario(server, session), server
+    return asyncio.run(main())
+
+
+def test_transient_statuses_are_retried(isolated):
+    async def scenario(server, session):
+        return await fetch_with_retries(session, server.url('/flaky'), hedge=False)
+
+    response, server = run({'/flaky': [(503, {}), (500, {})]}, scenario)
+    assert response.status == 200
+    assert response.body == '/flaky 200'
+    assert server.hits['/flaky'] == 3
+
+
+def test_retry_after_is_honoured(isolated):
+    async def scenario(server, session):
+        return await fetch_with_retries(session, server.url('/busy'), hedge=False)
+
+    response, server = run({'/busy': [(429, {'Retry-After': '0'})]}, scenario)
+    assert response.status == 200
+    assert server.hits['/busy'] == 2
+
+
+def test_dropped_connection_is_retried(isolated):
+    async def scenario(server, session):
+        return await fetch_with_retries(session, server.url('/drop'), hedge=False)
+
+    response, server = run({'/drop': ['drop']}, scenario)
+    assert response.status == 200
+    assert server.hits['/drop'] == 2
+
+
+def test_final_status_and_404_are_returned(isolated):
+    async def scenario(server, session):
+        missing = await fetch_with_retries(session, server.url('/missing'), hedge=False)
+        broken = await fetch_with_retries(session, server.url('/broken'), hedge=False)
+        return missing, broken
+
+    (missing, broken), server = run({'/missing': [(404, {})], '/broken': [(500, {})] * 10}, scenario)
+    assert missing.status == 404 and missing.body is None
+    assert server.hits['/missing'] == 1
+    assert broken.status == 500
+    assert server.hits['/broken'] == retry.MAX_ATTEMPTS
+
+
+def test_breaker_counts_one_failure_per_request(isolated):
+    async def scenario(server, session):
+        await fetch_with_retries(session, server.url('/broken'), hedge=False)
+        return retry.breaker_for(server.url('/'))
+
+    breaker, server = run({'/broken': [(500, {})] * 10}, scenario)
+    assert server.hits['/broken'] == retry.MAX_ATTEMPTS
+    assert breaker.failures == 1
+    assert breaker.state == 'closed'
+
+
+def test_breaker_opens_after_failed_requests(isolated, monkeypatch):
+    # Pas d'attente de la fin du délai : la requête suivante échoue tout de suite
+    monkeypatch.setattr(retry, 'BREAKER_MAX_WAIT', 0)
+    paths = [f"/broken-{n}" for n in range(retry.BREAKER_THRESHOLD)]
+
+    async def scenario(server, session):
+        for path in paths:
+            await fetch_with_retries(session, server.url(path), max_attempts=1, hedge=False)
+        with pytest.raises(CircuitOpenError):
+            await fetch_with_retries(session, server.url('/after'), hedge=False)
+        return retry.breaker_for(server.url('/'))
+
+    breaker, server = run({path: [(503, {})] for path in paths}, scenario)
+    assert breaker.state == 'open'
+    assert server.hits['/after'] == 0
+
+
+def test_bandwidth_wait_is_not_a_timeout_nor_latency(isolated):
+    # 9 octets lus à 4 octets/s (seaux global et par hôte) : une seule attente d'environ 1,25 s,
+    # plus longue que le délai total de la requête
+    retry.bandwidth.configure(max_rate=4, max_host_rate=4)
+
+    async def scenario(server, session):
+        started = time.monotonic()
+        response = await fetch_with_retries(session, server.url('/slow'), hedge=False,
+                                            timeout=aiohttp.ClientTimeout(total=0.5))
+        return response, time.monotonic() - started, latency.latency_for(server.url('/slow'))
+
+    (response, elapsed, host), server = run({}, scenario)
+    assert response.body == '/slow 200'
+    assert server.hits['/slow'] == 1
+    assert 1.0 < elapsed < 2.0
+    assert host.total[-1] < 0.5
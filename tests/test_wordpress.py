@@ -0,0 +1,18 @@
+import asyncio
+
+import pytest
+
+from common import wordpress
+from common.retry import CircuitOpenError
+from common.wordpress import WordPressAPI, WordPressAPIError
+
+
+@pytest.mark.parametrize('error', [asyncio.TimeoutError(), CircuitOpenError('www.webmanagercenter.com')])
+def test_timeouts_and_open_breaker_fall_back_to_html(monkeypatch, error):
+    async def failing(session, url, **kwargs):
+        raise error
+
+    monkeypatch.setattr(wordpress, 'fetch_with_retries', failing)
+    api = WordPressAPI('https://www.webmanagercenter.com/')
+    with pytest.raises(WordPressAPIError):
+        asyncio.run(api.category_ids(None, ['economie']))
@@ -10,6 +10,15 @@ import logging
 from urllib.parse import urljoin
 import schedule
 import time
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.session import client_session
+from common.run_guard import guarded_run
+from common.singleflight import coalesce_fetch, coalesce_result
+from common.retry import fetch_with_retries
+from common.negative_cache import GONE, SERVER_ERROR, dead_urls, track_failures
+from common.wordpress import WordPressAPI, WordPressAPIError, fetch_recent, reset_sync
 
 
 logging.basicConfig(level=logging.DEBUG)  # Set to DEBUG for more details
@@ -35,33 +44,46 @@ output_file = os.path.join(os.getcwd(), 'WebManCenter.json')
 journal_name = "Web Manager Center"
 journal_url = "https://www.webmanagercenter.com"
 semaphore = asyncio.Semaphore(5)  # Limit simultaneous requests
+# Elements read by fetch_article_content: the download stops once they are all closed
+article_containers = [('h1', 'entry-title'), ('time', 'entry-date'), ('div', 'td-post-content')]
 ssl_context = ssl.create_default_context(cafile=certifi.where())
 headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
 
-async def fetch(session, url):
-    retries = 3
-    for i in range(retries):
-        try:
-            async with session.get(url, ssl=ssl_context, headers=headers) as response:
-                if response.status == 200:
-                    logger.debug(f"Fetching URL: {url}")
-                    return await response.text()
-                elif response.status == 404:
-                    logger.warning(f"Page not found: {url}")
-                    return None
-                else:
-                    logger.warning(f"Unexpected response {response.status} for URL: {url}")
-        except aiohttp.ClientError as e:
-            logger.error(f"Error fetching URL {url}: {e}")
-            if i < retries - 1:
-                await asyncio.sleep(2 ** i)  # Exponential backoff
-            else:
-                raise
+# API REST WordPress : un appel par lot de 100 articles au lieu d'une page HTML par article
+USE_REST_API = True  # False : toujours scraper les pages HTML
+# Un fichier par script : lancés depuis le même dossier, ils ne reprennent pas l'état l'un de l'autre
+api_state_file = os.path.join(os.getcwd(), 'wp_sync_webmanagercenter.json')
+wordpress_api = WordPressAPI(base_url, ssl=ssl_context, headers=headers)
+category_slugs = {category: urls['first_page'].strip('/').split('/')[-1] for category, urls in categories.items()}
 
+@coalesce_fetch
+async def fetch(session, url, stop_after=None):
+    try:
+        response = await fetch_with_retries(session, url, ssl=ssl_context, headers=headers, stop_after=stop_after)
+    except aiohttp.ClientError as e:
+        logger.error(f"Error fetching URL {url}: {e}")
+        raise
+    if response.status == 200:
+        dead_urls.fetched(url)
+        logger.debug(f"Fetching URL: {url}")
+        return response.body
+    elif response.status in (404, 410):
+        dead_urls.record(url, GONE)
+        logger.warning(f"Page not found: {url}")
+        return None
+    else:
+        # 403, 429 après les tentatives... : rien d'enregistré, la page n'a pas été lue
+        if response.status >= 500:
+            dead_urls.record(url, SERVER_ERROR)
+        logger.warning(f"Unexpected response {response.status} for URL: {url}")
+        return None
+
+@coalesce_result
+@track_failures
 async def fetch_article_content(session, url):
     async with semaphore:
         logger.debug(f"Fetching article content from URL: {url}")
-        html_content = await fetch(session, url)
+        html_content = await fetch(session, url, stop_after=article_containers)
         if not html_content:
             logger.warning(f"No HTML content fetched for URL: {url}")
             return None, None, None, None, None
@@ -159,7 +181,7 @@ async def scrape_page(session, category, page_number, seen_urls):
             article_link = item.find('a', href=True)
             if article_link:
                 article_url = urljoin(base_url, article_link['href'])
-                if article_url in seen_urls:
+                if article_url in seen_urls or dead_urls.blocked(article_url):
                     continue
                 seen_urls.add(article_url)
 
@@ -195,12 +217,12 @@ async def scrape_page(session, category, page_number, seen_urls):
         logger.error(f"Exception while scraping page {page_number} in category '{category}': {e}")
         return None, False
 
-async def scrape_category(category):
+async def scrape_category(category, session=None):
     logger.info(f"Starting scraping process for category '{category}'...")
     all_articles = []
     seen_urls = set()
 
-    async with aiohttp.ClientSession() as session:
+    async with client_session(session) as session:
         page_number = 1
         all_articles_older_than_10_days = False
 
@@ -227,16 +249,28 @@ def parse_date(date_string, from_datetime=False):
         logger.error(f"Unable to parse date: {date_string} - {e}")
         return None
 
-async def scrape_all_categories():
+@guarded_run(output_file + '.lock', max_seconds=None, max_requests=None)
+async def scrape_all_categories(session=None):
     logger.info("Starting scraping process for all categories...")
-    all_category_articles = {}
+    all_category_articles = None
 
-    for category in categories:
-        category_articles = await scrape_category(category)
-        all_category_articles[category] = category_articles
+    if USE_REST_API:
+        try:
+            async with client_session(session) as api_session:
+                all_category_articles = await fetch_recent(wordpress_api, api_session, category_slugs, 10, output_file, api_state_file)
+        except WordPressAPIError as e:
+            logger.warning(f"WordPress REST API unavailable ({e}), falling back to HTML scraping")
+
+    if all_category_articles is None:
+        reset_sync(api_state_file)
+        all_category_articles = {}
+        for category in categories:
+            category_articles = await scrape_category(category, session=session)
+            all_category_articles[category] = category_articles
 
     await save_articles(all_category_articles, journal_name, journal_url)
     logger.info("Scraping process completed for all categories.")
+    return all_category_articles
 
 
 def job():